@@ -0,0 +1,78 @@
+"""Aggregation benchmark: single-process pass vs the worker-process pool.
+
+Aggregates a generated entry list in-process and with each worker count, and
+reports the median time and speedup of each (worker start-up included).
+
+    poetry run python benchmarks/aggregation.py --entries 200000 --workers 1 2 4
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Callable
+
+from prometheus_toggl_track_exporter import exporter, fake_server, parallel
+
+
+def _time(func: Callable[[], None], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=200_000)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    fixtures = fake_server.generate_fixtures(
+        workspace_count=args.workspaces, time_entries=args.entries, days=365
+    )
+    entries = fixtures["time_entries"]
+    project_names = {
+        project["id"]: project["name"]
+        for workspace in fixtures["workspaces"].values()
+        for project in workspace["projects"]
+    }
+    task_names = {
+        task["id"]: task["name"]
+        for workspace in fixtures["workspaces"].values()
+        for task in workspace["tasks"]
+    }
+    bounds = tuple(exporter.ENTRY_DURATION_BUCKETS)
+
+    def _serial() -> None:
+        state = parallel.new_state(bounds)
+        for entry in entries:
+            exporter._process_entry_aggregates(
+                entry, project_names, task_names, state, "1y"
+            )
+
+    baseline = _time(_serial, args.runs)
+    print(f"{len(entries)} entries")
+    print(f"  in-process: {baseline * 1000:.0f} ms")
+    try:
+        for workers in args.workers:
+
+            def _parallel(workers: int = workers) -> None:
+                parallel.aggregate_parallel(
+                    entries, project_names, task_names, "1y", bounds, workers
+                )
+
+            elapsed = _time(_parallel, args.runs)
+            print(
+                f"  {workers} worker(s): {elapsed * 1000:.0f} ms "
+                f"({baseline / elapsed:.2f}x)"
+            )
+    finally:
+        parallel.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
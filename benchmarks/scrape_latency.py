@@ -0,0 +1,121 @@
+"""Scrape latency benchmark: the exporter's HTTP server vs start_http_server.
+
+Serves a registry of generated series with each server and scrapes it from
+many concurrent clients (keeping connections alive where the server allows
+it), reporting the latency percentiles and throughput of each.
+
+    poetry run python benchmarks/scrape_latency.py --series 5000 --clients 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from prometheus_client import CollectorRegistry, Gauge, start_http_server
+
+from prometheus_toggl_track_exporter import server
+
+REQUEST = (
+    b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n"
+    b"Accept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n"
+)
+
+
+async def _scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+    """Scrapes once; returns whether the connection may be reused."""
+    writer.write(REQUEST)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+    headers = dict(
+        line.split(": ", 1) for line in head.split("\r\n")[1:] if ": " in line
+    )
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+    return headers.get("connection") == "keep-alive"
+
+
+async def _client(
+    port: int, scrapes: int, latencies: list[float], errors: list[str]
+) -> None:
+    reader = writer = None
+    for _ in range(scrapes):
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            keep_alive = await _scrape(reader, writer)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            keep_alive = False
+        else:
+            latencies.append(time.perf_counter() - start)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _run(port: int, clients: int, scrapes: int) -> tuple[list[float], list[str], float]:
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    async def _all() -> None:
+        await asyncio.gather(
+            *(_client(port, scrapes, latencies, errors) for _ in range(clients))
+        )
+
+    start = time.perf_counter()
+    asyncio.run(_all())
+    return sorted(latencies), errors, time.perf_counter() - start
+
+
+def _report(
+    name: str, latencies: list[float], errors: list[str], elapsed: float
+) -> None:
+    def _ms(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+
+    print(
+        f"  {name}: p50 {_ms(0.5):.1f} ms, p99 {_ms(0.99):.1f} ms, "
+        f"max {latencies[-1] * 1000:.1f} ms, "
+        f"{len(latencies) / elapsed:.0f} scrapes/s "
+        f"(mean {statistics.mean(latencies) * 1000:.1f} ms), "
+        f"{len(errors)} failed"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--series", type=int, default=5_000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--scrapes", type=int, default=10)
+    args = parser.parse_args()
+
+    registry = CollectorRegistry()
+    gauge = Gauge("bench_series", "Benchmark series", ["id"], registry=registry)
+    for i in range(args.series):
+        gauge.labels(id=str(i)).set(i)
+
+    baseline, _ = start_http_server(0, addr="127.0.0.1", registry=registry)
+    app = server.make_app(lambda: (True, {}), lambda: (True, {}), registry=registry)
+    httpd = server.start_server(app, 0, addr="127.0.0.1")
+    print(f"{args.series} series, {args.clients} clients x {args.scrapes} scrapes")
+    try:
+        _report(
+            "start_http_server", *_run(baseline.server_port, args.clients, args.scrapes)
+        )
+        _report(
+            "exporter server  ", *_run(httpd.server_port, args.clients, args.scrapes)
+        )
+    finally:
+        baseline.shutdown()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
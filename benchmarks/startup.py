@@ -0,0 +1,126 @@
+"""Startup benchmark: import cost and cold start to first useful scrape.
+
+Runs the exporter as a subprocess against the bundled fake Toggl API and polls
+the metrics endpoint until user metrics (first useful scrape) and time entry
+metrics (first full cycle) appear.
+
+    poetry run python benchmarks/startup.py --latency 0.2 --runs 3
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from prometheus_toggl_track_exporter.fake_server import (
+    generate_fixtures,
+    start_fake_server,
+)
+
+POLL_INTERVAL = 0.01
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(runs: int) -> list[float]:
+    """Measures a cold import of the exporter module in a fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        # Fixed argv: this interpreter and a constant import statement
+        subprocess.run(  # noqa: S603
+            [sys.executable, "-c", "import prometheus_toggl_track_exporter.exporter"],
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_cold_start(
+    base_url: str, ready_immediately: bool, timeout: float
+) -> dict[str, float]:
+    """Starts the exporter and records when each milestone becomes visible."""
+    port = _free_port()
+    env = {
+        **os.environ,
+        "TOGGL_API_TOKEN": "benchmark",
+        "TOGGL_API_BASE_URL": base_url,
+        "EXPORTER_PORT": str(port),
+        "READY_IMMEDIATELY": str(ready_immediately).lower(),
+        "COLLECTION_INTERVAL": "3600",
+    }
+    milestones = {
+        "http_up": None,
+        "first_user_metrics": "toggl_user_info{",
+        "first_full_cycle": "toggl_time_entries_count{",
+    }
+    seen: dict[str, float] = {}
+    start = time.perf_counter()
+    # Fixed argv: this interpreter running the exporter module
+    proc = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "prometheus_toggl_track_exporter"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        while len(seen) < len(milestones) and time.perf_counter() - start < timeout:
+            try:
+                body = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=1).text
+            except requests.exceptions.ConnectionError:
+                time.sleep(POLL_INTERVAL)
+                continue
+            elapsed = time.perf_counter() - start
+            for name, marker in milestones.items():
+                if name not in seen and (marker is None or marker in body):
+                    seen[name] = elapsed
+            time.sleep(POLL_INTERVAL)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return seen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    imports = measure_import(args.runs)
+    print(f"import exporter: median {statistics.median(imports) * 1000:.1f} ms")
+
+    server = start_fake_server(
+        generate_fixtures(time_entries=args.entries), latency=args.latency
+    )
+    try:
+        for ready_immediately in (False, True):
+            runs = [
+                measure_cold_start(server.base_url, ready_immediately, args.timeout)
+                for _ in range(args.runs)
+            ]
+            print(f"READY_IMMEDIATELY={str(ready_immediately).lower()}")
+            for milestone in ("http_up", "first_user_metrics", "first_full_cycle"):
+                values = [run[milestone] for run in runs if milestone in run]
+                if values:
+                    median_ms = statistics.median(values) * 1000
+                    print(f"  {milestone}: median {median_ms:.1f} ms")
+                else:
+                    print(f"  {milestone}: not reached")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Steady-state benchmark: a cycle with little churn vs a full rebuild.
+
+Runs update_time_entries_metrics over a generated window in which a few
+entries change per cycle, once updating only the changed aggregates and once
+rebuilding every window from scratch, and reports the median cycle time.
+
+    poetry run python benchmarks/steady_state.py --entries 50000 --changes 1
+"""
+
+import argparse
+import copy
+import statistics
+import time
+from unittest.mock import patch
+
+from prometheus_toggl_track_exporter import exporter, fake_server
+
+LOOKBACK_HOURS = 24 * 365
+
+
+def _cycle_times(fixtures: dict, changes: int, runs: int, rebuild: bool) -> float:
+    entries = copy.deepcopy(fixtures["time_entries"])
+    workspaces = fixtures["workspaces"]
+    next_id = max(entry["id"] for entry in entries) + 1
+
+    response: list[dict] = []
+
+    def _reference(workspace_id: int, kind: str) -> list[dict]:
+        return workspaces[str(workspace_id)][kind]
+
+    def _fetch_entries(**_kwargs: str) -> list[dict]:
+        return response
+
+    timings = []
+    with (
+        patch.object(exporter, "get_time_entries", _fetch_entries),
+        patch.object(exporter, "get_projects", lambda ws: _reference(ws, "projects")),
+        patch.object(exporter, "get_tasks", lambda ws: _reference(ws, "tasks")),
+        patch.object(exporter, "get_clients", lambda ws: _reference(ws, "clients")),
+        patch.object(exporter, "get_tags", lambda ws: _reference(ws, "tags")),
+    ):
+        exporter._WINDOW_AGGREGATES.clear()
+        for run in range(runs + 1):
+            for _ in range(changes):
+                entries.append({**entries[-1], "id": next_id})
+                next_id += 1
+            if rebuild:
+                exporter._WINDOW_AGGREGATES.clear()
+            # Fresh dicts each cycle, as parsed from an API response
+            response = [dict(entry) for entry in entries]
+            exporter._CYCLE_STATUS["last_cycle_start"] = time.time()
+            start = time.perf_counter()
+            for workspace_id in map(int, workspaces):
+                exporter.update_aggregate_metrics(workspace_id)
+                exporter.update_time_entries_metrics(workspace_id, LOOKBACK_HOURS)
+            if run:
+                # The first run builds the windows either way
+                timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--workspaces", type=int, default=2)
+    parser.add_argument("--changes", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    fixtures = fake_server.generate_fixtures(
+        workspace_count=args.workspaces, time_entries=args.entries, days=300
+    )
+    exporter.configure(exporter.ExporterConfig(toggl_api_token="benchmark"))  # noqa: S106
+    with patch("builtins.print"):
+        rebuild = _cycle_times(fixtures, args.changes, args.runs, rebuild=True)
+        incremental = _cycle_times(fixtures, args.changes, args.runs, rebuild=False)
+    print(f"{args.entries} entries, {args.changes} changed per cycle")
+    print(f"  rebuild:     {rebuild * 1000:.0f} ms")
+    print(f"  incremental: {incremental * 1000:.0f} ms ({rebuild / incremental:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""Historical backfill of time entry metrics as timestamped OpenMetrics.
+
+Fetches time entries for a date range in chunks, aggregates each chunk into
+per-day (or per-hour) samples labelled like the live TIME_ENTRY_LABELS
+metrics, and writes a file for:
+
+    promtool tsdb create-blocks-from openmetrics backfill.om ./data
+
+Samples of each metric family are spooled to their own temporary file while
+chunks are processed, then grouped per series with an external merge sort,
+so memory use is bounded by a chunk (or a sort run) regardless of the range
+length. Buckets are aligned to
+UTC; each sample is timestamped at the end of its bucket.
+"""
+
+import argparse
+import contextlib
+import heapq
+import itertools
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta, timezone
+from typing import IO, Optional
+
+from prometheus_toggl_track_exporter import exporter
+from prometheus_toggl_track_exporter.config import ConfigError, ExporterConfig
+
+RESOLUTIONS = {"1d": timedelta(days=1), "1h": timedelta(hours=1)}
+
+# (name, help) of the families written, in output order
+FAMILIES = [
+    (
+        "toggl_time_entries_duration_seconds",
+        "Total duration of completed time entries started in the bucket",
+    ),
+    (
+        "toggl_time_entries_count",
+        "Number of completed time entries started in the bucket",
+    ),
+]
+
+
+class BackfillError(RuntimeError):
+    """Raised when a chunk of time entries cannot be fetched."""
+
+
+def iter_chunks(
+    start: datetime, end: datetime, chunk: timedelta
+) -> Iterator[tuple[datetime, datetime]]:
+    """Yields consecutive [chunk_start, chunk_end) windows covering [start, end)."""
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + chunk, end)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end
+
+
+def bucket_start(dt: datetime, resolution: str) -> datetime:
+    """Returns the start of the UTC bucket containing dt."""
+    dt = dt.astimezone(timezone.utc)
+    if resolution == "1h":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_sample(name: str, label_key: tuple, value: float, timestamp: float) -> str:
+    """Formats one OpenMetrics sample line with a timestamp in seconds."""
+    labels = ",".join(
+        f'{label}="{_escape(str(label_value))}"'
+        for label, label_value in zip(exporter.TIME_ENTRY_LABELS, label_key)
+    )
+    return f"{name}{{{labels}}} {value} {timestamp:.3f}\n"
+
+
+def aggregate_chunk(
+    entries: list[dict],
+    chunk_start: datetime,
+    chunk_end: datetime,
+    resolution: str,
+    mappings: dict[int, tuple[dict[int, str], dict[int, str]]],
+) -> dict[datetime, exporter.AggregationState]:
+    """Aggregates a chunk's entries per bucket, keyed by bucket start.
+
+    Entries starting outside [chunk_start, chunk_end) are ignored, so an entry
+    returned for two adjacent chunks is only counted once.
+    """
+    buckets: dict[datetime, exporter.AggregationState] = {}
+    for entry in entries:
+        start_dt = exporter.parse_iso_datetime(entry.get("start"))
+        ws_id = entry.get("workspace_id")
+        if start_dt is None or ws_id not in mappings:
+            continue
+        if not chunk_start <= start_dt < chunk_end:
+            continue
+        state = buckets.setdefault(
+            bucket_start(start_dt, resolution),
+            {"ws_performance": {}, "aggregated_durations": {}, "aggregated_counts": {}},
+        )
+        project_name_map, task_name_map = mappings[ws_id]
+        exporter._process_entry_aggregates(
+            entry, project_name_map, task_name_map, state, resolution
+        )
+    return buckets
+
+
+# Sample lines sorted in memory at once while grouping a family's series
+SORT_RUN_LINES = 100_000
+
+
+def _series(line: str) -> str:
+    return line[: line.index("} ") + 1]
+
+
+def _grouped_by_series(
+    spool: IO[str], tmp_dir: Optional[str], run_lines: int
+) -> Iterator[str]:
+    """Yields spooled lines grouped by series, keeping each series' order.
+
+    Sorted runs are merged with heapq.merge; both steps are stable, so the
+    chronological order samples were written in is preserved per series.
+    """
+    spool.seek(0)
+    runs: list[IO[str]] = []
+    try:
+        while True:
+            lines = list(itertools.islice(spool, run_lines))
+            if not lines:
+                break
+            lines.sort(key=_series)
+            run = tempfile.TemporaryFile("w+", dir=tmp_dir, encoding="utf-8")  # noqa: SIM115
+            run.writelines(lines)
+            run.seek(0)
+            runs.append(run)
+        yield from heapq.merge(*runs, key=_series)
+    finally:
+        for run in runs:
+            run.close()
+
+
+class FamilySpool:
+    """Spools samples per metric family into temporary files.
+
+    OpenMetrics requires each family's samples to be contiguous and grouped
+    per series, while chunks produce samples for every series at once.
+    """
+
+    def __init__(
+        self, tmp_dir: Optional[str] = None, run_lines: Optional[int] = None
+    ) -> None:
+        self._tmp_dir = tmp_dir
+        self._run_lines = run_lines or SORT_RUN_LINES
+        self._files: dict[str, IO[str]] = {
+            name: tempfile.TemporaryFile("w+", dir=tmp_dir, encoding="utf-8")  # noqa: SIM115
+            for name, _ in FAMILIES
+        }
+        self.samples = 0
+
+    def write(self, name: str, line: str) -> None:
+        self._files[name].write(line)
+        self.samples += 1
+
+    def write_buckets(
+        self, buckets: dict[datetime, exporter.AggregationState], resolution: str
+    ) -> None:
+        """Writes aggregated buckets in time order (per-series timestamps must
+        increase)."""
+        width = RESOLUTIONS[resolution]
+        for start in sorted(buckets):
+            timestamp = (start + width).timestamp()
+            state = buckets[start]
+            for label_key, duration in state["aggregated_durations"].items():
+                self.write(
+                    FAMILIES[0][0],
+                    format_sample(FAMILIES[0][0], label_key, duration, timestamp),
+                )
+            for label_key, count in state["aggregated_counts"].items():
+                self.write(
+                    FAMILIES[1][0],
+                    format_sample(FAMILIES[1][0], label_key, count, timestamp),
+                )
+
+    def dump(self, out: IO[str]) -> None:
+        """Writes all families followed by the # EOF marker."""
+        for name, help_text in FAMILIES:
+            out.write(f"# HELP {name} {help_text}\n# TYPE {name} gauge\n")
+            out.writelines(
+                _grouped_by_series(self._files[name], self._tmp_dir, self._run_lines)
+            )
+        out.write("# EOF\n")
+
+    def close(self) -> None:
+        for spool in self._files.values():
+            spool.close()
+
+
+def _workspace_mappings(
+    workspace_id: int, cache: dict[int, tuple[dict[int, str], dict[int, str]]]
+) -> None:
+    if workspace_id not in cache:
+        cache[workspace_id] = exporter._fetch_workspace_mappings(workspace_id)
+
+
+def run_backfill(  # noqa: PLR0913
+    start: date,
+    end: date,
+    out: IO[str],
+    *,
+    resolution: str = "1d",
+    chunk_days: int = 7,
+    workspace_ids: Optional[list[int]] = None,
+    request_interval: float = 0.0,
+    tmp_dir: Optional[str] = None,
+) -> int:
+    """Backfills [start, end) into out and returns the number of samples.
+
+    Only workspaces in workspace_ids are exported; None exports every
+    workspace the entries belong to.
+    """
+    range_start = datetime.combine(start, datetime.min.time(), timezone.utc)
+    range_end = datetime.combine(end, datetime.min.time(), timezone.utc)
+    mappings: dict[int, tuple[dict[int, str], dict[int, str]]] = {}
+    if workspace_ids is not None:
+        for workspace_id in workspace_ids:
+            _workspace_mappings(workspace_id, mappings)
+
+    spool = FamilySpool(tmp_dir)
+    try:
+        for index, (chunk_start, chunk_end) in enumerate(
+            iter_chunks(range_start, range_end, timedelta(days=chunk_days))
+        ):
+            if index and request_interval:
+                time.sleep(request_interval)  # Stay under the API rate limit
+            entries = exporter.get_time_entries(
+                start_date=chunk_start.isoformat(timespec="seconds"),
+                end_date=chunk_end.isoformat(timespec="seconds"),
+            )
+            if entries is None:
+                raise BackfillError(  # noqa: TRY003
+                    f"Could not fetch time entries for {chunk_start:%Y-%m-%d} to "
+                    f"{chunk_end:%Y-%m-%d}"
+                )
+            if workspace_ids is None:
+                for entry in entries:
+                    if entry.get("workspace_id") is not None:
+                        _workspace_mappings(entry["workspace_id"], mappings)
+            buckets = aggregate_chunk(
+                entries, chunk_start, chunk_end, resolution, mappings
+            )
+            spool.write_buckets(buckets, resolution)
+            print(
+                f"Backfilled {chunk_start:%Y-%m-%d} to {chunk_end:%Y-%m-%d}: "
+                f"{len(entries)} entries, {len(buckets)} buckets"
+            )
+        spool.dump(out)
+        return spool.samples
+    finally:
+        spool.close()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="toggl-track-exporter backfill",
+        description="Write historical time entry metrics as OpenMetrics for "
+        "promtool tsdb create-blocks-from openmetrics.",
+    )
+    parser.add_argument(
+        "--start", type=date.fromisoformat, required=True, help="First day (UTC)"
+    )
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        default=None,
+        help="Day after the last day, exclusive (default: today, UTC)",
+    )
+    parser.add_argument("--resolution", choices=sorted(RESOLUTIONS), default="1d")
+    parser.add_argument(
+        "--chunk-days", type=int, default=7, help="Days fetched per API request"
+    )
+    parser.add_argument(
+        "--workspace-id",
+        type=int,
+        action="append",
+        dest="workspace_ids",
+        help="Workspace to export (repeatable; default: all)",
+    )
+    parser.add_argument(
+        "--request-interval",
+        type=float,
+        default=1.0,
+        help="Seconds to wait between API requests",
+    )
+    parser.add_argument(
+        "--output", "-o", default="-", help="Output file (default: stdout)"
+    )
+    parser.add_argument("--tmp-dir", default=None, help="Directory for spool files")
+    args = parser.parse_args(argv)
+    args.end = args.end or datetime.now(timezone.utc).date()
+    if args.chunk_days < 1:
+        parser.error("--chunk-days must be >= 1")
+    if args.end <= args.start:
+        parser.error("--end must be after --start")
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Entry point of the backfill subcommand."""
+    args = parse_args(argv)
+    try:
+        config = ExporterConfig.load()
+    except ConfigError as e:
+        print(f"Configuration error: {e}", file=sys.stderr)
+        raise SystemExit(2) from e
+    exporter.configure(config)
+    if not exporter.TOGGL_API_TOKEN:
+        print("Error: TOGGL_API_TOKEN environment variable not set.", file=sys.stderr)
+        raise SystemExit(2)
+
+    kwargs = {
+        "resolution": args.resolution,
+        "chunk_days": args.chunk_days,
+        "workspace_ids": args.workspace_ids,
+        "request_interval": args.request_interval,
+        "tmp_dir": args.tmp_dir,
+    }
+    # Progress and API messages go to stderr so stdout can carry the output
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            if args.output == "-":
+                samples = run_backfill(args.start, args.end, stdout, **kwargs)
+            else:
+                with open(args.output, "w", encoding="utf-8") as out:
+                    samples = run_backfill(args.start, args.end, out, **kwargs)
+        except BackfillError as e:
+            print(f"Backfill failed: {e}")
+            raise SystemExit(1) from e
+        print(f"Wrote {samples} samples.")
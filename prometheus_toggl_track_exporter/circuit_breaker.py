@@ -0,0 +1,225 @@
+"""Per-endpoint circuit breakers for Toggl API requests.
+
+Requests are grouped by endpoint template (IDs in the path replaced by
+"{id}", e.g. /workspaces/{id}/clients). After failure_threshold consecutive
+failures a template's circuit opens and its requests are rejected without
+touching the network. Once the open interval has elapsed a single probe
+request is let through (half-open): success closes the circuit, failure
+reopens it with the interval doubled, up to max_open_seconds.
+"""
+
+import re
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Optional
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.metrics_core import Metric
+from prometheus_client.registry import Collector
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, OPEN, HALF_OPEN)
+
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Replaces numeric path segments: /workspaces/1/tags -> /workspaces/{id}/tags."""
+    return _ID_SEGMENT_RE.sub("/{id}", endpoint.split("?", 1)[0])
+
+
+class _Circuit:
+    def __init__(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = 0.0
+        self.retry_at = 0.0
+        self.rejected = 0
+
+
+class CircuitBreakers:
+    """Circuit breakers keyed by endpoint template; thread-safe.
+
+    A failure_threshold of 0 disables them: every request is allowed.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        open_seconds: float = 60.0,
+        max_open_seconds: float = 3600.0,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self._circuits: dict[str, _Circuit] = {}
+        # Requests that ended on an open circuit: rejected, or opening it
+        self._open_outcomes = 0
+        self.configure(failure_threshold, open_seconds, max_open_seconds)
+
+    def configure(
+        self, failure_threshold: int, open_seconds: float, max_open_seconds: float
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(max_open_seconds, open_seconds)
+
+    def allow(self, template: str) -> bool:
+        """Whether a request to the template may be sent now.
+
+        An open circuit whose interval has elapsed turns half-open and admits
+        this one request as its probe; others are rejected until it reports.
+        """
+        if not self.failure_threshold:
+            return True
+        with self._lock:
+            circuit = self._circuits.get(template)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN and self._clock() >= circuit.retry_at:
+                circuit.state = HALF_OPEN
+                return True
+            circuit.rejected += 1
+            self._open_outcomes += 1
+            return False
+
+    def record_success(self, template: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(template)
+            if circuit is not None:
+                circuit.state = CLOSED
+                circuit.consecutive_failures = 0
+                circuit.open_seconds = 0.0
+
+    def record_failure(self, template: str) -> None:
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuits.setdefault(template, _Circuit())
+            circuit.consecutive_failures += 1
+            if circuit.state == HALF_OPEN:
+                # The probe failed: back off further
+                circuit.open_seconds = min(
+                    circuit.open_seconds * 2, self.max_open_seconds
+                )
+            elif circuit.consecutive_failures >= self.failure_threshold:
+                circuit.open_seconds = self.open_seconds
+            else:
+                return
+            print(
+                f"Circuit for {template} open after "
+                f"{circuit.consecutive_failures} consecutive failures; "
+                f"next probe in {circuit.open_seconds:.0f}s."
+            )
+            circuit.state = OPEN
+            circuit.retry_at = self._clock() + circuit.open_seconds
+            self._open_outcomes += 1
+
+    def record_abandoned(self, template: str) -> None:
+        """Records a request that ended without a verdict (rate limited or
+        cancelled); a half-open circuit may probe again right away."""
+        with self._lock:
+            circuit = self._circuits.get(template)
+            if circuit is not None and circuit.state == HALF_OPEN:
+                circuit.state = OPEN
+                circuit.retry_at = self._clock()
+
+    def state(self, template: str) -> str:
+        with self._lock:
+            circuit = self._circuits.get(template)
+            return circuit.state if circuit is not None else CLOSED
+
+    def open_outcomes(self) -> int:
+        """Counts requests that ended on an open circuit so far: rejected by
+        one, or failing and (re)opening it."""
+        with self._lock:
+            return self._open_outcomes
+
+    def export(self) -> dict[str, dict]:
+        """Returns the circuits as plain data, with wall-clock probe times."""
+        offset = time.time() - self._clock()
+        with self._lock:
+            return {
+                template: {
+                    "state": circuit.state,
+                    "consecutive_failures": circuit.consecutive_failures,
+                    "open_seconds": circuit.open_seconds,
+                    "retry_at": circuit.retry_at + offset,
+                }
+                for template, circuit in self._circuits.items()
+            }
+
+    def restore(self, circuits: dict[str, dict]) -> None:
+        """Restores circuits returned by export(), e.g. by a previous run."""
+        offset = self._clock() - time.time()
+        with self._lock:
+            for template, saved in circuits.items():
+                circuit = self._circuits.setdefault(template, _Circuit())
+                # A probe of the previous run never reported: probe again
+                circuit.state = OPEN if saved["state"] == HALF_OPEN else saved["state"]
+                circuit.consecutive_failures = saved["consecutive_failures"]
+                circuit.open_seconds = saved["open_seconds"]
+                circuit.retry_at = saved["retry_at"] + offset
+
+    def reset(self) -> None:
+        with self._lock:
+            self._circuits.clear()
+
+    def snapshot(self) -> dict[str, dict]:
+        """Returns each tracked template's state, failures, rejections and the
+        seconds until its next probe."""
+        now = self._clock()
+        with self._lock:
+            return {
+                template: {
+                    "state": circuit.state,
+                    "consecutive_failures": circuit.consecutive_failures,
+                    "rejected": circuit.rejected,
+                    "retry_in": max(0.0, circuit.retry_at - now)
+                    if circuit.state == OPEN
+                    else 0.0,
+                }
+                for template, circuit in self._circuits.items()
+            }
+
+
+class CircuitBreakerCollector(Collector):
+    """Exports circuit breaker states at scrape time."""
+
+    def __init__(self, breakers: CircuitBreakers) -> None:
+        self._breakers = breakers
+
+    def collect(self) -> Iterator[Metric]:
+        state = GaugeMetricFamily(
+            "toggl_circuit_breaker_state",
+            "Circuit breaker state per endpoint (1 for the current state)",
+            labels=["endpoint", "state"],
+        )
+        failures = GaugeMetricFamily(
+            "toggl_circuit_breaker_consecutive_failures",
+            "Consecutive failed requests per endpoint",
+            labels=["endpoint"],
+        )
+        rejected = CounterMetricFamily(
+            "toggl_circuit_breaker_rejected_requests",
+            "Requests rejected by an open circuit",
+            labels=["endpoint"],
+        )
+        retry_in = GaugeMetricFamily(
+            "toggl_circuit_breaker_next_probe_seconds",
+            "Seconds until an open circuit lets a probe request through",
+            labels=["endpoint"],
+        )
+        for template, circuit in sorted(self._breakers.snapshot().items()):
+            for name in STATES:
+                state.add_metric([template, name], 1 if circuit["state"] == name else 0)
+            failures.add_metric([template], circuit["consecutive_failures"])
+            rejected.add_metric([template], circuit["rejected"])
+            retry_in.add_metric([template], circuit["retry_in"])
+        yield state
+        yield failures
+        yield rejected
+        yield retry_in
@@ -0,0 +1,493 @@
+"""Typed, validated exporter configuration."""
+
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import tzinfo
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from prometheus_toggl_track_exporter.sharding import ordinal_from_hostname
+
+DEFAULT_TOGGL_API_BASE_URL = "https://api.track.toggl.com/api/v9"
+MAX_PORT = 65535
+MAX_PROFILE_SAMPLE_HZ = 1000
+
+# Metric families that METRIC_FAMILIES selects from
+ALL_METRIC_FAMILIES = (
+    "user",  # toggl_user_* from the user profile
+    "running",  # running timer and today's total
+    "reference",  # project, client and tag counts and info
+    "entries",  # time entry totals per project, task and tag combination
+    "performance",  # per-workspace averages, billable ratio, days, untagged
+    "histogram",  # entry duration histogram
+    "tags",  # per-tag totals
+    "clients",  # per-client rollups
+)
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+_FALSE_VALUES = {"0", "false", "no", "off", ""}
+
+
+class ConfigError(ValueError):
+    """Raised when the exporter configuration is invalid."""
+
+
+@dataclass(frozen=True)
+class ExporterConfig:
+    """Exporter settings, built once at startup from the environment."""
+
+    toggl_api_token: Optional[str] = None
+    # Toggl API V9 Base URL (override to point at a proxy or the fake server)
+    toggl_api_base_url: str = DEFAULT_TOGGL_API_BASE_URL
+    exporter_port: int = 9090
+    # Address the HTTP server binds to
+    exporter_address: str = "0.0.0.0"  # noqa: S104
+    metrics_path: str = "/metrics"
+    # Serve HTTPS with this PEM certificate chain and key (optional)
+    tls_cert_file: Optional[str] = None
+    tls_key_file: Optional[str] = None
+    # Require HTTP basic auth for the metrics path (optional)
+    basic_auth_username: Optional[str] = None
+    basic_auth_password: Optional[str] = None
+    # Open connections served at once, metric renders run at once, and
+    # seconds an idle keep-alive connection is held open
+    http_max_connections: int = 256
+    http_max_concurrent_scrapes: int = 4
+    http_keepalive_timeout: int = 30
+    collection_interval: int = 60
+    # Bounds of the adaptive interval: cycles run every collection_interval_min
+    # seconds while a timer runs or entries change, and back off towards
+    # collection_interval_max while idle. 0 (the default) uses
+    # collection_interval, so adaptive polling is off unless a bound is set
+    collection_interval_min: int = 0
+    collection_interval_max: int = 0
+    # Seconds a collection cycle may take before outstanding Toggl requests are
+    # cancelled and the rest are skipped; 0 uses the collection interval
+    cycle_timeout: int = 0
+    # Lookback periods in hours, one set of time entry metrics per period
+    time_entries_lookback_hours: tuple[int, ...] = (24,)
+    # IANA time zone whose midnights bound days ("today", days with entries);
+    # unset uses the time zone of the user's Toggl profile, else UTC
+    timezone: Optional[str] = None
+    # Serve and report ready at once; the first collection runs in the background
+    ready_immediately: bool = False
+    # Metric families to collect; only the API calls and aggregation they need
+    # are made
+    metric_families: tuple[str, ...] = ALL_METRIC_FAMILIES
+    # Upper bounds in seconds of the entry duration histogram buckets
+    entry_duration_buckets: tuple[float, ...] = (
+        300.0,
+        900.0,
+        1800.0,
+        3600.0,
+        7200.0,
+        14400.0,
+        28800.0,
+    )
+    # Workspaces to collect; empty means the user's default workspace
+    workspace_ids: tuple[int, ...] = ()
+    # Collect every workspace the user belongs to (TOGGL_WORKSPACE_IDS=all)
+    all_workspaces: bool = False
+    # This replica's shard and the total number of shards
+    shard_index: int = 0
+    shard_count: int = 1
+    # Persist source snapshots and time entries here between runs (optional);
+    # time entries are then synced incrementally
+    state_file: Optional[str] = None
+    # Memory budget of the time entry store, in MiB (0: unbounded), and the
+    # seconds between compactions of the store
+    entry_store_max_mb: int = 0
+    entry_store_compact_interval: int = 3600
+    # Seconds to reuse reference data (projects, clients, ...) before
+    # refetching; 0 fetches it every cycle
+    reference_ttl: int = 0
+    # Concurrent page requests when fetching paginated projects and tasks
+    fetch_concurrency: int = 4
+    # Fetch only active projects, clients and tasks (entries of archived ones
+    # then fall back to the names carried by the entries)
+    reference_active_only: bool = False
+    # Worker processes for aggregating large entry lists; 0 aggregates in-process
+    aggregation_workers: int = 0
+    # Consecutive failures of an endpoint that open its circuit (0 disables),
+    # and the first and longest intervals between probes of an open circuit
+    circuit_breaker_threshold: int = 3
+    circuit_breaker_open_seconds: int = 60
+    circuit_breaker_max_open_seconds: int = 3600
+    # Push each cycle's snapshot to this remote write endpoint (optional)
+    remote_write_url: Optional[str] = None
+    remote_write_bearer_token: Optional[str] = None
+    remote_write_batch_size: int = 500
+    remote_write_queue_batches: int = 100
+    remote_write_timeout: int = 10
+    # Serve the /debug profiling endpoints, guarded by this bearer token
+    debug_token: Optional[str] = None
+    # Stack samples per second taken during cycles (/debug/samples); 0 disables
+    profile_sample_hz: int = 0
+    # Optional KEY=VALUE file overriding the environment, reloaded on SIGHUP
+    # and whenever it changes
+    config_file: Optional[str] = None
+
+    @classmethod
+    def load(cls, env: Optional[Mapping[str, str]] = None) -> "ExporterConfig":
+        """Builds the configuration from the environment and CONFIG_FILE.
+
+        Settings in the file take precedence over environment variables.
+        Raises ConfigError if the file cannot be read or a setting is invalid.
+        """
+        env = os.environ if env is None else env
+        path = env.get("CONFIG_FILE", "").strip()
+        if not path:
+            return cls.from_env(env)
+        errors: list[str] = []
+        values = read_config_file(path, errors)
+        if errors:
+            raise ConfigError("Invalid configuration: " + "; ".join(errors))
+        return cls.from_env({**env, **values, "CONFIG_FILE": path})
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "ExporterConfig":
+        """Builds the configuration from environment variables.
+
+        Raises ConfigError listing every invalid setting.
+        """
+        env = os.environ if env is None else env
+        errors: list[str] = []
+
+        def _int(name: str, default: int, minimum: int = 1) -> int:
+            raw = env.get(name, "").strip()
+            if not raw:
+                return default
+            try:
+                value = int(raw)
+            except ValueError:
+                errors.append(f"{name} must be an integer, got {raw!r}")
+                return default
+            if value < minimum:
+                errors.append(f"{name} must be >= {minimum}, got {value}")
+            return value
+
+        def _bool(name: str, default: bool) -> bool:
+            raw = env.get(name)
+            if raw is None:
+                return default
+            if raw.strip().lower() in _TRUE_VALUES:
+                return True
+            if raw.strip().lower() in _FALSE_VALUES:
+                return False
+            errors.append(f"{name} must be a boolean, got {raw!r}")
+            return default
+
+        port = _int("EXPORTER_PORT", cls.exporter_port)
+        if port > MAX_PORT:
+            errors.append(f"EXPORTER_PORT must be <= {MAX_PORT}, got {port}")
+
+        metrics_path = env.get("METRICS_PATH", cls.metrics_path).strip()
+        if not metrics_path.startswith("/"):
+            errors.append(f"METRICS_PATH must start with '/', got {metrics_path!r}")
+
+        tls_cert_file = env.get("TLS_CERT_FILE") or None
+        tls_key_file = env.get("TLS_KEY_FILE") or None
+        if bool(tls_cert_file) != bool(tls_key_file):
+            errors.append("TLS_CERT_FILE and TLS_KEY_FILE must be set together")
+        basic_auth_username = env.get("BASIC_AUTH_USERNAME") or None
+        basic_auth_password = env.get("BASIC_AUTH_PASSWORD") or None
+        if bool(basic_auth_username) != bool(basic_auth_password):
+            errors.append(
+                "BASIC_AUTH_USERNAME and BASIC_AUTH_PASSWORD must be set together"
+            )
+
+        # Comma-separated list of lookback periods in hours (e.g., "24,168,720")
+        lookback_hours = parse_lookback_hours(
+            env.get("TIME_ENTRIES_LOOKBACK_HOURS_LIST", ""), errors
+        )
+
+        metric_families = parse_metric_families(env.get("METRIC_FAMILIES", ""), errors)
+
+        timezone_name = env.get("TIMEZONE", "").strip() or None
+        if timezone_name and load_timezone(timezone_name) is None:
+            errors.append(
+                f"TIMEZONE must be an IANA time zone name, got {timezone_name!r}"
+            )
+
+        duration_buckets = parse_buckets(
+            env.get("TIME_ENTRY_DURATION_BUCKETS", ""), errors
+        )
+
+        workspaces_raw = env.get("TOGGL_WORKSPACE_IDS", "").strip()
+        all_workspaces = workspaces_raw.lower() == "all"
+        workspace_ids = () if all_workspaces else parse_id_list(workspaces_raw, errors)
+
+        shard_count = _int("SHARD_COUNT", cls.shard_count)
+        shard_index = _int("SHARD_INDEX", -1, minimum=0)
+        if shard_index < 0:
+            shard_index = 0
+            if shard_count > 1:
+                # Fall back to the StatefulSet ordinal in the pod hostname
+                ordinal = ordinal_from_hostname(env.get("HOSTNAME", ""))
+                if ordinal is None:
+                    errors.append(
+                        "SHARD_INDEX must be set (or HOSTNAME end in an ordinal) "
+                        "when SHARD_COUNT > 1"
+                    )
+                shard_index = ordinal or 0
+        check_shards(
+            shard_index, shard_count, bool(workspace_ids or all_workspaces), errors
+        )
+
+        remote_write_url = env.get("REMOTE_WRITE_URL", "").strip() or None
+        if remote_write_url and not remote_write_url.startswith(
+            ("http://", "https://")
+        ):
+            errors.append(
+                f"REMOTE_WRITE_URL must be an http(s) URL, got {remote_write_url!r}"
+            )
+
+        collection_interval = _int("COLLECTION_INTERVAL", cls.collection_interval)
+        interval_min = _int(
+            "COLLECTION_INTERVAL_MIN", cls.collection_interval_min, minimum=0
+        )
+        interval_max = _int(
+            "COLLECTION_INTERVAL_MAX", cls.collection_interval_max, minimum=0
+        )
+        check_interval_bounds(collection_interval, interval_min, interval_max, errors)
+
+        profile_sample_hz = _int("PROFILE_SAMPLE_HZ", cls.profile_sample_hz, minimum=0)
+        if profile_sample_hz > MAX_PROFILE_SAMPLE_HZ:
+            errors.append(
+                f"PROFILE_SAMPLE_HZ must be <= {MAX_PROFILE_SAMPLE_HZ}, "
+                f"got {profile_sample_hz}"
+            )
+
+        config = cls(
+            toggl_api_token=env.get("TOGGL_API_TOKEN") or None,
+            toggl_api_base_url=env.get(
+                "TOGGL_API_BASE_URL", DEFAULT_TOGGL_API_BASE_URL
+            ).rstrip("/"),
+            exporter_port=port,
+            exporter_address=env.get("EXPORTER_ADDRESS", "").strip()
+            or cls.exporter_address,
+            metrics_path=metrics_path,
+            tls_cert_file=tls_cert_file,
+            tls_key_file=tls_key_file,
+            basic_auth_username=basic_auth_username,
+            basic_auth_password=basic_auth_password,
+            http_max_connections=_int("HTTP_MAX_CONNECTIONS", cls.http_max_connections),
+            http_max_concurrent_scrapes=_int(
+                "HTTP_MAX_CONCURRENT_SCRAPES", cls.http_max_concurrent_scrapes
+            ),
+            http_keepalive_timeout=_int(
+                "HTTP_KEEPALIVE_TIMEOUT", cls.http_keepalive_timeout
+            ),
+            collection_interval=collection_interval,
+            collection_interval_min=interval_min,
+            collection_interval_max=interval_max,
+            cycle_timeout=_int("CYCLE_TIMEOUT", cls.cycle_timeout, minimum=0),
+            time_entries_lookback_hours=lookback_hours,
+            timezone=timezone_name,
+            ready_immediately=_bool("READY_IMMEDIATELY", cls.ready_immediately),
+            metric_families=metric_families,
+            entry_duration_buckets=duration_buckets,
+            workspace_ids=workspace_ids,
+            all_workspaces=all_workspaces,
+            shard_index=shard_index,
+            shard_count=shard_count,
+            state_file=env.get("STATE_FILE") or None,
+            entry_store_max_mb=_int(
+                "ENTRY_STORE_MAX_MB", cls.entry_store_max_mb, minimum=0
+            ),
+            entry_store_compact_interval=_int(
+                "ENTRY_STORE_COMPACT_INTERVAL",
+                cls.entry_store_compact_interval,
+                minimum=0,
+            ),
+            reference_ttl=_int("REFERENCE_TTL", cls.reference_ttl, minimum=0),
+            fetch_concurrency=_int("FETCH_CONCURRENCY", cls.fetch_concurrency),
+            reference_active_only=_bool(
+                "REFERENCE_ACTIVE_ONLY", cls.reference_active_only
+            ),
+            aggregation_workers=_int(
+                "AGGREGATION_WORKERS", cls.aggregation_workers, minimum=0
+            ),
+            circuit_breaker_threshold=_int(
+                "CIRCUIT_BREAKER_THRESHOLD", cls.circuit_breaker_threshold, minimum=0
+            ),
+            circuit_breaker_open_seconds=_int(
+                "CIRCUIT_BREAKER_OPEN_SECONDS", cls.circuit_breaker_open_seconds
+            ),
+            circuit_breaker_max_open_seconds=_int(
+                "CIRCUIT_BREAKER_MAX_OPEN_SECONDS", cls.circuit_breaker_max_open_seconds
+            ),
+            remote_write_url=remote_write_url,
+            remote_write_bearer_token=env.get("REMOTE_WRITE_BEARER_TOKEN") or None,
+            remote_write_batch_size=_int(
+                "REMOTE_WRITE_BATCH_SIZE", cls.remote_write_batch_size
+            ),
+            remote_write_queue_batches=_int(
+                "REMOTE_WRITE_QUEUE_BATCHES", cls.remote_write_queue_batches
+            ),
+            remote_write_timeout=_int("REMOTE_WRITE_TIMEOUT", cls.remote_write_timeout),
+            debug_token=env.get("DEBUG_TOKEN") or None,
+            profile_sample_hz=profile_sample_hz,
+            config_file=env.get("CONFIG_FILE", "").strip() or None,
+        )
+        if errors:
+            raise ConfigError("Invalid configuration: " + "; ".join(errors))
+        return config
+
+
+def read_config_file(path: str, errors: list[str]) -> dict[str, str]:
+    """Reads KEY=VALUE settings, one per line, as in an env file.
+
+    Blank lines and lines starting with "#" are skipped; an "export " prefix
+    and quotes around the value are dropped. Unreadable files and malformed
+    lines are reported in errors.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        errors.append(f"CONFIG_FILE {path} could not be read: {e}")
+        return {}
+    values: dict[str, str] = {}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()  # noqa: PLW2901
+        if not line or line.startswith("#"):
+            continue
+        key, sep, value = line.removeprefix("export ").partition("=")
+        key, value = key.strip(), value.strip()
+        if not sep or not key:
+            errors.append(f"{path}:{number} must be KEY=VALUE, got {line!r}")
+            continue
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key] = value
+    return values
+
+
+def check_interval_bounds(
+    interval: int, minimum: int, maximum: int, errors: list[str]
+) -> None:
+    """Checks that set (non-zero) adaptive interval bounds enclose interval."""
+    if minimum > interval:
+        errors.append(
+            "COLLECTION_INTERVAL_MIN must be <= COLLECTION_INTERVAL "
+            f"({interval}), got {minimum}"
+        )
+    if maximum and maximum < interval:
+        errors.append(
+            "COLLECTION_INTERVAL_MAX must be >= COLLECTION_INTERVAL "
+            f"({interval}), got {maximum}"
+        )
+
+
+def check_shards(
+    shard_index: int, shard_count: int, workspaces_configured: bool, errors: list[str]
+) -> None:
+    """Checks the shard index, and that sharded replicas know their workspaces."""
+    if shard_index >= shard_count:
+        errors.append(
+            f"SHARD_INDEX must be < SHARD_COUNT ({shard_count}), got {shard_index}"
+        )
+    if shard_count > 1 and not workspaces_configured:
+        # Every shard would otherwise need /me to find the default workspace
+        errors.append(
+            "TOGGL_WORKSPACE_IDS must list workspaces or be 'all' when SHARD_COUNT > 1"
+        )
+
+
+def load_timezone(name: str) -> Optional[tzinfo]:
+    """Returns the IANA time zone called name, or None if it is unknown."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def parse_id_list(raw: str, errors: list[str]) -> tuple[int, ...]:
+    """Parses a comma-separated list of numeric IDs, reporting invalid ones."""
+    ids: list[int] = []
+    for part in raw.split(","):
+        part = part.strip()  # noqa: PLW2901
+        if not part:
+            continue
+        if not part.isdigit():
+            errors.append(f"TOGGL_WORKSPACE_IDS entries must be numeric, got {part!r}")
+            continue
+        if int(part) not in ids:
+            ids.append(int(part))
+    return tuple(ids)
+
+
+def parse_metric_families(raw: str, errors: list[str]) -> tuple[str, ...]:
+    """Parses a comma-separated list of metric families to collect.
+
+    Names prefixed with "-" are excluded; without any plain name, every
+    family but the excluded ones is collected. "all" names every family.
+    """
+    included: set[str] = set()
+    excluded: set[str] = set()
+    for part in raw.split(","):
+        name = part.strip().lower()
+        if not name:
+            continue
+        target = excluded if name.startswith("-") else included
+        name = name.lstrip("-")
+        if name == "all":
+            target.update(ALL_METRIC_FAMILIES)
+        elif name in ALL_METRIC_FAMILIES:
+            target.add(name)
+        else:
+            errors.append(
+                f"METRIC_FAMILIES entries must be one of "
+                f"{', '.join(ALL_METRIC_FAMILIES)}, got {part.strip()!r}"
+            )
+    if not included:
+        included.update(ALL_METRIC_FAMILIES)
+    return tuple(f for f in ALL_METRIC_FAMILIES if f in included - excluded)
+
+
+def parse_lookback_hours(raw: str, errors: list[str]) -> tuple[int, ...]:
+    """Parses a comma-separated list of positive hour counts.
+
+    Invalid entries are reported in errors; an empty list defaults to (24,).
+    """
+    hours: list[int] = []
+    for part in raw.split(","):
+        part = part.strip()  # noqa: PLW2901
+        if not part:
+            continue
+        if not part.isdigit() or int(part) == 0:
+            errors.append(
+                f"TIME_ENTRIES_LOOKBACK_HOURS_LIST entries must be positive "
+                f"integers, got {part!r}"
+            )
+            continue
+        if int(part) not in hours:
+            hours.append(int(part))
+    return tuple(hours) or ExporterConfig.time_entries_lookback_hours
+
+
+def parse_buckets(raw: str, errors: list[str]) -> tuple[float, ...]:
+    """Parses comma-separated histogram bucket bounds in seconds.
+
+    Bounds are sorted and deduplicated; +Inf is always implied. An empty list
+    keeps the default buckets.
+    """
+    bounds: set[float] = set()
+    for part in raw.split(","):
+        part = part.strip()  # noqa: PLW2901
+        if not part:
+            continue
+        try:
+            bound = float(part)
+        except ValueError:
+            bound = -1.0
+        if not 0 < bound < float("inf"):
+            errors.append(
+                f"TIME_ENTRY_DURATION_BUCKETS entries must be positive numbers, "
+                f"got {part!r}"
+            )
+            continue
+        bounds.add(bound)
+    return tuple(sorted(bounds)) or ExporterConfig.entry_duration_buckets
@@ -1,39 +1,238 @@
+import argparse
 import base64
+import bisect
+import contextlib
+import dataclasses
+import functools
+import json
 import os
+import random
+import signal
+import sys
+import threading
 import time
-from datetime import datetime, timedelta, timezone
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone, tzinfo
 from http import HTTPStatus
-from typing import Optional
+from typing import Optional, TypeVar
 
 import requests
-from prometheus_client import Counter, Gauge, start_http_server
+from prometheus_client import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    push_to_gateway,
+    write_to_textfile,
+)
+from prometheus_client.core import GaugeHistogramMetricFamily, GaugeMetricFamily
+from prometheus_client.metrics import MetricWrapperBase
+from prometheus_client.registry import Collector, CollectorRegistry
+from prometheus_client.utils import floatToGoString
+
+from prometheus_toggl_track_exporter import (
+    circuit_breaker,
+    parallel,
+    profiling,
+    remote_write,
+    sharding,
+)
+from prometheus_toggl_track_exporter.config import (
+    ConfigError,
+    ExporterConfig,
+    load_timezone,
+)
+from prometheus_toggl_track_exporter.server import make_app, start_server, tls_context
 
 # --- Configuration ---
-TOGGL_API_TOKEN = os.environ.get("TOGGL_API_TOKEN")
-# Toggl API V9 Base URL
-TOGGL_API_BASE_URL = "https://api.track.toggl.com/api/v9"
-EXPORTER_PORT = int(os.environ.get("EXPORTER_PORT", "9090"))
-# Note: prometheus_client ignores this path
-METRICS_PATH = os.environ.get("METRICS_PATH", "/metrics")
-COLLECTION_INTERVAL = int(os.environ.get("COLLECTION_INTERVAL", "60"))
-# Comma-separated list of lookback periods in hours (e.g., "24,168,720")
-LOOKBACK_HOURS_STR = os.environ.get("TIME_ENTRIES_LOOKBACK_HOURS_LIST", "24")
-TIME_ENTRIES_LOOKBACK_HOURS_LIST = [
-    int(h.strip()) for h in LOOKBACK_HOURS_STR.split(",") if h.strip().isdigit()
-]
-if not TIME_ENTRIES_LOOKBACK_HOURS_LIST:
-    print(
-        "Warning: No valid lookback hours found in "
-        "TIME_ENTRIES_LOOKBACK_HOURS_LIST. Defaulting to [24]."
+# Module-level settings are applied from an ExporterConfig by configure() at
+# startup; the defaults below mirror ExporterConfig() so importing the module
+# stays cheap and free of side effects.
+CONFIG = ExporterConfig()
+TOGGL_API_TOKEN: Optional[str] = CONFIG.toggl_api_token
+TOGGL_API_BASE_URL = CONFIG.toggl_api_base_url
+EXPORTER_PORT = CONFIG.exporter_port
+METRICS_PATH = CONFIG.metrics_path
+COLLECTION_INTERVAL = CONFIG.collection_interval
+COLLECTION_INTERVAL_MIN = CONFIG.collection_interval_min or COLLECTION_INTERVAL
+COLLECTION_INTERVAL_MAX = CONFIG.collection_interval_max or COLLECTION_INTERVAL
+CYCLE_TIMEOUT = CONFIG.cycle_timeout
+TIME_ENTRIES_LOOKBACK_HOURS_LIST = list(CONFIG.time_entries_lookback_hours)
+TIMEZONE = CONFIG.timezone
+METRIC_FAMILIES = frozenset(CONFIG.metric_families)
+READY_IMMEDIATELY = CONFIG.ready_immediately
+ENTRY_DURATION_BUCKETS = list(CONFIG.entry_duration_buckets)
+STATE_FILE = CONFIG.state_file
+ENTRY_STORE_MAX_BYTES = CONFIG.entry_store_max_mb * 1024 * 1024
+ENTRY_STORE_COMPACT_INTERVAL = CONFIG.entry_store_compact_interval
+AGGREGATION_WORKERS = CONFIG.aggregation_workers
+FETCH_CONCURRENCY = CONFIG.fetch_concurrency
+REFERENCE_ACTIVE_ONLY = CONFIG.reference_active_only
+# Below this many entries, worker IPC costs more than it saves
+PARALLEL_MIN_ENTRIES = 10000
+REFERENCE_TTL = CONFIG.reference_ttl
+WORKSPACE_IDS = list(CONFIG.workspace_ids)
+ALL_WORKSPACES = CONFIG.all_workspaces
+SHARD_INDEX = CONFIG.shard_index
+SHARD_COUNT = CONFIG.shard_count
+
+
+# Metric families each data source and aggregation state part is needed for;
+# sources and parts no enabled family needs are skipped
+SOURCE_FAMILIES = {
+    "current_time_entry": {"running"},
+    "time_entries": {
+        "running",
+        "entries",
+        "performance",
+        "histogram",
+        "tags",
+        "clients",
+    },
+    "projects": {"reference", "entries", "histogram", "clients"},
+    "tasks": {"entries"},
+    "clients": {"reference", "clients"},
+    "tags": {"reference", "tags"},
+}
+PART_FAMILIES = {
+    "aggregated_durations": {"entries", "clients"},
+    "aggregated_counts": {"entries", "clients"},
+    "duration_histograms": {"histogram"},
+    "tag_totals": {"tags"},
+}
+# Families bounded by local days, which need the profile's time zone
+DAY_FAMILIES = {"running", "performance"}
+
+
+def _needed(families: set[str]) -> bool:
+    """Whether any of the metric families is enabled."""
+    return not METRIC_FAMILIES.isdisjoint(families)
+
+
+# Circuit breakers of the Toggl API endpoints, keyed by endpoint template
+_BREAKERS = circuit_breaker.CircuitBreakers(
+    CONFIG.circuit_breaker_threshold,
+    CONFIG.circuit_breaker_open_seconds,
+    CONFIG.circuit_breaker_max_open_seconds,
+)
+
+
+def configure(config: ExporterConfig) -> None:
+    """Applies a validated configuration to the module settings."""
+    global CONFIG, TOGGL_API_TOKEN, TOGGL_API_BASE_URL, EXPORTER_PORT  # noqa: PLW0603
+    global METRICS_PATH, COLLECTION_INTERVAL, TIME_ENTRIES_LOOKBACK_HOURS_LIST  # noqa: PLW0603
+    global CYCLE_TIMEOUT, TIMEZONE, METRIC_FAMILIES  # noqa: PLW0603
+    global COLLECTION_INTERVAL_MIN, COLLECTION_INTERVAL_MAX  # noqa: PLW0603
+    global READY_IMMEDIATELY, WORKSPACE_IDS, ALL_WORKSPACES  # noqa: PLW0603
+    global ENTRY_DURATION_BUCKETS, STATE_FILE, REFERENCE_TTL  # noqa: PLW0603
+    global ENTRY_STORE_MAX_BYTES, ENTRY_STORE_COMPACT_INTERVAL  # noqa: PLW0603
+    global AGGREGATION_WORKERS, FETCH_CONCURRENCY, REFERENCE_ACTIVE_ONLY  # noqa: PLW0603
+    global SHARD_INDEX, SHARD_COUNT  # noqa: PLW0603
+    CONFIG = config
+    TOGGL_API_TOKEN = config.toggl_api_token
+    TOGGL_API_BASE_URL = config.toggl_api_base_url
+    EXPORTER_PORT = config.exporter_port
+    METRICS_PATH = config.metrics_path
+    COLLECTION_INTERVAL = config.collection_interval
+    COLLECTION_INTERVAL_MIN = config.collection_interval_min or COLLECTION_INTERVAL
+    COLLECTION_INTERVAL_MAX = config.collection_interval_max or COLLECTION_INTERVAL
+    CYCLE_TIMEOUT = config.cycle_timeout
+    TIME_ENTRIES_LOOKBACK_HOURS_LIST = list(config.time_entries_lookback_hours)
+    TIMEZONE = config.timezone
+    METRIC_FAMILIES = frozenset(config.metric_families)
+    READY_IMMEDIATELY = config.ready_immediately
+    ENTRY_DURATION_BUCKETS = list(config.entry_duration_buckets)
+    STATE_FILE = config.state_file
+    ENTRY_STORE_MAX_BYTES = config.entry_store_max_mb * 1024 * 1024
+    ENTRY_STORE_COMPACT_INTERVAL = config.entry_store_compact_interval
+    AGGREGATION_WORKERS = config.aggregation_workers
+    FETCH_CONCURRENCY = config.fetch_concurrency
+    REFERENCE_ACTIVE_ONLY = config.reference_active_only
+    REFERENCE_TTL = config.reference_ttl
+    WORKSPACE_IDS = list(config.workspace_ids)
+    ALL_WORKSPACES = config.all_workspaces
+    SHARD_INDEX = config.shard_index
+    SHARD_COUNT = config.shard_count
+    _BREAKERS.configure(
+        config.circuit_breaker_threshold,
+        config.circuit_breaker_open_seconds,
+        config.circuit_breaker_max_open_seconds,
     )
-    TIME_ENTRIES_LOOKBACK_HOURS_LIST = [24]
+
 
 # --- Metrics Definitions ---
 TOGGL_API_ERRORS = Counter(
-    "toggl_api_errors", "Number of Toggl API errors encountered", ["endpoint"]
+    "toggl_api_errors",
+    "Number of Toggl API errors encountered",
+    ["endpoint"],
+    registry=None,
 )
 TOGGL_SCRAPE_DURATION = Gauge(
-    "toggl_scrape_duration_seconds", "Time taken to collect Toggl metrics"
+    "toggl_scrape_duration_seconds",
+    "Time taken to collect Toggl metrics",
+    registry=None,
+)
+TOGGL_COLLECTION_INTERVAL = Gauge(
+    "toggl_collection_interval_seconds",
+    "Current interval between collection cycles",
+    registry=None,
+)
+TOGGL_CYCLE_DEADLINE_SECONDS = Gauge(
+    "toggl_cycle_deadline_seconds",
+    "Time budget of a collection cycle",
+    registry=None,
+)
+TOGGL_CYCLE_DEADLINE_EXCEEDED = Counter(
+    "toggl_cycle_deadline_exceeded",
+    "Number of collection cycles that ran out of time before all data was fetched",
+    registry=None,
+)
+TOGGL_API_REQUESTS_ABANDONED = Counter(
+    "toggl_api_requests_abandoned",
+    "Number of Toggl API requests skipped or cancelled at the cycle deadline",
+    ["endpoint", "reason"],
+    registry=None,
+)
+
+TOGGL_ENTRY_STORE_ENTRIES = Gauge(
+    "toggl_entry_store_entries",
+    "Time entries held in the entry store",
+    registry=None,
+)
+TOGGL_ENTRY_STORE_BYTES = Gauge(
+    "toggl_entry_store_bytes",
+    "Estimated memory held by the entries of the entry store",
+    registry=None,
+)
+TOGGL_ENTRY_STORE_BUDGET_BYTES = Gauge(
+    "toggl_entry_store_budget_bytes",
+    "Memory budget of the entry store (0: unbounded)",
+    registry=None,
+)
+TOGGL_ENTRY_STORE_EVICTED = Counter(
+    "toggl_entry_store_evicted_entries",
+    "Entries evicted from the entry store, by reason (age or budget)",
+    ["reason"],
+    registry=None,
+)
+TOGGL_ENTRY_STORE_COMPLETE_SINCE = Gauge(
+    "toggl_entry_store_complete_since_timestamp_seconds",
+    "Start time after which the entry store holds every entry; windows "
+    "reaching back further are fetched from the API",
+    registry=None,
+)
+
+TOGGL_SHARD_INFO = Gauge(
+    "toggl_shard_info",
+    "Shard assignment of this exporter replica",
+    ["shard_index", "shard_count"],
+    registry=None,
+)
+TOGGL_SHARD_OWNED_WORKSPACES = Gauge(
+    "toggl_shard_owned_workspaces",
+    "Number of workspaces collected by this exporter replica",
+    registry=None,
 )
 
 # User metrics
@@ -41,67 +240,67 @@ TOGGL_USER_INFO = Gauge(
     "toggl_user_info",
     "User information from the /me endpoint",
     ["user_id", "email", "fullname", "timezone"],
+    registry=None,
 )
 TOGGL_USER_ACTIVE = Gauge(
     "toggl_user_active",
     "Indicates if the user account is active (1=active, 0=inactive)",
     ["user_id"],
+    registry=None,
 )
 TOGGL_USER_HAS_PASSWORD = Gauge(
     "toggl_user_has_password",
     "Indicates if the user has a password set (1=yes, 0=no)",
     ["user_id"],
+    registry=None,
 )
 # Gauges for boolean-like settings (treat strings like 'true'/'false' as 1/0)
 TOGGL_USER_SEND_PRODUCT_EMAILS = Gauge(
     "toggl_user_send_product_emails",
     "User preference for receiving product emails (1=yes, 0=no)",
     ["user_id"],
+    registry=None,
 )
 TOGGL_USER_SEND_TIMER_NOTIFICATIONS = Gauge(
     "toggl_user_send_timer_notifications",
     "User preference for receiving timer notifications (1=yes, 0=no)",
     ["user_id"],
+    registry=None,
 )
 TOGGL_USER_SEND_WEEKLY_REPORT = Gauge(
     "toggl_user_send_weekly_report",
     "User preference for receiving weekly reports (1=yes, 0=no)",
     ["user_id"],
+    registry=None,
 )
 
 # Currently running time entry metrics
+RUNNING_ENTRY_LABELS = [
+    "workspace_id",
+    "project_id",
+    "project_name",
+    "task_id",
+    "task_name",
+    "description",
+    "tags",
+    "billable",
+]
 TOGGL_TIME_ENTRY_RUNNING = Gauge(
     "toggl_time_entry_running",
     "Indicates if a time entry is currently running (1=running, 0=stopped)",
-    [
-        "workspace_id",
-        "project_id",
-        "project_name",
-        "task_id",
-        "task_name",
-        "description",
-        "tags",
-        "billable",
-    ],
+    RUNNING_ENTRY_LABELS,
+    registry=None,
 )
 TOGGL_TIME_ENTRY_START_TIMESTAMP = Gauge(
     "toggl_time_entry_start_timestamp",
     "Start time of the current running time entry (Unix timestamp)",
-    [
-        "workspace_id",
-        "project_id",
-        "project_name",
-        "task_id",
-        "task_name",
-        "description",
-        "tags",
-        "billable",
-    ],
+    RUNNING_ENTRY_LABELS,
+    registry=None,
 )
 
 # Aggregate metrics
 TOGGL_PROJECTS_TOTAL = Gauge(
-    "toggl_projects_total", "Total number of projects", ["workspace_id"]
+    "toggl_projects_total", "Total number of projects", ["workspace_id"], registry=None
 )
 TOGGL_PROJECT_INFO = Gauge(
     "toggl_project_info",
@@ -117,16 +316,26 @@ TOGGL_PROJECT_INFO = Gauge(
         "is_private",
         "color",
     ],
+    registry=None,
 )
 TOGGL_CLIENTS_TOTAL = Gauge(
-    "toggl_clients_total", "Total number of clients", ["workspace_id"]
+    "toggl_clients_total", "Total number of clients", ["workspace_id"], registry=None
 )
 TOGGL_CLIENT_INFO = Gauge(
     "toggl_client_info",
     "Information about individual clients",
     ["workspace_id", "client_id", "client_name"],
+    registry=None,
+)
+TOGGL_TAGS_TOTAL = Gauge(
+    "toggl_tags_total", "Total number of tags", ["workspace_id"], registry=None
+)
+TOGGL_TAG_INFO = Gauge(
+    "toggl_tag_info",
+    "Information about individual tags",
+    ["workspace_id", "tag_id", "tag_name"],
+    registry=None,
 )
-TOGGL_TAGS_TOTAL = Gauge("toggl_tags_total", "Total number of tags", ["workspace_id"])
 
 # Time Entry Aggregates (over lookback period)
 TIME_ENTRY_LABELS = [
@@ -143,11 +352,13 @@ TOGGL_TIME_ENTRIES_DURATION_SECONDS = Gauge(
     "toggl_time_entries_duration_seconds",
     "Total duration of completed time entries in the lookback period",
     TIME_ENTRY_LABELS,
+    registry=None,
 )
 TOGGL_TIME_ENTRIES_COUNT = Gauge(
     "toggl_time_entries_count",
     "Number of completed time entries in the lookback period",
     TIME_ENTRY_LABELS,
+    registry=None,
 )
 
 # --- New Time Entry Performance Metrics ---
@@ -159,28 +370,187 @@ TOGGL_TIME_ENTRIES_AVG_DURATION_SECONDS = Gauge(
     "toggl_time_entries_avg_duration_seconds",
     "Average duration of completed time entries in the lookback period",
     PERFORMANCE_LABELS,
+    registry=None,
 )
 TOGGL_TIME_ENTRIES_BILLABLE_RATIO = Gauge(
     "toggl_time_entries_billable_ratio",
     "Ratio of billable time duration to total time duration in the lookback period "
     "(0.0 to 1.0)",
     PERFORMANCE_LABELS,
+    registry=None,
 )
 TOGGL_DAYS_WITH_TIME_ENTRIES_COUNT = Gauge(
     "toggl_days_with_time_entries_count",
     "Number of distinct days with completed time entries in the lookback period",
     PERFORMANCE_LABELS,
+    registry=None,
 )
 TOGGL_TIME_ENTRIES_UNTAGGED_DURATION_SECONDS = Gauge(
     "toggl_time_entries_untagged_duration_seconds",
     "Total duration of completed time entries with no tags in the lookback period",
     PERFORMANCE_LABELS,
+    registry=None,
 )
 TOGGL_TIME_ENTRIES_UNTAGGED_COUNT = Gauge(
     "toggl_time_entries_untagged_count",
     "Number of completed time entries with no tags in the lookback period",
     PERFORMANCE_LABELS,
+    registry=None,
+)
+
+# Per-tag aggregates: one series per tag instead of per tag combination
+TAG_LABELS = ["workspace_id", "tag_id", "tag_name", "timeframe"]
+TOGGL_TAG_TIME_ENTRIES_DURATION_SECONDS = Gauge(
+    "toggl_tag_time_entries_duration_seconds",
+    "Total duration of completed time entries with the tag in the lookback period",
+    TAG_LABELS,
+    registry=None,
+)
+TOGGL_TAG_TIME_ENTRIES_COUNT = Gauge(
+    "toggl_tag_time_entries_count",
+    "Number of completed time entries with the tag in the lookback period",
+    TAG_LABELS,
+    registry=None,
+)
+
+# Per-client rollups, via the project -> client index
+CLIENT_LABELS = ["workspace_id", "client_id", "client_name", "timeframe"]
+TOGGL_CLIENT_TIME_ENTRIES_DURATION_SECONDS = Gauge(
+    "toggl_client_time_entries_duration_seconds",
+    "Total duration of completed time entries per client in the lookback period",
+    CLIENT_LABELS,
+    registry=None,
 )
+TOGGL_CLIENT_TIME_ENTRIES_BILLABLE_DURATION_SECONDS = Gauge(
+    "toggl_client_time_entries_billable_duration_seconds",
+    "Billable duration of completed time entries per client in the lookback period",
+    CLIENT_LABELS,
+    registry=None,
+)
+TOGGL_CLIENT_TIME_ENTRIES_COUNT = Gauge(
+    "toggl_client_time_entries_count",
+    "Number of completed time entries per client in the lookback period",
+    CLIENT_LABELS,
+    registry=None,
+)
+
+# --- Scrape-time Metrics ---
+
+# Last known running entry as {"labels": {...}, "start": unix_ts}, or None.
+# Replaced wholesale by the collection loop so scrapes never see partial state.
+_RUNNING_ENTRY: Optional[dict] = None
+# Completed duration today per workspace ID, as (local_date, seconds).
+_TODAY_COMPLETED: dict[str, tuple[date, float]] = {}
+# Time zone whose midnights bound days, resolved once per cycle
+_BUCKET_TZ: tzinfo = timezone.utc
+
+
+class LiveTimerCollector(Collector):
+    """Computes running-timer derived values at scrape time.
+
+    The running entry and today's completed total are captured by the
+    collection loop; elapsed time is derived from the scrape's clock so the
+    values are fresh on every scrape without extra API calls.
+    """
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        now = datetime.now(_BUCKET_TZ)
+        running = _RUNNING_ENTRY
+        today_completed = dict(_TODAY_COMPLETED)
+
+        elapsed = GaugeMetricFamily(
+            "toggl_time_entry_elapsed_seconds",
+            "Elapsed time of the current running time entry, computed at scrape time",
+            labels=RUNNING_ENTRY_LABELS,
+        )
+        today_total = GaugeMetricFamily(
+            "toggl_today_duration_seconds",
+            "Total tracked duration today including the running time entry",
+            labels=["workspace_id"],
+        )
+
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        today_totals = {
+            ws_id: seconds if day == now.date() else 0.0
+            for ws_id, (day, seconds) in today_completed.items()
+        }
+
+        if running is not None:
+            labels = running["labels"]
+            start_ts = running["start"]
+            elapsed.add_metric(
+                [labels[name] for name in RUNNING_ENTRY_LABELS],
+                max(now.timestamp() - start_ts, 0.0),
+            )
+            ws_id = labels["workspace_id"]
+            if ws_id in today_totals:
+                since = max(start_ts, midnight.timestamp())
+                today_totals[ws_id] += max(now.timestamp() - since, 0.0)
+
+        for ws_id, seconds in today_totals.items():
+            today_total.add_metric([ws_id], seconds)
+
+        yield elapsed
+        yield today_total
+
+
+# Entry duration distributions per (workspace_id, timeframe) scope, as
+# (bucket upper bounds, {label_key: (per-bucket counts, duration sum)}).
+# The last count is the +Inf bucket. Filled by the aggregation pass.
+_DURATION_HISTOGRAMS: dict[
+    tuple[str, str], tuple[tuple[float, ...], dict[tuple, tuple[list[int], float]]]
+] = {}
+DURATION_HISTOGRAM_LABELS = ["workspace_id", "project_id", "project_name", "timeframe"]
+
+
+class EntryDurationHistogramCollector(Collector):
+    """Exports entry duration distributions as gauge histograms.
+
+    The entries in a lookback window come and go as the window moves, so the
+    bucket counts are a snapshot (gauge histogram) rather than a counter.
+    """
+
+    def collect(self) -> Iterator[GaugeHistogramMetricFamily]:
+        family = GaugeHistogramMetricFamily(
+            "toggl_time_entry_duration_seconds",
+            "Distribution of completed time entry durations in the lookback period",
+            labels=DURATION_HISTOGRAM_LABELS,
+        )
+        for bounds, series in list(_DURATION_HISTOGRAMS.values()):
+            for label_key, (counts, total) in series.items():
+                cumulative = 0
+                buckets = []
+                for bound, count in zip([*bounds, float("inf")], counts):
+                    cumulative += count
+                    buckets.append((floatToGoString(bound), cumulative))
+                family.add_metric(list(label_key), buckets, total)
+        yield family
+
+
+# Set once the first collection cycle has finished
+FIRST_COLLECTION_DONE = threading.Event()
+
+# Registries the metrics above have been registered with
+_REGISTERED_TO: list[CollectorRegistry] = []
+
+
+def register_metrics(registry: CollectorRegistry = REGISTRY) -> None:
+    """Registers the exporter's metrics and collectors with a registry.
+
+    Metrics are created unregistered at import time; registration happens once
+    at startup. Calling this again for the same registry is a no-op.
+    """
+    if any(r is registry for r in _REGISTERED_TO):
+        return
+    for obj in list(globals().values()):
+        if isinstance(obj, MetricWrapperBase):
+            registry.register(obj)
+    registry.register(LiveTimerCollector())
+    registry.register(EntryDurationHistogramCollector())
+    registry.register(SourceFreshnessCollector())
+    registry.register(circuit_breaker.CircuitBreakerCollector(_BREAKERS))
+    _REGISTERED_TO.append(registry)
+
 
 # --- Helper Functions ---
 
@@ -195,49 +565,147 @@ def _get_auth_header() -> dict[str, str]:
     return {"Authorization": f"Basic {encoded_creds}"}
 
 
-def _make_toggl_request(
-    endpoint: str, method: str = "GET", params: Optional[dict] = None
+# Upper bound of a single Toggl API request
+REQUEST_TIMEOUT_SECONDS = 30
+# Bytes read at a time from a response while a cycle deadline is set
+RESPONSE_CHUNK_BYTES = 65536
+
+# time.monotonic() deadline of the running collection cycle (None outside one)
+_CYCLE_DEADLINE: Optional[float] = None
+# Sources whose fetch was skipped or cancelled at the current cycle's deadline
+_DEADLINE_MISSED: set[tuple[str, str]] = set()
+# Sources whose fetch in the current cycle failed on an open circuit breaker
+# (rejected by it, or opening it); they are stale but do not fail the cycle
+_CIRCUIT_OPEN: set[tuple[str, str]] = set()
+
+
+class _DeadlineExceededError(Exception):
+    """Raised when the cycle deadline passes while a response is read."""
+
+
+def _deadline_remaining() -> Optional[float]:
+    """Seconds left until the cycle deadline, or None outside a cycle."""
+    if _CYCLE_DEADLINE is None:
+        return None
+    return _CYCLE_DEADLINE - time.monotonic()
+
+
+def _deadline_expired() -> bool:
+    remaining = _deadline_remaining()
+    return remaining is not None and remaining <= 0
+
+
+def _read_before_deadline(response: requests.Response) -> bytes:
+    """Reads a streamed response body, closing it if the deadline passes."""
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=RESPONSE_CHUNK_BYTES):
+        body += chunk
+        if _deadline_expired():
+            response.close()
+            raise _DeadlineExceededError
+    return bytes(body)
+
+
+def _abandon_request(endpoint: str, reason: str) -> None:
+    print(f"Cycle deadline reached: {reason} Toggl API request to {endpoint}")
+    endpoint_label = endpoint.lstrip("/").split("/")[0]
+    TOGGL_API_REQUESTS_ABANDONED.labels(endpoint=endpoint_label, reason=reason).inc()
+
+
+def _make_toggl_request(  # noqa: PLR0911, PLR0912
+    endpoint: str,
+    method: str = "GET",
+    params: Optional[dict] = None,
+    empty: Optional[object] = None,
 ) -> Optional[dict]:
-    """Makes a request to the Toggl API."""
+    """Makes a request to the Toggl API.
+
+    Returns None if the request failed, and empty for a successful response
+    without data (no body, or JSON null). During a collection cycle, requests
+    are skipped once the cycle deadline has passed, and cancelled if it passes
+    while they are in flight. Requests to an endpoint whose circuit breaker is
+    open are skipped as well.
+    """
     url = f"{TOGGL_API_BASE_URL}{endpoint}"
+    remaining = _deadline_remaining()
+    if remaining is not None and remaining <= 0:
+        _abandon_request(endpoint, "skipped")
+        return None
+    template = circuit_breaker.endpoint_template(endpoint)
+    if not _BREAKERS.allow(template):
+        print(f"Circuit for {template} is open; skipping request to {endpoint}")
+        return None
+    timeout = REQUEST_TIMEOUT_SECONDS
+    if remaining is not None:
+        timeout = min(timeout, remaining)
     try:
         headers = _get_auth_header()
         headers["Content-Type"] = "application/json"
 
+        # Within a cycle the body is streamed so a slow response can be cut off
         response = requests.request(
-            method, url, headers=headers, params=params, timeout=30
+            method,
+            url,
+            headers=headers,
+            params=params,
+            timeout=timeout,
+            stream=remaining is not None,
         )
         # Raise HTTPError for bad responses (4xx or 5xx)
         response.raise_for_status()
 
+        data = None
         # Handle potential empty response for success codes like 204
-        if response.status_code == HTTPStatus.NO_CONTENT:
-            return None
-        if response.content:
-            return response.json()
-        else:
-            return None
+        if response.status_code != HTTPStatus.NO_CONTENT:
+            content = (
+                response.content
+                if remaining is None
+                else _read_before_deadline(response)
+            )
+            if content:
+                data = json.loads(content)
 
-    except requests.exceptions.RequestException as e:
+    except _DeadlineExceededError:
+        _BREAKERS.record_abandoned(template)
+        _abandon_request(endpoint, "cancelled")
+        return None
+    except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+        if isinstance(e, requests.exceptions.Timeout) and _deadline_expired():
+            _BREAKERS.record_abandoned(template)
+            _abandon_request(endpoint, "cancelled")
+            return None
         print(f"Error making Toggl API request to {endpoint}: {e}")
         if isinstance(e, requests.exceptions.HTTPError):
             print(f"Response status: {e.response.status_code}")
             print(f"Response body: {e.response.text}")
+        if (
+            isinstance(e, requests.exceptions.HTTPError)
+            and e.response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        ):
+            # Rate limiting says nothing about the endpoint's health
+            _BREAKERS.record_abandoned(template)
+        else:
+            _BREAKERS.record_failure(template)
         # Use first path part as endpoint label
         endpoint_label = endpoint.lstrip("/").split("/")[0]
         TOGGL_API_ERRORS.labels(endpoint=endpoint_label).inc()
         return None
     except ValueError as e:  # Handle missing API token
+        _BREAKERS.record_abandoned(template)
         print(f"Configuration error: {e}")
         # Optionally increment a configuration error counter if needed
         return None
     except Exception as e:  # Catch unexpected errors
+        _BREAKERS.record_failure(template)
         err_msg = f"Unexpected error during API request to {endpoint}: {e}"
         print(err_msg)
         # Use first path part as endpoint label
         endpoint_label = endpoint.lstrip("/").split("/")[0]
         TOGGL_API_ERRORS.labels(endpoint=endpoint_label).inc()
         return None
+    else:
+        _BREAKERS.record_success(template)
+        return empty if data is None else data
 
 
 def get_me() -> Optional[dict]:
@@ -246,23 +714,125 @@ def get_me() -> Optional[dict]:
 
 
 def get_current_time_entry() -> Optional[dict]:
-    """Fetches the currently running time entry."""
-    return _make_toggl_request("/me/time_entries/current")
+    """Fetches the currently running time entry.
+
+    Returns {} when no timer is running, and None if the request failed.
+    """
+    return _make_toggl_request("/me/time_entries/current", empty={})
+
+
+def get_workspaces() -> Optional[list]:
+    """Fetches the workspaces the authenticated user belongs to."""
+    return _make_toggl_request("/me/workspaces")
+
+
+# Items requested per page from paginated endpoints (the API maximum)
+PAGE_SIZE = 200
+# Safety limit on the pages walked for one list
+MAX_PAGES = 500
+
+
+def _page_items(page: object) -> tuple[Optional[list], Optional[int]]:
+    """Returns a page's items and the total item count, if the API sent one.
+
+    Pages are either bare lists or {"data": [...], "total_count": N}.
+    """
+    if isinstance(page, list):
+        return page, None
+    if isinstance(page, dict) and isinstance(page.get("data"), list):
+        return page["data"], page.get("total_count")
+    return None, None
+
+
+def _fetch_pages(
+    endpoint: str, params: dict, pages: Iterable[int]
+) -> Iterator[Optional[list]]:
+    """Fetches pages up to FETCH_CONCURRENCY at a time, yielding their items in
+    page order (None for a failed page)."""
+
+    def _fetch(page: int) -> Optional[list]:
+        response = _make_toggl_request(
+            endpoint, params={**params, "page": page, "per_page": PAGE_SIZE}
+        )
+        return _page_items(response)[0]
+
+    if FETCH_CONCURRENCY <= 1:
+        yield from map(_fetch, pages)
+        return
+    with ThreadPoolExecutor(
+        max_workers=FETCH_CONCURRENCY, thread_name_prefix="toggl-fetch"
+    ) as executor:
+        yield from executor.map(_fetch, pages)
+
+
+def _fetch_paginated(  # noqa: PLR0911
+    endpoint: str, params: Optional[dict] = None
+) -> Optional[list]:
+    """Fetches every page of a page/per_page endpoint and returns all items.
+
+    Once the first page tells the total count, the remaining pages are fetched
+    concurrently. Without a count, pages are requested FETCH_CONCURRENCY at a
+    time until one comes back short. Returns None if any page fails, so a
+    truncated list never replaces a complete snapshot.
+    """
+    params = params or {}
+    first = _make_toggl_request(
+        endpoint, params={**params, "page": 1, "per_page": PAGE_SIZE}
+    )
+    first_items, total = _page_items(first)
+    if first_items is None:
+        return None
+    items = list(first_items)
+    if len(first_items) < PAGE_SIZE:
+        return items
+
+    if total is not None:
+        last_page = min(-(-total // PAGE_SIZE), MAX_PAGES)
+        for page_items in _fetch_pages(endpoint, params, range(2, last_page + 1)):
+            if page_items is None:
+                return None
+            items.extend(page_items)
+        if last_page == MAX_PAGES:
+            print(f"Warning: stopped fetching {endpoint} after {MAX_PAGES} pages.")
+        return items
+
+    next_page = 2
+    while next_page <= MAX_PAGES:
+        last_page = min(next_page + FETCH_CONCURRENCY - 1, MAX_PAGES)
+        for page_items in _fetch_pages(
+            endpoint, params, range(next_page, last_page + 1)
+        ):
+            if page_items is None:
+                return None
+            items.extend(page_items)
+            if len(page_items) < PAGE_SIZE:
+                return items
+        next_page = last_page + 1
+    print(f"Warning: stopped fetching {endpoint} after {MAX_PAGES} pages.")
+    return items
+
+
+def _active_filter(name: str, value: str) -> dict[str, str]:
+    return {name: value} if REFERENCE_ACTIVE_ONLY else {}
 
 
 def get_projects(workspace_id: int) -> Optional[list]:
-    """Fetches projects for a given workspace."""
-    return _make_toggl_request(f"/workspaces/{workspace_id}/projects")
+    """Fetches projects for a given workspace (all pages)."""
+    return _fetch_paginated(
+        f"/workspaces/{workspace_id}/projects", _active_filter("active", "true")
+    )
 
 
 def get_clients(workspace_id: int) -> Optional[list]:
-    """Fetches clients for a given workspace."""
-    # Note: The clients endpoint might be deprecated or changed in v9.
-    # Documentation mainly shows /workspaces/{workspace_id}/clients/{client_id}
-    # Assuming a list endpoint exists, otherwise this needs adjustment.
-    # If fetching all isn't directly supported, might need
-    # iteration or reports API.
-    return _make_toggl_request(f"/workspaces/{workspace_id}/clients")
+    """Fetches all clients for a given workspace in one request."""
+    # The v9 clients list takes no page/per_page parameters and returns every
+    # client at once. It stays out of _fetch_paginated, which would ask for
+    # page 2 whenever a workspace has PAGE_SIZE or more clients and append the
+    # same list again until MAX_PAGES.
+    return _make_toggl_request(
+        f"/workspaces/{workspace_id}/clients",
+        params=_active_filter("status", "active") or None,
+    )
 
 
 def get_tags(workspace_id: int) -> Optional[list]:
@@ -271,12 +841,12 @@ def get_tags(workspace_id: int) -> Optional[list]:
 
 
 def get_tasks(workspace_id: int) -> Optional[list]:
-    """Fetches active tasks for a given workspace."""
-    # Note: The API might offer filtering options (e.g., ?active=true)
-    # or might require fetching per project if a workspace-wide endpoint
-    # for *all* tasks isn't available or is too large.
-    # Assuming a workspace-level endpoint exists for simplicity.
-    return _make_toggl_request(f"/workspaces/{workspace_id}/tasks")
+    """Fetches tasks for a given workspace (all pages)."""
+    # The workspace-wide list can be large; it is paginated and the pages
+    # after the first are fetched concurrently.
+    return _fetch_paginated(
+        f"/workspaces/{workspace_id}/tasks", _active_filter("active", "true")
+    )
 
 
 def get_time_entries(start_date: str, end_date: str) -> Optional[list]:
@@ -285,6 +855,147 @@ def get_time_entries(start_date: str, end_date: str) -> Optional[list]:
     return _make_toggl_request("/me/time_entries", params=params)
 
 
+def get_time_entries_since(since: int) -> Optional[list]:
+    """Fetches time entries modified since a UNIX timestamp, including deleted
+    ones (marked by server_deleted_at)."""
+    return _make_toggl_request("/me/time_entries", params={"since": since})
+
+
+# --- Last-known-good Snapshots ---
+
+T = TypeVar("T")
+
+# Per (source, workspace_id) state: last good "data", "last_success" and
+# "last_attempt" timestamps, "consecutive_failures" and a "stale" flag.
+_SOURCE_STATE: dict[tuple[str, str], dict] = {}
+
+
+def _fetch_source(
+    source: str,
+    workspace_label: str,
+    fetch: Callable[[], Optional[T]],
+    fresh_since: Optional[float] = None,
+) -> Optional[T]:
+    """Fetches a source, serving its last good snapshot if the fetch fails.
+
+    If the source was fetched successfully at or after fresh_since (e.g. earlier
+    in the same cycle), that data is reused without another API call.
+    Returns None only if the source has never been fetched successfully.
+    """
+    key = (source, workspace_label)
+    current = _SOURCE_STATE.get(key)
+    if (
+        fresh_since is not None
+        and current is not None
+        and not current["stale"]
+        and current["last_success"] >= fresh_since
+    ):
+        return current["data"]
+
+    open_outcomes = _BREAKERS.open_outcomes()
+    data = fetch()
+    now = time.time()
+    if data is None and _deadline_expired():
+        _DEADLINE_MISSED.add(key)
+    if data is None and _BREAKERS.open_outcomes() > open_outcomes:
+        _CIRCUIT_OPEN.add(key)
+    else:
+        _CIRCUIT_OPEN.discard(key)
+    if data is not None:
+        _SOURCE_STATE[key] = {
+            "data": data,
+            "last_success": now,
+            "last_attempt": now,
+            "consecutive_failures": 0,
+            "stale": False,
+        }
+        return data
+
+    previous = _SOURCE_STATE.get(key)
+    if previous is None:
+        _SOURCE_STATE[key] = {
+            "data": None,
+            "last_success": None,
+            "last_attempt": now,
+            "consecutive_failures": 1,
+            "stale": True,
+        }
+        return None
+
+    _SOURCE_STATE[key] = {
+        **previous,
+        "last_attempt": now,
+        "consecutive_failures": previous["consecutive_failures"] + 1,
+        "stale": True,
+    }
+    if previous["data"] is not None:
+        age = now - previous["last_success"]
+        print(f"Serving last-known-good {source} data ({age:.0f}s old).")
+    return previous["data"]
+
+
+class SourceFreshnessCollector(Collector):
+    """Exports per-source snapshot age and staleness at scrape time."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        now = time.time()
+        labels = ["source", "workspace_id"]
+        last_success = GaugeMetricFamily(
+            "toggl_source_last_success_timestamp_seconds",
+            "Unix timestamp of the last successful fetch per data source",
+            labels=labels,
+        )
+        age = GaugeMetricFamily(
+            "toggl_source_age_seconds",
+            "Age of the data currently served per data source",
+            labels=labels,
+        )
+        stale = GaugeMetricFamily(
+            "toggl_source_stale",
+            "Whether the last fetch failed and a previous snapshot is served "
+            "(1=stale, 0=fresh)",
+            labels=labels,
+        )
+        failures = GaugeMetricFamily(
+            "toggl_source_consecutive_failures",
+            "Number of consecutive failed fetches per data source",
+            labels=labels,
+        )
+        deadline_missed = GaugeMetricFamily(
+            "toggl_source_deadline_missed",
+            "Whether the last fetch of the source was skipped or cancelled at "
+            "the cycle deadline (1=missed, 0=fetched)",
+            labels=labels,
+        )
+        circuit_open = GaugeMetricFamily(
+            "toggl_source_circuit_open",
+            "Whether the last fetch of the source failed on an open circuit "
+            "breaker, which does not fail the cycle (1=open, 0=not open)",
+            labels=labels,
+        )
+
+        for (source, workspace_label), state in list(_SOURCE_STATE.items()):
+            label_values = [source, workspace_label]
+            if state["last_success"] is not None:
+                last_success.add_metric(label_values, state["last_success"])
+                age.add_metric(label_values, now - state["last_success"])
+            stale.add_metric(label_values, 1 if state["stale"] else 0)
+            failures.add_metric(label_values, state["consecutive_failures"])
+            deadline_missed.add_metric(
+                label_values, 1 if (source, workspace_label) in _DEADLINE_MISSED else 0
+            )
+            circuit_open.add_metric(
+                label_values, 1 if (source, workspace_label) in _CIRCUIT_OPEN else 0
+            )
+
+        yield last_success
+        yield age
+        yield stale
+        yield failures
+        yield deadline_missed
+        yield circuit_open
+
+
 # --- Data Processing and Metric Updates ---
 
 
@@ -302,6 +1013,90 @@ def parse_iso_datetime(dt_str: Optional[str]) -> Optional[datetime]:
         return None
 
 
+# Suffixes of UTC timestamps, which the API returns for entry start times
+_UTC_SUFFIXES = ("Z", "+00:00")
+
+
+class DayBoundaries:
+    """Local day boundaries over a window, for bucketing entries by date.
+
+    Built once per window and cycle. UTC start times, as the API returns
+    them, need no parsing or time zone conversion: a whole UTC hour inside
+    one local day is looked up by its "YYYY-MM-DDTHH" prefix, and the hours
+    that a boundary splits (zones with half-hour offsets) by a binary search
+    over the boundaries formatted the same way. Other offsets are converted.
+    """
+
+    def __init__(self, tz: tzinfo, first: date, last: date) -> None:
+        self.tz = tz
+        self.dates = tuple(
+            first + timedelta(days=i) for i in range((last - first).days + 1)
+        )
+        # Each local midnight in UTC, and the end of the last day
+        boundaries = [
+            datetime(day.year, day.month, day.day, tzinfo=tz).astimezone(timezone.utc)
+            for day in (*self.dates, last + timedelta(days=1))
+        ]
+        self.utc_starts = tuple(b.strftime("%Y-%m-%dT%H:%M:%S") for b in boundaries)
+        self.hour_dates: dict[str, date] = {}
+        one_hour = timedelta(hours=1)
+        for day, day_start, day_end in zip(self.dates, boundaries, boundaries[1:]):
+            hour = day_start.replace(minute=0, second=0, microsecond=0)
+            if hour < day_start:
+                hour += one_hour
+            while hour + one_hour <= day_end:
+                self.hour_dates[hour.strftime("%Y-%m-%dT%H")] = day
+                hour += one_hour
+
+    def date_of(self, start: str) -> Optional[date]:
+        """Returns the local date of an ISO 8601 time, or None if unparsable."""
+        if start.endswith(_UTC_SUFFIXES):
+            day = self.hour_dates.get(start[:13])
+            if day is not None:
+                return day
+            if start[10:11] == "T":
+                # Fractional seconds are dropped: boundaries fall on whole seconds
+                index = bisect.bisect_right(self.utc_starts, start[:19]) - 1
+                if 0 <= index < len(self.dates):
+                    return self.dates[index]
+        start_dt = parse_iso_datetime(start)
+        if start_dt is None:
+            return None
+        if start_dt.tzinfo is None:
+            start_dt = start_dt.replace(tzinfo=timezone.utc)
+        return start_dt.astimezone(self.tz).date()
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_day_boundaries(tz: tzinfo, first: date, last: date) -> DayBoundaries:
+    return DayBoundaries(tz, first, last)
+
+
+def _day_boundaries(start: datetime, end: datetime) -> DayBoundaries:
+    """Returns the boundaries of the local days overlapping [start, end]."""
+    return _cached_day_boundaries(
+        _BUCKET_TZ,
+        start.astimezone(_BUCKET_TZ).date(),
+        end.astimezone(_BUCKET_TZ).date(),
+    )
+
+
+def _resolve_timezone(me_data: Optional[dict]) -> None:
+    """Sets the cycle's day-boundary time zone: TIMEZONE if configured, else
+    the user's profile time zone. Without /me data the last one is kept."""
+    global _BUCKET_TZ  # noqa: PLW0603
+    name = TIMEZONE or (me_data or {}).get("timezone")
+    if not name:
+        if TIMEZONE is None and me_data is not None:
+            _BUCKET_TZ = timezone.utc
+        return
+    tz = load_timezone(name)
+    if tz is None:
+        print(f"Unknown time zone {name!r}; using UTC day boundaries.")
+        tz = timezone.utc
+    _BUCKET_TZ = tz
+
+
 def update_user_metrics(me_data: Optional[dict]) -> Optional[int]:
     """Updates metrics based on the /me endpoint data."""
     if not me_data or "id" not in me_data:
@@ -359,6 +1154,7 @@ def update_user_metrics(me_data: Optional[dict]) -> Optional[int]:
 
 def update_running_timer_metrics(entry: Optional[dict]) -> None:
     """Updates metrics based on the current time entry."""
+    global _RUNNING_ENTRY  # noqa: PLW0603
     # Resetting metrics with dynamic labels is complex.
     # prometheus_client doesn't easily remove labels by wildcard.
     # We rely on the scrape interval; if a timer stops, the next scrape
@@ -400,10 +1196,12 @@ def update_running_timer_metrics(entry: Optional[dict]) -> None:
         if start_dt:
             start_timestamp = start_dt.timestamp()
             TOGGL_TIME_ENTRY_START_TIMESTAMP.labels(**label_values).set(start_timestamp)
+            # Keep the entry so elapsed time can be computed at scrape time
+            _RUNNING_ENTRY = {"labels": label_values, "start": start_timestamp}
         else:
             # If start time is invalid, don't set the timestamp gauge
             # Consider how to handle this - maybe remove the old metric?
-            pass
+            _RUNNING_ENTRY = None
 
     else:
         # No running timer.
@@ -411,49 +1209,82 @@ def update_running_timer_metrics(entry: Optional[dict]) -> None:
         # longer present in the scrape.
         # To explicitly set a gauge to 0, one might need to track previous
         # labels or use a simpler gauge like TOGGL_ANY_TIME_ENTRY_RUNNING.
-        pass
+        _RUNNING_ENTRY = None
 
 
-def update_aggregate_metrics(workspace_id: int) -> None:
-    """Fetches and updates aggregate metrics like project, client, tag counts."""
+def update_aggregate_metrics(workspace_id: int, reference: bool = True) -> None:
+    """Fetches and updates aggregate metrics like project, client, tag counts.
+
+    Only the reference data needed by the enabled metric families is fetched.
+    With reference=False (a workspace another shard owns), only the names the
+    time entry metrics need are fetched, and no reference metrics published.
+    """
     if not workspace_id:
         print("Cannot update aggregate metrics without a workspace ID.")
         return
 
     ws_label = str(workspace_id)
+    reference = reference and "reference" in METRIC_FAMILIES
+    if reference:
+        _PUBLISHED_WORKSPACES.add(ws_label)
+
+    def _source_needed(source: str) -> bool:
+        families = SOURCE_FAMILIES[source]
+        return _needed(families if reference else families - {"reference"})
+
+    client_map: dict[int, str] = {}
+    if _source_needed("clients"):
+        client_map = _update_clients(workspace_id, ws_label, reference)
+    if _source_needed("projects"):
+        _update_projects(workspace_id, ws_label, client_map, reference)
+    if _source_needed("tags"):
+        _update_tags(workspace_id, ws_label, reference)
+
+    print(f"Updated aggregate metrics for workspace ID: {ws_label}")
+
 
-    # --- Clients ---
-    clients = get_clients(workspace_id)
+def _update_clients(
+    workspace_id: int, ws_label: str, reference: bool
+) -> dict[int, str]:
+    """Fetches clients and returns their names by ID."""
+    clients = _fetch_source(
+        "clients", ws_label, lambda: get_clients(workspace_id), _reference_fresh_since()
+    )
     client_map: dict[int, str] = {}
-    # Clear previous client info for this workspace before setting new ones
-    TOGGL_CLIENT_INFO.clear()
-    # Need to selectively clear based on workspace_id if supporting multiple
-    # For now, assumes single workspace context per run.
+    # Replace this workspace's client info, leaving other workspaces untouched
+    client_info: dict[tuple, float] = {}
 
     if clients is not None:
-        TOGGL_CLIENTS_TOTAL.labels(workspace_id=ws_label).set(len(clients))
         for client in clients:
             client_id = client.get("id")
             client_name = client.get("name", "unknown")
             if client_id is not None:
                 client_map[client_id] = client_name
-                TOGGL_CLIENT_INFO.labels(
-                    workspace_id=ws_label,
-                    client_id=str(client_id),
-                    client_name=client_name,
-                ).set(1)
+                client_info[(ws_label, str(client_id), client_name)] = 1
+        if reference:
+            TOGGL_CLIENTS_TOTAL.labels(workspace_id=ws_label).set(len(clients))
+            _publish_series(TOGGL_CLIENT_INFO, (ws_label,), client_info)
     else:
-        TOGGL_CLIENTS_TOTAL.labels(workspace_id=ws_label).set(0)
+        if reference:
+            TOGGL_CLIENTS_TOTAL.labels(workspace_id=ws_label).set(0)
         print(f"Could not fetch clients for workspace {ws_label}.")
+    return client_map
+
 
-    # --- Projects ---
-    projects = get_projects(workspace_id)
-    # Clear previous project info for this workspace
-    TOGGL_PROJECT_INFO.clear()
-    # Need selective clear if supporting multiple workspaces simultaneously.
+def _update_projects(
+    workspace_id: int, ws_label: str, client_map: dict[int, str], reference: bool
+) -> None:
+    """Fetches projects and rebuilds the workspace's project -> client index."""
+    projects = _fetch_source(
+        "projects",
+        ws_label,
+        lambda: get_projects(workspace_id),
+        _reference_fresh_since(),
+    )
+    project_info: dict[tuple, float] = {}
+    project_clients: dict[str, tuple[str, str]] = {}
 
     if projects is not None:
-        TOGGL_PROJECTS_TOTAL.labels(workspace_id=ws_label).set(len(projects))
         for project in projects:
             project_id = project.get("id")
             if project_id is None:
@@ -467,30 +1298,137 @@ def update_aggregate_metrics(workspace_id: int) -> None:
             is_private = project.get("is_private", True)  # Check default
             color = project.get("color", "unknown")
 
-            TOGGL_PROJECT_INFO.labels(
-                workspace_id=ws_label,
-                project_id=str(project_id),
-                project_name=project_name,
-                client_id=str(client_id) if client_id else "none",
-                client_name=client_name,
-                active=str(active),
-                billable=str(billable),
-                is_private=str(is_private),
-                color=color,
-            ).set(1)
+            label_values = (
+                ws_label,
+                str(project_id),
+                project_name,
+                str(client_id) if client_id else "none",
+                client_name,
+                str(active),
+                str(billable),
+                str(is_private),
+                color,
+            )
+            project_info[label_values] = 1
+            project_clients[label_values[1]] = (label_values[3], client_name)
+        _PROJECT_CLIENTS[ws_label] = project_clients
+        if reference:
+            TOGGL_PROJECTS_TOTAL.labels(workspace_id=ws_label).set(len(projects))
+            _publish_series(TOGGL_PROJECT_INFO, (ws_label,), project_info)
     else:
-        TOGGL_PROJECTS_TOTAL.labels(workspace_id=ws_label).set(0)
+        if reference:
+            TOGGL_PROJECTS_TOTAL.labels(workspace_id=ws_label).set(0)
         print(f"Could not fetch projects for workspace {ws_label}.")
 
-    # --- Tags ---
-    tags = get_tags(workspace_id)
-    # Note: No TOGGL_TAG_INFO gauge defined currently
+
+def _update_tags(workspace_id: int, ws_label: str, reference: bool) -> None:
+    """Fetches tags and records their names for the per-tag metrics."""
+    tags = _fetch_source(
+        "tags", ws_label, lambda: get_tags(workspace_id), _reference_fresh_since()
+    )
     if tags is not None:
-        TOGGL_TAGS_TOTAL.labels(workspace_id=ws_label).set(len(tags))
-    else:
+        tag_names = {
+            tag["id"]: tag.get("name", "unknown") for tag in tags if "id" in tag
+        }
+        _TAG_NAMES[ws_label] = tag_names
+        if reference:
+            TOGGL_TAGS_TOTAL.labels(workspace_id=ws_label).set(len(tags))
+            _publish_series(
+                TOGGL_TAG_INFO,
+                (ws_label,),
+                {
+                    (ws_label, str(tag_id), name): 1
+                    for tag_id, name in tag_names.items()
+                },
+            )
+    elif reference:
         TOGGL_TAGS_TOTAL.labels(workspace_id=ws_label).set(0)
 
-    print(f"Updated aggregate metrics for workspace ID: {ws_label}")
+
+# --- Scoped Series Publishing ---
+
+# Children published per (metric, scope), keyed by label tuple, where a scope
+# starts with the workspace label (e.g. (workspace_id, timeframe)). Lets one
+# scope be replaced without clearing series that belong to other workspaces
+# or timeframes, and lets unchanged series be set without metric.labels().
+_PUBLISHED_SERIES: dict[tuple[Gauge, tuple], dict[tuple, Gauge]] = {}
+# Workspaces with per-workspace totals published
+_PUBLISHED_WORKSPACES: set[str] = set()
+# Reference series published per (workspace,) scope
+REFERENCE_INFO_METRICS = (TOGGL_PROJECT_INFO, TOGGL_CLIENT_INFO, TOGGL_TAG_INFO)
+# Tag names by tag ID per workspace, from the last tags snapshot
+_TAG_NAMES: dict[str, dict[int, str]] = {}
+# (client_id, client_name) labels by project_id label per workspace, from the
+# last projects and clients snapshots
+_PROJECT_CLIENTS: dict[str, dict[str, tuple[str, str]]] = {}
+
+
+def _publish_series(metric: Gauge, scope: tuple, series: dict[tuple, float]) -> None:
+    """Sets a scope's series and removes the ones it no longer contains."""
+    children = _PUBLISHED_SERIES.setdefault((metric, scope), {})
+    if children.keys() != series.keys():
+        for label_values in children.keys() - series.keys():
+            # Already removed if the metric was cleared since
+            with contextlib.suppress(KeyError):
+                metric.remove(*label_values)
+            del children[label_values]
+    for label_values, value in series.items():
+        child = children.get(label_values)
+        if child is None:
+            child = children[label_values] = metric.labels(*label_values)
+        child.set(value)
+
+
+def _update_series(
+    metric: Gauge, scope: tuple, series: dict[tuple, Optional[float]]
+) -> None:
+    """Sets some of a scope's series, removing those whose value is None."""
+    children = _PUBLISHED_SERIES.setdefault((metric, scope), {})
+    for label_values, value in series.items():
+        child = children.get(label_values)
+        if value is None:
+            if child is not None:
+                with contextlib.suppress(KeyError):
+                    metric.remove(*label_values)
+                del children[label_values]
+            continue
+        if child is None:
+            child = children[label_values] = metric.labels(*label_values)
+        child.set(value)
+
+
+def _prune_workspaces(
+    keep: set[str], reference_keep: Optional[set[str]] = None
+) -> None:
+    """Drops series and cached state of workspaces no longer collected.
+
+    Workspaces in keep but not in reference_keep (default: keep) only lose
+    their reference metrics.
+    """
+    reference_keep = keep if reference_keep is None else reference_keep
+    for metric, scope in list(_PUBLISHED_SERIES):
+        if scope[0] not in keep or (
+            metric in REFERENCE_INFO_METRICS and scope[0] not in reference_keep
+        ):
+            _publish_series(metric, scope, {})
+            del _PUBLISHED_SERIES[(metric, scope)]
+    for ws_label in _PUBLISHED_WORKSPACES - reference_keep:
+        for metric in (TOGGL_PROJECTS_TOTAL, TOGGL_CLIENTS_TOTAL, TOGGL_TAGS_TOTAL):
+            with contextlib.suppress(KeyError):
+                metric.remove(ws_label)
+    for cache in (_TODAY_COMPLETED, _TAG_NAMES, _PROJECT_CLIENTS):
+        for ws_label in [w for w in cache if w not in keep]:
+            del cache[ws_label]
+    for scope in [s for s in _DURATION_HISTOGRAMS if s[0] not in keep]:
+        del _DURATION_HISTOGRAMS[scope]
+    for scope in [s for s in _WINDOW_AGGREGATES if s[0] not in keep]:
+        del _WINDOW_AGGREGATES[scope]
+    for ws_label in [w for w in _LABEL_CACHE if w not in keep]:
+        del _LABEL_CACHE[ws_label]
+        _WORKSPACE_MAPPINGS.pop(ws_label, None)
+    _PUBLISHED_WORKSPACES.intersection_update(reference_keep)
+    for key in [k for k in _SOURCE_STATE if k[1] and k[1] not in keep]:
+        del _SOURCE_STATE[key]
 
 
 # --- Time Entry Metrics Helpers (Refactored) ---
@@ -499,20 +1437,112 @@ def update_aggregate_metrics(workspace_id: int) -> None:
 AggregationState = dict[str, dict]
 
 
+# Per workspace: (projects, tasks) the name maps were built from, and the maps
+_WORKSPACE_MAPPINGS: dict[str, tuple] = {}
+
+# Per workspace: the name maps its cached labels were built with, and a cache
+# of (label_key, histogram_key) by (project, task, tags, billable, timeframe)
+_LABEL_CACHE: dict[str, tuple[dict, dict, dict[tuple, tuple[tuple, tuple]]]] = {}
+
+
+# Bounded: IDs of deleted projects, tasks and tags would otherwise stay
+@functools.lru_cache(maxsize=65536)
+def _id_label(value: int) -> str:
+    return sys.intern(str(value))
+
+
+def _workspace_label_cache(
+    ws_id_str: str, project_name_map: dict[int, str], task_name_map: dict[int, str]
+) -> dict[tuple, tuple[tuple, tuple]]:
+    """Returns the workspace's label cache, reset when its name maps change."""
+    cached = _LABEL_CACHE.get(ws_id_str)
+    if (
+        cached is None
+        or cached[0] is not project_name_map
+        or cached[1] is not task_name_map
+    ):
+        cached = _LABEL_CACHE[ws_id_str] = (project_name_map, task_name_map, {})
+    return cached[2]
+
+
+def _build_entry_labels(  # noqa: PLR0913
+    entry: dict,
+    ws_id_str: str,
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    tags_list: Sequence[str],
+    timeframe_label: str,
+) -> tuple[tuple, tuple]:
+    """Builds an entry's TIME_ENTRY_LABELS and histogram label tuples."""
+    proj_id = entry.get("project_id")
+    task_id = entry.get("task_id")
+    billable = entry.get("billable", False)
+    proj_name_label = (
+        project_name_map.get(proj_id, entry.get("project_name", "none"))
+        if proj_id
+        else "none"
+    )
+    task_name_label = (
+        task_name_map.get(task_id, entry.get("task_name", "none"))
+        if task_id
+        else "none"
+    )
+    proj_id_label = _id_label(proj_id) if proj_id is not None else "none"
+    task_id_label = _id_label(task_id) if task_id is not None else "none"
+    proj_name_label = sys.intern(str(proj_name_label))
+
+    label_key = (
+        ws_id_str,
+        proj_id_label,
+        proj_name_label,
+        task_id_label,
+        sys.intern(str(task_name_label)),
+        sys.intern(",".join(sorted(tags_list))),
+        sys.intern(str(billable)),
+        timeframe_label,
+    )
+    histogram_key = (ws_id_str, proj_id_label, proj_name_label, timeframe_label)
+    return label_key, histogram_key
+
+
 def _fetch_workspace_mappings(
     workspace_id: int,
 ) -> tuple[dict[int, str], dict[int, str]]:
-    """Fetches and maps project and task names for a workspace."""
+    """Fetches and maps project and task names for a workspace.
+
+    Sources no enabled metric family needs are skipped and map empty.
+    """
     print(f"Fetching projects and tasks for workspace {workspace_id}...")
-    projects = get_projects(workspace_id)
-    tasks = get_tasks(workspace_id)
+    ws_label = str(workspace_id)
+    # Reuse reference data already fetched in this cycle (or within the TTL)
+    fresh_since = _reference_fresh_since()
+    need_projects = _needed(SOURCE_FAMILIES["projects"])
+    need_tasks = _needed(SOURCE_FAMILIES["tasks"])
+    projects = (
+        _fetch_source(
+            "projects", ws_label, lambda: get_projects(workspace_id), fresh_since
+        )
+        if need_projects
+        else []
+    )
+    tasks = (
+        _fetch_source("tasks", ws_label, lambda: get_tasks(workspace_id), fresh_since)
+        if need_tasks
+        else []
+    )
+
+    cached = _WORKSPACE_MAPPINGS.get(ws_label)
+    if cached is not None and (cached[0], cached[1]) == (projects, tasks):
+        # Unchanged reference data keeps the same maps, and with them the
+        # workspace's label cache
+        return cached[2], cached[3]
 
     project_name_map: dict[int, str] = {}
     if projects:
         project_name_map = {
             proj["id"]: proj.get("name", "unknown") for proj in projects if "id" in proj
         }
-    else:
+    elif need_projects:
         print(f"Warning: Could not fetch projects for workspace {workspace_id}.")
 
     task_name_map: dict[int, str] = {}
@@ -520,14 +1550,57 @@ def _fetch_workspace_mappings(
         task_name_map = {
             task["id"]: task.get("name", "unknown") for task in tasks if "id" in task
         }
-    else:
+    elif need_tasks:
         print(
             f"Info: Could not fetch tasks for workspace {workspace_id}. "
             f"Task names might be 'none'."
         )
+    _WORKSPACE_MAPPINGS[ws_label] = (projects, tasks, project_name_map, task_name_map)
     return project_name_map, task_name_map
 
 
+def _add_tag_totals(
+    tag_totals: dict[tuple, list],
+    entry: dict,
+    ws_id_str: str,
+    tags_list: Sequence[str],
+    duration: float,
+) -> None:
+    """Adds an entry to the [duration, count] totals of each of its tags.
+
+    This is the tag -> entries inverted index reduced to what the per-tag
+    metrics need. Keys are (workspace_id, tag_id, None), the name being
+    resolved from the tags snapshot when publishing; entries carrying only
+    tag names are keyed (workspace_id, "none", tag_name).
+    """
+    tag_ids = entry.get("tag_ids")
+    if tag_ids:
+        tag_keys = [(ws_id_str, _id_label(tag_id), None) for tag_id in set(tag_ids)]
+    else:
+        tag_keys = [(ws_id_str, "none", name) for name in set(tags_list)]
+    for tag_key in tag_keys:
+        totals = tag_totals.get(tag_key)
+        if totals is None:
+            tag_totals[tag_key] = [duration, 1]
+        else:
+            totals[0] += duration
+            totals[1] += 1
+
+
+def _entry_date(
+    start: Optional[str], aggregation_state: AggregationState
+) -> Optional[date]:
+    """Returns the day an entry started on, in the window's time zone."""
+    if not start:
+        return None
+    day_boundaries = aggregation_state.get("day_boundaries")
+    if day_boundaries is not None:
+        return day_boundaries.date_of(start)
+    # Callers without a window (e.g. backfill) use the entry's own offset
+    start_dt = parse_iso_datetime(start)
+    return start_dt.date() if start_dt else None
+
+
 def _process_entry_aggregates(
     entry: dict,
     project_name_map: dict[int, str],
@@ -544,28 +1617,16 @@ def _process_entry_aggregates(
     ws_id = entry.get("workspace_id")
     if ws_id is None:
         return  # Skip entries without workspace ID
-    ws_id_str = str(ws_id)
+    ws_id_str = _id_label(ws_id)
 
     # Access aggregation dicts from the state
     ws_performance: dict[str, dict] = aggregation_state["ws_performance"]
-    aggregated_durations: dict[tuple, float] = aggregation_state["aggregated_durations"]
-    aggregated_counts: dict[tuple, int] = aggregation_state["aggregated_counts"]
 
     # Initialize workspace performance dict if first time seen
     if ws_id_str not in ws_performance:
-        ws_performance[ws_id_str] = {
-            "total_duration": 0.0,
-            "total_count": 0,
-            "billable_duration": 0.0,
-            "untagged_duration": 0.0,
-            "untagged_count": 0,
-            "entry_dates": set(),
-        }
+        ws_performance[ws_id_str] = parallel.new_performance()
 
-    proj_id = entry.get("project_id")
-    task_id = entry.get("task_id")
-    tags_list = entry.get("tags", [])
-    tags = ",".join(sorted(tags_list))
+    tags_list = entry.get("tags") or ()
     billable = entry.get("billable", False)
     start_time_str = entry.get("start")
 
@@ -575,106 +1636,569 @@ def _process_entry_aggregates(
     perf_data["total_count"] += 1
     if billable:
         perf_data["billable_duration"] += duration
-    if not tags_list:  # Check original list before joining
+    if not tags_list:
         perf_data["untagged_duration"] += duration
         perf_data["untagged_count"] += 1
-    start_dt = parse_iso_datetime(start_time_str)
-    if start_dt:
-        perf_data["entry_dates"].add(start_dt.date())
-
-    # --- Update Detailed Aggregates (existing logic adaptation) ---
-    proj_name_label = (
-        project_name_map.get(proj_id, entry.get("project_name", "none"))
-        if proj_id
-        else "none"
-    )
-    task_name_label = (
-        task_name_map.get(task_id, entry.get("task_name", "none"))
-        if task_id
-        else "none"
-    )
-    proj_id_label = str(proj_id) if proj_id is not None else "none"
-    task_id_label = str(task_id) if task_id is not None else "none"
-
-    label_key = (
+    entry_date = _entry_date(start_time_str, aggregation_state)
+    if entry_date is not None:
+        daily_durations = perf_data["daily_durations"]
+        daily_durations[entry_date] = daily_durations.get(entry_date, 0.0) + duration
+
+    # --- Update Per-Tag Totals (same pass, one key per tag) ---
+    tag_totals = aggregation_state.get("tag_totals")
+    if tag_totals is not None:
+        _add_tag_totals(tag_totals, entry, ws_id_str, tags_list, duration)
+
+    # --- Update Detailed Aggregates and Duration Histogram ---
+    # Parts left out of the state (disabled metric families) are skipped,
+    # and with both out so is building the entry's labels.
+    aggregated_durations = aggregation_state.get("aggregated_durations")
+    histograms = aggregation_state.get("duration_histograms")
+    if aggregated_durations is None and histograms is None:
+        return
+    label_key, histogram_key = _entry_labels(
+        entry,
         ws_id_str,
-        proj_id_label,
-        proj_name_label,
-        task_id_label,
-        task_name_label,
-        tags,
-        str(billable),
+        project_name_map,
+        task_name_map,
+        tags_list,
         timeframe_label,
     )
 
-    aggregated_durations[label_key] = aggregated_durations.get(label_key, 0) + duration
-    aggregated_counts[label_key] = aggregated_counts.get(label_key, 0) + 1
+    if aggregated_durations is not None:
+        aggregated_counts: dict[tuple, int] = aggregation_state["aggregated_counts"]
+        aggregated_durations[label_key] = (
+            aggregated_durations.get(label_key, 0) + duration
+        )
+        aggregated_counts[label_key] = aggregated_counts.get(label_key, 0) + 1
+
+    # Same pass, coarser labels
+    if histograms is not None:
+        bounds = aggregation_state["histogram_bounds"]
+        if histogram_key not in histograms:
+            histograms[histogram_key] = ([0] * (len(bounds) + 1), 0.0)
+        counts, total = histograms[histogram_key]
+        # Buckets are upper-inclusive (le), hence bisect_left
+        counts[bisect.bisect_left(bounds, duration)] += 1
+        histograms[histogram_key] = (counts, total + duration)
+
+
+def _entry_labels(  # noqa: PLR0913
+    entry: dict,
+    ws_id_str: str,
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    tags_list: Sequence[str],
+    timeframe_label: str,
+) -> tuple[tuple, tuple]:
+    """Returns an entry's detailed and histogram label tuples.
+
+    Label tuples are reused from earlier entries and cycles. Entries whose
+    project or task is missing from the maps take names from the entry
+    itself, so they are not cached.
+    """
+    proj_id = entry.get("project_id")
+    task_id = entry.get("task_id")
+    cacheable = (not proj_id or proj_id in project_name_map) and (
+        not task_id or task_id in task_name_map
+    )
+    if not cacheable:
+        return _build_entry_labels(
+            entry,
+            ws_id_str,
+            project_name_map,
+            task_name_map,
+            tags_list,
+            timeframe_label,
+        )
+    label_cache = _workspace_label_cache(ws_id_str, project_name_map, task_name_map)
+    cache_key = (
+        proj_id,
+        task_id,
+        tuple(tags_list),
+        entry.get("billable", False),
+        timeframe_label,
+    )
+    labels = label_cache.get(cache_key)
+    if labels is None:
+        labels = _build_entry_labels(
+            entry,
+            ws_id_str,
+            project_name_map,
+            task_name_map,
+            tags_list,
+            timeframe_label,
+        )
+        label_cache[cache_key] = labels
+    return labels
 
 
 def _set_detailed_entry_metrics(
-    aggregated_durations: dict[tuple, float], aggregated_counts: dict[tuple, int]
+    aggregated_durations: dict[tuple, float],
+    aggregated_counts: dict[tuple, int],
+    scope: tuple[str, str],
 ) -> None:
-    """Sets the detailed time entry duration and count metrics."""
-    # Clear previous metrics before setting new ones for this timeframe
-    # Note: This clears *all* labels. Selective clearing per timeframe/workspace
-    # would require storing previous labels or more complex logic.
-    TOGGL_TIME_ENTRIES_DURATION_SECONDS.clear()
-    TOGGL_TIME_ENTRIES_COUNT.clear()
-
-    for label_key, total_duration in aggregated_durations.items():
-        label_dict = dict(zip(TIME_ENTRY_LABELS, label_key))
-        TOGGL_TIME_ENTRIES_DURATION_SECONDS.labels(**label_dict).set(total_duration)
+    """Sets the detailed time entry duration and count metrics.
 
-    for label_key, count in aggregated_counts.items():
-        label_dict = dict(zip(TIME_ENTRY_LABELS, label_key))
-        TOGGL_TIME_ENTRIES_COUNT.labels(**label_dict).set(count)
+    Only series of the given (workspace_id, timeframe) scope are replaced.
+    """
+    _publish_series(TOGGL_TIME_ENTRIES_DURATION_SECONDS, scope, aggregated_durations)
+    _publish_series(TOGGL_TIME_ENTRIES_COUNT, scope, aggregated_counts)
 
 
 def _set_performance_entry_metrics(
-    ws_performance: dict[str, dict], timeframe_label: str
+    ws_performance: dict[str, dict], timeframe_label: str, workspace_label: str
 ) -> None:
-    """Sets the performance-related time entry metrics."""
-    # Clear previous metrics for this timeframe (similar caveat as above)
-    TOGGL_TIME_ENTRIES_AVG_DURATION_SECONDS.clear()
-    TOGGL_TIME_ENTRIES_BILLABLE_RATIO.clear()
-    TOGGL_DAYS_WITH_TIME_ENTRIES_COUNT.clear()
-    TOGGL_TIME_ENTRIES_UNTAGGED_DURATION_SECONDS.clear()
-    TOGGL_TIME_ENTRIES_UNTAGGED_COUNT.clear()
-
-    for ws_id_str, perf_data in ws_performance.items():
-        performance_label_dict = {
-            "workspace_id": ws_id_str,
-            "timeframe": timeframe_label,
-        }
+    """Sets the performance-related time entry metrics for one workspace."""
+    avg_durations: dict[tuple, float] = {}
+    billable_ratios: dict[tuple, float] = {}
+    distinct_days: dict[tuple, float] = {}
+    untagged_durations: dict[tuple, float] = {}
+    untagged_counts: dict[tuple, float] = {}
+
+    perf_data = ws_performance.get(workspace_label)
+    if perf_data:
+        label_values = (workspace_label, timeframe_label)
         total_count = perf_data["total_count"]
         total_duration = perf_data["total_duration"]
 
-        avg_duration = total_duration / total_count if total_count > 0 else 0
-        TOGGL_TIME_ENTRIES_AVG_DURATION_SECONDS.labels(**performance_label_dict).set(
-            avg_duration
+        avg_durations[label_values] = (
+            total_duration / total_count if total_count > 0 else 0
         )
-
-        billable_ratio = (
+        billable_ratios[label_values] = (
             perf_data["billable_duration"] / total_duration if total_duration > 0 else 0
         )
-        TOGGL_TIME_ENTRIES_BILLABLE_RATIO.labels(**performance_label_dict).set(
-            billable_ratio
+        distinct_days[label_values] = len(perf_data["daily_durations"])
+        untagged_durations[label_values] = perf_data["untagged_duration"]
+        untagged_counts[label_values] = perf_data["untagged_count"]
+
+    scope = (workspace_label, timeframe_label)
+    _publish_series(TOGGL_TIME_ENTRIES_AVG_DURATION_SECONDS, scope, avg_durations)
+    _publish_series(TOGGL_TIME_ENTRIES_BILLABLE_RATIO, scope, billable_ratios)
+    _publish_series(TOGGL_DAYS_WITH_TIME_ENTRIES_COUNT, scope, distinct_days)
+    _publish_series(
+        TOGGL_TIME_ENTRIES_UNTAGGED_DURATION_SECONDS, scope, untagged_durations
+    )
+    _publish_series(TOGGL_TIME_ENTRIES_UNTAGGED_COUNT, scope, untagged_counts)
+
+
+def _client_totals(
+    aggregated_durations: dict[tuple, float],
+    aggregated_counts: dict[tuple, int],
+    timeframe_label: str,
+    workspace_label: str,
+) -> dict[tuple, list]:
+    """Sums the detailed series by client, per client label tuple as
+    [duration, billable duration, count].
+
+    The detailed series are summed through the project -> client index;
+    entries without a project, or whose project is unknown or has no client,
+    roll up under client "none".
+    """
+    project_clients = _PROJECT_CLIENTS.get(workspace_label, {})
+    no_client = ("none", "none")
+    totals: dict[tuple, list] = {}
+    for label_key, duration in aggregated_durations.items():
+        if label_key[0] != workspace_label:
+            continue
+        client_id, client_name = project_clients.get(label_key[1], no_client)
+        label_values = (workspace_label, client_id, client_name, timeframe_label)
+        client = totals.setdefault(label_values, [0, 0, 0])
+        client[0] += duration
+        if label_key[6] == "True":
+            client[1] += duration
+        client[2] += aggregated_counts.get(label_key, 0)
+    return totals
+
+
+def _set_client_entry_metrics(
+    client_totals: dict[tuple, list], scope: tuple[str, str]
+) -> None:
+    """Sets the per-client rollups of one (workspace_id, timeframe) scope."""
+    for index, metric in enumerate(
+        (
+            TOGGL_CLIENT_TIME_ENTRIES_DURATION_SECONDS,
+            TOGGL_CLIENT_TIME_ENTRIES_BILLABLE_DURATION_SECONDS,
+            TOGGL_CLIENT_TIME_ENTRIES_COUNT,
+        )
+    ):
+        _publish_series(
+            metric,
+            scope,
+            {
+                label_values: totals[index]
+                for label_values, totals in client_totals.items()
+            },
         )
 
-        distinct_days = len(perf_data["entry_dates"])
-        TOGGL_DAYS_WITH_TIME_ENTRIES_COUNT.labels(**performance_label_dict).set(
-            distinct_days
+
+def _tag_label_values(
+    tag_key: tuple, timeframe_label: str, tag_names: dict[int, str]
+) -> tuple:
+    """Returns the per-tag label values of a tag_totals key."""
+    ws_label, tag_id, name = tag_key
+    tag_name = name if name is not None else tag_names.get(int(tag_id), "unknown")
+    return (ws_label, tag_id, tag_name, timeframe_label)
+
+
+def _set_tag_entry_metrics(
+    tag_totals: dict[tuple, list], timeframe_label: str, workspace_label: str
+) -> None:
+    """Sets the per-tag duration and count metrics for one workspace."""
+    tag_names = _TAG_NAMES.get(workspace_label, {})
+    durations: dict[tuple, float] = {}
+    counts: dict[tuple, float] = {}
+    for tag_key, (duration, count) in tag_totals.items():
+        if tag_key[0] != workspace_label:
+            continue
+        label_values = _tag_label_values(tag_key, timeframe_label, tag_names)
+        durations[label_values] = duration
+        counts[label_values] = count
+
+    scope = (workspace_label, timeframe_label)
+    _publish_series(TOGGL_TAG_TIME_ENTRIES_DURATION_SECONDS, scope, durations)
+    _publish_series(TOGGL_TAG_TIME_ENTRIES_COUNT, scope, counts)
+
+
+def _record_today_completed(
+    workspace_id: int,
+    ws_performance: dict[str, dict],
+    window_start: datetime,
+    now: datetime,
+) -> None:
+    """Stores today's completed duration for scrape-time totals.
+
+    Only windows reaching back to (local) midnight contain all of today's
+    entries.
+    """
+    local_now = now.astimezone(_BUCKET_TZ)
+    midnight = local_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window_start > midnight:
+        return
+    today = local_now.date()
+    ws_id_str = str(workspace_id)
+    perf_data = ws_performance.get(ws_id_str)
+    seconds = perf_data["daily_durations"].get(today, 0.0) if perf_data else 0.0
+    _TODAY_COMPLETED[ws_id_str] = (today, seconds)
+
+
+# --- Main Time Entry Metric Update Function (Refactored) ---
+
+
+def _state_parts() -> tuple[str, ...]:
+    """Aggregation state parts needed by the enabled metric families."""
+    return tuple(part for part, families in PART_FAMILIES.items() if _needed(families))
+
+
+def _publish_time_entry_metrics(
+    aggregation_state: AggregationState, timeframe_label: str, ws_label: str
+) -> None:
+    """Publishes one workspace's time entry metrics from an aggregation state.
+
+    Families that are disabled (or parts missing from the state) publish no
+    series, dropping any published before.
+    """
+    empty: dict = {}
+
+    def _part(key: str, family: str) -> dict:
+        if family not in METRIC_FAMILIES:
+            return empty
+        return aggregation_state.get(key, empty)
+
+    _set_detailed_entry_metrics(
+        _part("aggregated_durations", "entries"),
+        _part("aggregated_counts", "entries"),
+        (ws_label, timeframe_label),
+    )
+    _set_performance_entry_metrics(
+        _part("ws_performance", "performance"), timeframe_label, ws_label
+    )
+    _set_tag_entry_metrics(_part("tag_totals", "tags"), timeframe_label, ws_label)
+    # Kept with the state for incremental updates
+    client_totals = aggregation_state["client_totals"] = _client_totals(
+        _part("aggregated_durations", "clients"),
+        _part("aggregated_counts", "clients"),
+        timeframe_label,
+        ws_label,
+    )
+    _set_client_entry_metrics(client_totals, (ws_label, timeframe_label))
+    _publish_histograms(aggregation_state, timeframe_label, ws_label)
+
+
+def _publish_histograms(
+    aggregation_state: AggregationState, timeframe_label: str, ws_label: str
+) -> None:
+    histograms = aggregation_state.get("duration_histograms")
+    if histograms and "histogram" in METRIC_FAMILIES:
+        # A copy down to the count lists: the state is updated in place by
+        # later cycles while scrapes read the published histograms
+        _DURATION_HISTOGRAMS[(ws_label, timeframe_label)] = (
+            aggregation_state["histogram_bounds"],
+            {
+                key: (counts.copy(), total)
+                for key, (counts, total) in histograms.items()
+            },
         )
+    else:
+        _DURATION_HISTOGRAMS.pop((ws_label, timeframe_label), None)
+
+
+def _publish_time_entry_changes(
+    aggregation_state: AggregationState,
+    added: AggregationState,
+    removed: AggregationState,
+    timeframe_label: str,
+    ws_label: str,
+) -> None:
+    """Publishes only the series touched by the added and removed entries.
 
-        TOGGL_TIME_ENTRIES_UNTAGGED_DURATION_SECONDS.labels(
-            **performance_label_dict
-        ).set(perf_data["untagged_duration"])
-        TOGGL_TIME_ENTRIES_UNTAGGED_COUNT.labels(**performance_label_dict).set(
-            perf_data["untagged_count"]
+    aggregation_state already includes the change. Its parts match the
+    enabled families, as a change of families rebuilds the window.
+    """
+    scope = (ws_label, timeframe_label)
+    if "entries" in METRIC_FAMILIES:
+        durations = aggregation_state["aggregated_durations"]
+        counts = aggregation_state["aggregated_counts"]
+        keys = added["aggregated_counts"].keys() | removed["aggregated_counts"].keys()
+        _update_series(
+            TOGGL_TIME_ENTRIES_DURATION_SECONDS,
+            scope,
+            {key: durations.get(key) for key in keys},
+        )
+        _update_series(
+            TOGGL_TIME_ENTRIES_COUNT, scope, {key: counts.get(key) for key in keys}
         )
+    if "performance" in METRIC_FAMILIES:
+        _set_performance_entry_metrics(
+            aggregation_state["ws_performance"], timeframe_label, ws_label
+        )
+    if "tags" in METRIC_FAMILIES:
+        _update_tag_changes(aggregation_state, added, removed, scope)
+    if "clients" in METRIC_FAMILIES:
+        _update_client_changes(aggregation_state, added, removed, scope)
+    if added.get("duration_histograms") or removed.get("duration_histograms"):
+        _publish_histograms(aggregation_state, timeframe_label, ws_label)
 
 
-# --- Main Time Entry Metric Update Function (Refactored) ---
+def _update_tag_changes(
+    aggregation_state: AggregationState,
+    added: AggregationState,
+    removed: AggregationState,
+    scope: tuple[str, str],
+) -> None:
+    tag_totals = aggregation_state["tag_totals"]
+    tag_names = _TAG_NAMES.get(scope[0], {})
+    durations: dict[tuple, Optional[float]] = {}
+    counts: dict[tuple, Optional[float]] = {}
+    for tag_key in added["tag_totals"].keys() | removed["tag_totals"].keys():
+        label_values = _tag_label_values(tag_key, scope[1], tag_names)
+        totals = tag_totals.get(tag_key)
+        durations[label_values] = totals[0] if totals else None
+        counts[label_values] = totals[1] if totals else None
+    _update_series(TOGGL_TAG_TIME_ENTRIES_DURATION_SECONDS, scope, durations)
+    _update_series(TOGGL_TAG_TIME_ENTRIES_COUNT, scope, counts)
+
+
+def _update_client_changes(
+    aggregation_state: AggregationState,
+    added: AggregationState,
+    removed: AggregationState,
+    scope: tuple[str, str],
+) -> None:
+    """Applies the rollups of the added and removed entries to the client
+    totals and publishes the clients they touched."""
+    client_totals = aggregation_state["client_totals"]
+    changed = set()
+    for partial, sign in ((added, 1), (removed, -1)):
+        partial_totals = _client_totals(
+            partial["aggregated_durations"],
+            partial["aggregated_counts"],
+            scope[1],
+            scope[0],
+        )
+        for label_values, totals in partial_totals.items():
+            current = client_totals.setdefault(label_values, [0, 0, 0])
+            for index, value in enumerate(totals):
+                current[index] += sign * value
+            changed.add(label_values)
+    series: list[dict[tuple, Optional[float]]] = [{}, {}, {}]
+    for label_values in changed:
+        totals = client_totals[label_values]
+        if totals[2] <= 0:
+            del client_totals[label_values]
+        for index in range(3):
+            series[index][label_values] = totals[index] if totals[2] > 0 else None
+    for metric, values in zip(
+        (
+            TOGGL_CLIENT_TIME_ENTRIES_DURATION_SECONDS,
+            TOGGL_CLIENT_TIME_ENTRIES_BILLABLE_DURATION_SECONDS,
+            TOGGL_CLIENT_TIME_ENTRIES_COUNT,
+        ),
+        series,
+    ):
+        _update_series(metric, scope, values)
+
+
+def _aggregate_entries(
+    entries: list[dict],
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    timeframe_label: str,
+    days: Optional[DayBoundaries] = None,
+) -> AggregationState:
+    """Aggregates entries in one pass, in worker processes for large lists."""
+    bounds = tuple(ENTRY_DURATION_BUCKETS)
+    parts = _state_parts()
+    if AGGREGATION_WORKERS > 0 and len(entries) >= PARALLEL_MIN_ENTRIES:
+        try:
+            return parallel.aggregate_parallel(
+                entries,
+                project_name_map,
+                task_name_map,
+                timeframe_label,
+                bounds,
+                AGGREGATION_WORKERS,
+                days=days,
+                parts=parts,
+            )
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Parallel aggregation failed ({e}); aggregating in-process.")
+            parallel.shutdown_pool()
+
+    # Initialize aggregation dictionaries within a state object
+    aggregation_state: AggregationState = parallel.new_state(bounds, days, parts)
+
+    # Process each entry using the helper function
+    for entry in entries:
+        _process_entry_aggregates(
+            entry,
+            project_name_map,
+            task_name_map,
+            aggregation_state,
+            timeframe_label,
+        )
+    return aggregation_state
+
+
+# Per (workspace_id, timeframe): the entries and aggregation state of the last
+# cycle, and the settings the state was built with, so that a cycle only
+# aggregates and publishes what changed since
+_WINDOW_AGGREGATES: dict[tuple[str, str], dict] = {}
+
+
+def _window_aggregates(
+    scope: tuple[str, str],
+    entries: list[dict],
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    days: Optional[DayBoundaries],
+) -> tuple[AggregationState, Optional[tuple[AggregationState, AggregationState]]]:
+    """Returns a window's aggregation state and the (added, removed) partial
+    states it was updated with since the last cycle.
+
+    Entries are matched by ID: new and changed entries are aggregated into
+    the added state, and the previous versions of changed entries and those
+    gone from the window (deleted, or now outside it) into the removed one.
+    The window is rebuilt from all its entries, and None returned for the
+    change, when it is new, when the labels or settings it was built with
+    changed, or when so much changed that a rebuild is cheaper.
+    """
+    settings = (
+        tuple(ENTRY_DURATION_BUCKETS),
+        _state_parts(),
+        METRIC_FAMILIES,
+        _BUCKET_TZ,
+        project_name_map,
+        task_name_map,
+        _TAG_NAMES.get(scope[0]),
+        _PROJECT_CLIENTS.get(scope[0]),
+    )
+    by_id = {entry.get("id"): entry for entry in entries}
+    window = _WINDOW_AGGREGATES.get(scope)
+    added: list[dict] = []
+    removed: list[dict] = []
+    if window is not None and window["settings"] == settings:
+        previous = window["entries"]
+        for entry_id, entry in by_id.items():
+            old = previous.get(entry_id)
+            if old is not entry and old != entry:
+                added.append(entry)
+                if old is not None:
+                    removed.append(old)
+        removed.extend(e for entry_id, e in previous.items() if entry_id not in by_id)
+        # Entries leaving the window as it moves are no sign of activity
+        _POLLING["changed_entries"] += len(added)
+
+    if (
+        window is None
+        or window["settings"] != settings
+        or None in by_id
+        or len(by_id) != len(entries)
+        or len(added) + len(removed) > len(entries) // 2
+    ):
+        state = _aggregate_entries(
+            entries, project_name_map, task_name_map, scope[1], days
+        )
+        _WINDOW_AGGREGATES[scope] = {
+            "settings": settings,
+            "entries": by_id,
+            "state": state,
+        }
+        return state, None
+
+    state = window["state"]
+    window["entries"] = by_id
+    changes = []
+    for changed in (added, removed):
+        partial = parallel.new_state(state["histogram_bounds"], days, settings[1])
+        for entry in changed:
+            _process_entry_aggregates(
+                entry, project_name_map, task_name_map, partial, scope[1]
+            )
+        changes.append(partial)
+    parallel.merge_states(state, changes[0])
+    parallel.merge_states(state, changes[1], sign=-1)
+    state["day_boundaries"] = days
+    return state, (changes[0], changes[1])
+
+
+def _fetch_time_entries_window(
+    start_time: datetime, now: datetime, timeframe_label: str
+) -> Optional[list]:
+    """Fetches a lookback window's entries across all accessible workspaces.
+
+    Fetched once per cycle and shared by every workspace collected in it.
+    """
+
+    def _fetch_window() -> Optional[list]:
+        if _entry_store_covers(start_time):
+            # Served from the entry store synced once per cycle
+            return _entry_store_window(start_time, now)
+        entries = get_time_entries(
+            start_date=start_time.isoformat(timespec="seconds"),
+            end_date=now.isoformat(timespec="seconds"),
+        )
+        if entries is not None:
+            # Past the entries the store's budget holds: keep its trimmed form
+            entries = [_stored_entry(entry) for entry in entries]
+        return entries
+
+    return _fetch_source(
+        f"time_entries_{timeframe_label}",
+        "",
+        _fetch_window,
+        fresh_since=_CYCLE_STATUS["last_cycle_start"],
+    )
+
+
+def _workspaces_with_entries() -> set[int]:
+    """Workspaces with entries in the longest lookback window."""
+    lookback_hours = max(TIME_ENTRIES_LOOKBACK_HOURS_LIST)
+    now = datetime.now(timezone.utc)
+    entries = _fetch_time_entries_window(
+        now - timedelta(hours=lookback_hours), now, f"{lookback_hours}h"
+    )
+    return {entry.get("workspace_id") for entry in entries or []}
 
 
 def update_time_entries_metrics(workspace_id: int, lookback_hours: int) -> None:
@@ -693,11 +2217,7 @@ def update_time_entries_metrics(workspace_id: int, lookback_hours: int) -> None:
         f"({timeframe_label}) for workspace {workspace_id}"
     )
 
-    # Fetch mappings
-    project_name_map, task_name_map = _fetch_workspace_mappings(workspace_id)
-
-    # Fetch Time Entries (across all accessible workspaces)
-    all_entries = get_time_entries(start_date=start_date_str, end_date=end_date_str)
+    all_entries = _fetch_time_entries_window(start_time, now, timeframe_label)
 
     if all_entries is None:
         print(f"Failed to fetch time entries for {timeframe_label}, skipping update.")
@@ -707,86 +2227,550 @@ def update_time_entries_metrics(workspace_id: int, lookback_hours: int) -> None:
 
     # Filter entries for the target workspace
     entries = [e for e in all_entries if e.get("workspace_id") == workspace_id]
+    ws_label = str(workspace_id)
     if not entries:
         print(
             f"No completed time entries found for workspace {workspace_id} "
             f"in {timeframe_label}."
         )
         # Clear metrics for this specific workspace/timeframe if no entries found
-        _set_detailed_entry_metrics({}, {})  # Empty dicts clear metrics
-        _set_performance_entry_metrics({}, timeframe_label)
+        _WINDOW_AGGREGATES.pop((ws_label, timeframe_label), None)
+        _publish_time_entry_metrics({"ws_performance": {}}, timeframe_label, ws_label)
+        _record_today_completed(workspace_id, {}, start_time, now)
         return
 
-    # Initialize aggregation dictionaries within a state object
-    aggregation_state: AggregationState = {
-        "ws_performance": {},
-        "aggregated_durations": {},
-        "aggregated_counts": {},
-    }
+    # Fetch mappings, only for workspaces with entries in the window
+    project_name_map, task_name_map = _fetch_workspace_mappings(workspace_id)
 
-    # Process each entry using the helper function
-    for entry in entries:
-        _process_entry_aggregates(
-            entry,
-            project_name_map,
-            task_name_map,
-            aggregation_state,
-            timeframe_label,
-        )
+    aggregation_state, changes = _window_aggregates(
+        (ws_label, timeframe_label),
+        entries,
+        project_name_map,
+        task_name_map,
+        _day_boundaries(start_time, now),
+    )
 
-    # Set the Prometheus gauges using helper functions, extracting from state
-    _set_detailed_entry_metrics(
-        aggregation_state["aggregated_durations"],
-        aggregation_state["aggregated_counts"],
+    # Set the Prometheus gauges: every series after a rebuild, else only the
+    # ones the changed entries touched
+    if changes is None:
+        _publish_time_entry_metrics(aggregation_state, timeframe_label, ws_label)
+    else:
+        _publish_time_entry_changes(
+            aggregation_state, *changes, timeframe_label, ws_label
+        )
+    _record_today_completed(
+        workspace_id, aggregation_state["ws_performance"], start_time, now
     )
-    _set_performance_entry_metrics(aggregation_state["ws_performance"], timeframe_label)
 
     print(
-        f"Updated time entry metrics for {len(aggregation_state['aggregated_counts'])} detailed label sets "  # noqa: E501
+        f"Updated time entry metrics for {len(aggregation_state.get('aggregated_counts', {}))} detailed label sets "  # noqa: E501
         f"and {len(aggregation_state['ws_performance'])} workspaces ({timeframe_label})"
     )
 
 
+# --- Persistent State ---
+
+# Time entries of the longest lookback window, keyed by entry ID string, kept
+# in sync incrementally via the `since` parameter and saved with the state
+# file, if any.
+# Entries are trimmed to STORED_ENTRY_FIELDS; "bytes" estimates the memory
+# they hold, and the store holds every entry starting after "complete_since"
+# (the longest window's start, or later once entries were evicted to fit
+# ENTRY_STORE_MAX_BYTES).
+_ENTRY_STORE: dict = {
+    "entries": {},
+    "synced_at": None,
+    "ok": False,
+    "bytes": 0,
+    "complete_since": None,
+    "compacted_at": None,
+}
+# Re-fetch entries modified this long before the last sync (clock skew margin)
+ENTRY_STORE_OVERLAP_SECONDS = 300
+# Fields of a stored entry: what the aggregation and change detection read
+STORED_ENTRY_FIELDS = ("id", *parallel.PACKED_FIELDS)
+# Share of the budget the store is evicted down to once it exceeds it, so a
+# store at its budget does not evict on every sync
+ENTRY_STORE_LOW_WATERMARK = 0.9
+STATE_VERSION = 1
+
+
+def _reference_fresh_since() -> Optional[float]:
+    """Oldest fetch time at which reference data is reused instead of fetched.
+
+    Reference data (user, workspaces, projects, clients, tags, tasks) is
+    fetched at most once per cycle, and at most once per REFERENCE_TTL.
+    """
+    cycle_start = _CYCLE_STATUS["last_cycle_start"]
+    if REFERENCE_TTL <= 0:
+        return cycle_start
+    ttl_start = time.time() - REFERENCE_TTL
+    return ttl_start if cycle_start is None else min(cycle_start, ttl_start)
+
+
+def _reset_entry_store() -> None:
+    _ENTRY_STORE.update(
+        entries={},
+        synced_at=None,
+        ok=False,
+        bytes=0,
+        complete_since=None,
+        compacted_at=None,
+    )
+
+
+def _stored_entry(entry: dict) -> dict:
+    """Trims an API entry to the fields kept in the store."""
+    return {field: entry[field] for field in STORED_ENTRY_FIELDS if field in entry}
+
+
+def _entry_bytes(entry_id: str, entry: dict) -> int:
+    """Estimates the memory a stored entry holds (field names are shared)."""
+    size = sys.getsizeof(entry_id) + sys.getsizeof(entry)
+    for value in entry.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def _entry_start(entry: dict) -> Optional[float]:
+    start = parse_iso_datetime(entry.get("start"))
+    return None if start is None else start.timestamp()
+
+
+def _sync_entry_store() -> bool:
+    """Brings the entry store up to date, fetching only changes if possible."""
+    now = time.time()
+    horizon = now - max(TIME_ENTRIES_LOOKBACK_HOURS_LIST) * 3600
+    synced_at = _ENTRY_STORE["synced_at"]
+
+    full = synced_at is None or synced_at < horizon
+    if full:
+        entries = get_time_entries(
+            start_date=datetime.fromtimestamp(horizon, timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+            end_date=datetime.fromtimestamp(now, timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+        )
+    else:
+        entries = get_time_entries_since(int(synced_at) - ENTRY_STORE_OVERLAP_SECONDS)
+
+    _ENTRY_STORE["ok"] = entries is not None
+    if entries is None:
+        print("Failed to sync time entries; serving the last snapshot.")
+        return False
+
+    if full:
+        _ENTRY_STORE.update(entries={}, bytes=0, complete_since=horizon)
+    complete_since = max(_ENTRY_STORE["complete_since"] or horizon, horizon)
+    _ENTRY_STORE["complete_since"] = complete_since
+    store: dict[str, dict] = _ENTRY_STORE["entries"]
+    for entry in entries:
+        if "id" not in entry:
+            continue
+        entry_id = str(entry["id"])
+        previous = store.pop(entry_id, None)
+        if previous is not None:
+            _ENTRY_STORE["bytes"] -= _entry_bytes(entry_id, previous)
+        if entry.get("server_deleted_at"):
+            continue
+        start = _entry_start(entry)
+        # Entries older than the store covers would only be evicted again
+        if start is None or start < complete_since:
+            continue
+        stored = _stored_entry(entry)
+        store[entry_id] = stored
+        _ENTRY_STORE["bytes"] += _entry_bytes(entry_id, stored)
+    _ENTRY_STORE["synced_at"] = now
+
+    compacted_at = _ENTRY_STORE["compacted_at"]
+    over_budget = 0 < ENTRY_STORE_MAX_BYTES < _ENTRY_STORE["bytes"]
+    if (
+        over_budget
+        or compacted_at is None
+        or now - compacted_at >= ENTRY_STORE_COMPACT_INTERVAL
+    ):
+        _compact_entry_store(now)
+    _evict_over_budget()
+    _publish_entry_store_metrics()
+    print(
+        f"Synced time entry store: {len(entries)} changes, "
+        f"{len(_ENTRY_STORE['entries'])} entries, "
+        f"~{_ENTRY_STORE['bytes'] / 1048576:.1f} MiB."
+    )
+    return True
+
+
+def _compact_entry_store(now: float) -> None:
+    """Drops entries that fell out of every lookback window, and rebuilds the
+    store so the space of removed entries is released."""
+    complete_since = _ENTRY_STORE["complete_since"]
+    kept = {}
+    size = _ENTRY_STORE["bytes"]
+    evicted = 0
+    for entry_id, entry in _ENTRY_STORE["entries"].items():
+        start = _entry_start(entry)
+        if start is None or (complete_since is not None and start < complete_since):
+            size -= _entry_bytes(entry_id, entry)
+            evicted += 1
+        else:
+            kept[entry_id] = entry
+    _ENTRY_STORE.update(entries=kept, bytes=size, compacted_at=now)
+    if evicted:
+        TOGGL_ENTRY_STORE_EVICTED.labels(reason="age").inc(evicted)
+
+
+def _evict_over_budget() -> None:
+    """Evicts the oldest entries while the store exceeds ENTRY_STORE_MAX_BYTES.
+
+    Entries starting at or before the last evicted one are all dropped, so
+    the store stays complete after its new complete_since; windows reaching
+    back further are fetched from the API instead of the store.
+    """
+    if not 0 < ENTRY_STORE_MAX_BYTES < _ENTRY_STORE["bytes"]:
+        return
+    target = ENTRY_STORE_MAX_BYTES * ENTRY_STORE_LOW_WATERMARK
+    store = _ENTRY_STORE["entries"]
+    size = _ENTRY_STORE["bytes"]
+    cutoff = None
+    evicted = 0
+    for start, entry_id in sorted(
+        (_entry_start(entry) or 0.0, entry_id) for entry_id, entry in store.items()
+    ):
+        if size <= target and start != cutoff:
+            break
+        size -= _entry_bytes(entry_id, store.pop(entry_id))
+        cutoff = start
+        evicted += 1
+    if cutoff is None:
+        # Nothing to evict: the byte count drifted from an empty store
+        _ENTRY_STORE["bytes"] = 0
+        return
+    _ENTRY_STORE.update(bytes=size, complete_since=cutoff)
+    TOGGL_ENTRY_STORE_EVICTED.labels(reason="budget").inc(evicted)
+    print(
+        f"Entry store over its {ENTRY_STORE_MAX_BYTES / 1048576:.0f} MiB budget: "
+        f"evicted {evicted} entries; windows starting before "
+        f"{datetime.fromtimestamp(cutoff, timezone.utc).isoformat()} "
+        "are fetched directly."
+    )
+
+
+def _publish_entry_store_metrics() -> None:
+    TOGGL_ENTRY_STORE_ENTRIES.set(len(_ENTRY_STORE["entries"]))
+    TOGGL_ENTRY_STORE_BYTES.set(_ENTRY_STORE["bytes"])
+    TOGGL_ENTRY_STORE_BUDGET_BYTES.set(ENTRY_STORE_MAX_BYTES)
+    if _ENTRY_STORE["complete_since"] is not None:
+        TOGGL_ENTRY_STORE_COMPLETE_SINCE.set(_ENTRY_STORE["complete_since"])
+
+
+def _entry_store_covers(start: datetime) -> bool:
+    """Whether the store holds every entry starting from start (never before
+    its first successful sync)."""
+    complete_since = _ENTRY_STORE["complete_since"]
+    return complete_since is not None and start.timestamp() > complete_since
+
+
+def _entry_store_window(start: datetime, end: datetime) -> Optional[list]:
+    """Entries of the store starting in [start, end], or None if the last sync
+    failed (so the window's last good snapshot is served)."""
+    if not _ENTRY_STORE["ok"]:
+        return None
+    window = []
+    for entry in _ENTRY_STORE["entries"].values():
+        entry_start = parse_iso_datetime(entry.get("start"))
+        if entry_start is not None and start <= entry_start <= end:
+            window.append(entry)
+    return window
+
+
+def save_state(path: str) -> None:
+    """Atomically writes the source snapshots, entry store and circuit
+    breakers to a file."""
+    state = {
+        "version": STATE_VERSION,
+        "sources": [
+            {"source": source, "workspace_id": ws_label, **source_state}
+            for (source, ws_label), source_state in _SOURCE_STATE.items()
+        ],
+        "entry_store": {
+            "entries": _ENTRY_STORE["entries"],
+            "synced_at": _ENTRY_STORE["synced_at"],
+            "complete_since": _ENTRY_STORE["complete_since"],
+        },
+        "circuits": _BREAKERS.export(),
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not save state to {path}: {e}")
+
+
+def load_state(path: str) -> bool:
+    """Restores state written by save_state; a missing or unreadable file
+    starts cold."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable state file {path}: {e}")
+        return False
+    if state.get("version") != STATE_VERSION:
+        print(f"Ignoring state file {path} with unsupported version.")
+        return False
+
+    for item in state.get("sources", []):
+        source = item.pop("source")
+        ws_label = item.pop("workspace_id")
+        _SOURCE_STATE[(source, ws_label)] = item
+    # Endpoints that kept failing stay open across runs (--once)
+    _BREAKERS.restore(state.get("circuits", {}))
+    entry_store = state.get("entry_store", {})
+    # Entries saved before they were trimmed are trimmed on load
+    entries = {
+        entry_id: _stored_entry(entry)
+        for entry_id, entry in entry_store.get("entries", {}).items()
+    }
+    _ENTRY_STORE.update(
+        entries=entries,
+        synced_at=entry_store.get("synced_at"),
+        ok=False,
+        bytes=sum(_entry_bytes(k, v) for k, v in entries.items()),
+        complete_since=entry_store.get("complete_since"),
+        compacted_at=None,
+    )
+    _publish_entry_store_metrics()
+    return True
+
+
+# --- Collection Status ---
+
+# Timestamps of the collection loop, read by the health probes
+_CYCLE_STATUS: dict[str, Optional[float]] = {
+    "last_cycle_start": None,
+    "last_cycle_end": None,
+    "last_success": None,
+}
+# Adaptive polling: the current collection interval, and the entries added or
+# changed in the lookback windows during the current cycle
+_POLLING: dict = {"interval": None, "changed_entries": 0}
+# A cycle running longer than this many collection intervals counts as wedged
+LIVENESS_INTERVAL_FACTOR = 3
+LIVENESS_MIN_GRACE_SECONDS = 300
+
+
+def _finish_cycle(cycle_start: float, success: bool) -> None:
+    """Records the end of a cycle; it only succeeds if no source went stale.
+
+    Sources that failed on an open circuit breaker are left out: an endpoint
+    that keeps failing would otherwise fail every cycle.
+    """
+    now = time.time()
+    if success:
+        success = not any(
+            state["stale"]
+            for key, state in list(_SOURCE_STATE.items())
+            if state["last_attempt"] >= cycle_start and key not in _CIRCUIT_OPEN
+        )
+    _CYCLE_STATUS["last_cycle_end"] = now
+    if success:
+        _CYCLE_STATUS["last_success"] = now
+
+
+def health_status() -> tuple[bool, dict]:
+    """Liveness: healthy unless a collection cycle appears wedged."""
+    start = _CYCLE_STATUS["last_cycle_start"]
+    end = _CYCLE_STATUS["last_cycle_end"]
+    in_progress = start is not None and (end is None or end < start)
+    grace = max(
+        COLLECTION_INTERVAL * LIVENESS_INTERVAL_FACTOR, LIVENESS_MIN_GRACE_SECONDS
+    )
+    wedged = in_progress and time.time() - start > grace
+    return not wedged, {
+        "cycle_in_progress": in_progress,
+        "last_cycle_start": start,
+        "last_cycle_end": end,
+    }
+
+
+def readiness_status() -> tuple[bool, dict]:
+    """Readiness: ready once the first cycle completed (or at once if configured)."""
+    now = time.time()
+    first_done = FIRST_COLLECTION_DONE.is_set()
+    sources = {}
+    for (source, workspace_label), state in list(_SOURCE_STATE.items()):
+        name = f"{source}/{workspace_label}" if workspace_label else source
+        last_success = state["last_success"]
+        sources[name] = {
+            "age_seconds": now - last_success if last_success else None,
+            "stale": state["stale"],
+        }
+    return first_done or READY_IMMEDIATELY, {
+        "first_collection_done": first_done,
+        "last_successful_cycle": _CYCLE_STATUS["last_success"],
+        "sources": sources,
+    }
+
+
 # --- Main Collection Logic ---
 
 
+def _candidate_workspace_ids(default_workspace_id: Optional[int]) -> list[int]:
+    """Workspaces to collect across all shards, before shard filtering."""
+    if ALL_WORKSPACES:
+        workspaces = (
+            _fetch_source("workspaces", "", get_workspaces, _reference_fresh_since())
+            or []
+        )
+        return [ws["id"] for ws in workspaces if ws.get("id") is not None]
+    if WORKSPACE_IDS:
+        return list(WORKSPACE_IDS)
+    return [default_workspace_id] if default_workspace_id else []
+
+
+# Applies profiles requested on the /debug endpoints to collection cycles
+_PROFILER = profiling.CycleProfiler()
+
+
 def collect_metrics() -> None:
-    """Collects and exposes all Toggl metrics."""
+    """Collects and exposes all Toggl metrics.
+
+    The cycle gets CYCLE_TIMEOUT seconds (default: the collection interval).
+    Requests still outstanding then are cancelled; everything fetched so far
+    is published and skipped sources keep serving their last snapshot.
+    """
+    global _CYCLE_DEADLINE  # noqa: PLW0603
+    budget = CYCLE_TIMEOUT or COLLECTION_INTERVAL
+    TOGGL_CYCLE_DEADLINE_SECONDS.set(budget)
+    _DEADLINE_MISSED.clear()
+    _CIRCUIT_OPEN.clear()
+    _CYCLE_DEADLINE = time.monotonic() + budget
+    try:
+        with _PROFILER.cycle():
+            _collect_metrics()
+    finally:
+        if _deadline_expired():
+            print(f"Collection cycle exceeded its {budget}s deadline.")
+            TOGGL_CYCLE_DEADLINE_EXCEEDED.inc()
+        _CYCLE_DEADLINE = None
+
+
+def _collect_user_metrics(me_data: Optional[dict], owns_user: bool) -> Optional[int]:
+    """Updates the user and running timer metrics this shard owns.
+
+    Returns the user's default workspace ID, if known.
+    """
+    default_workspace_id = None
+    if owns_user and "user" in METRIC_FAMILIES:
+        # --- Update User Metrics ---
+        # This function now extracts default_workspace_id as well
+        default_workspace_id = update_user_metrics(me_data)
+    elif me_data:
+        default_workspace_id = me_data.get("default_workspace_id")
+
+    if owns_user and _needed(SOURCE_FAMILIES["current_time_entry"]):
+        # A failed fetch serves the last known entry instead of ending a
+        # running timer; None means it was never fetched successfully
+        current_entry = _fetch_source("current_time_entry", "", get_current_time_entry)
+        # --- Update Running Timer Metrics ---
+        if current_entry is not None:
+            update_running_timer_metrics(current_entry)
+    return default_workspace_id
+
+
+def _collect_workspaces(workspace_ids: list[int], entry_workspaces: list[int]) -> None:
+    """Updates the metrics of the workspaces this shard owns, and the time
+    entry metrics of entry_workspaces."""
+    collected = workspace_ids + [
+        ws for ws in entry_workspaces if ws not in workspace_ids
+    ]
+    # Names for the entries of workspaces another shard owns are fetched here
+    # too, but only for workspaces that have entries
+    with_entries: set[int] = set()
+    if entry_workspaces:
+        _sync_entry_store()
+        if len(collected) > len(workspace_ids):
+            with_entries = _workspaces_with_entries()
+
+    for workspace_id in collected:
+        print(f"Collecting workspace ID: {workspace_id}")
+        if workspace_id in workspace_ids:
+            update_aggregate_metrics(workspace_id)
+        elif workspace_id in with_entries:
+            update_aggregate_metrics(workspace_id, reference=False)
+        if workspace_id not in entry_workspaces:
+            continue
+        # Iterate through configured lookback periods
+        for lookback_hours in TIME_ENTRIES_LOOKBACK_HOURS_LIST:
+            update_time_entries_metrics(workspace_id, lookback_hours)
+    _prune_workspaces({str(ws) for ws in collected}, {str(ws) for ws in workspace_ids})
+
+
+def _collect_metrics() -> None:
+    cycle_start = time.time()
+    _CYCLE_STATUS["last_cycle_start"] = cycle_start
+    _POLLING["changed_entries"] = 0
     with TOGGL_SCRAPE_DURATION.time():
         if not TOGGL_API_TOKEN:
             print("Error: TOGGL_API_TOKEN environment variable not set.")
             # Consider setting an error gauge
+            _finish_cycle(cycle_start, success=False)
             return
 
         print("Collecting Toggl metrics...")
 
         # --- Fetch Data ---
-        me_data = get_me()
-        current_entry = get_current_time_entry()
-
-        # --- Update User Metrics ---
-        # This function now extracts default_workspace_id as well
-        default_workspace_id = update_user_metrics(me_data)
+        # User-level sources, time entries included, belong to a single
+        # shard, which also needs /me for the time zone of day-bounded
+        # metrics. Without sharding, /me finds the default workspace when
+        # none are configured (sharding requires configured workspaces).
+        owns_user = sharding.owns(sharding.USER_SHARD_KEY, SHARD_INDEX, SHARD_COUNT)
+        me_data = None
+        if not (WORKSPACE_IDS or ALL_WORKSPACES) or (
+            owns_user
+            and (
+                "user" in METRIC_FAMILIES
+                or (TIMEZONE is None and _needed(DAY_FAMILIES))
+            )
+        ):
+            # /me falls back to its last good snapshot
+            me_data = _fetch_source("me", "", get_me, _reference_fresh_since())
+        _resolve_timezone(me_data)
 
-        # --- Update Running Timer Metrics ---
-        update_running_timer_metrics(current_entry)
+        default_workspace_id = _collect_user_metrics(me_data, owns_user)
 
         # --- Update Workspace Aggregate & Time Entry Metrics ---
-        if default_workspace_id:
-            print(f"Using default workspace ID: {default_workspace_id}")
-            update_aggregate_metrics(default_workspace_id)
-            # Iterate through configured lookback periods
-            for lookback_hours in TIME_ENTRIES_LOOKBACK_HOURS_LIST:
-                update_time_entries_metrics(default_workspace_id, lookback_hours)
+        candidates = _candidate_workspace_ids(default_workspace_id)
+        workspace_ids = [
+            ws for ws in candidates if sharding.owns(str(ws), SHARD_INDEX, SHARD_COUNT)
+        ]
+        TOGGL_SHARD_OWNED_WORKSPACES.set(len(workspace_ids))
+        # Time entries are user-level data (/me/time_entries): the shard owning
+        # the user fetches them once and exports the metrics derived from them
+        # for every workspace, so their requests do not grow with the shards
+        entry_workspaces = (
+            candidates if owns_user and _needed(SOURCE_FAMILIES["time_entries"]) else []
+        )
+        if workspace_ids or entry_workspaces:
+            _collect_workspaces(workspace_ids, entry_workspaces)
         else:
-            print(
-                "Could not determine default workspace ID. "
-                "Skipping workspace-specific metrics."
-            )
-            # Clear aggregate & time entry metrics if workspace ID is missing
-            print(
-                "Clearing aggregate and time entry metrics due to missing workspace ID."
-            )
+            if candidates:
+                print("No workspaces owned by this shard.")
+            else:
+                print(
+                    "Could not determine default workspace ID. "
+                    "Skipping workspace-specific metrics."
+                )
+            # Clear aggregate & time entry metrics if no workspace is collected
+            print("Clearing aggregate and time entry metrics.")
             TOGGL_PROJECTS_TOTAL.clear()
             TOGGL_CLIENTS_TOTAL.clear()
             TOGGL_TAGS_TOTAL.clear()
@@ -798,15 +2782,470 @@ def collect_metrics() -> None:
             TOGGL_DAYS_WITH_TIME_ENTRIES_COUNT.clear()
             TOGGL_TIME_ENTRIES_UNTAGGED_DURATION_SECONDS.clear()
             TOGGL_TIME_ENTRIES_UNTAGGED_COUNT.clear()
+            _prune_workspaces(set())
 
+        _finish_cycle(cycle_start, success=bool(candidates))
         print("Finished collecting Toggl metrics.")
 
 
-def main() -> None:
-    """Main function to run the exporter."""
-    # The default registry is used, exposing metrics at /metrics
-    start_http_server(EXPORTER_PORT)
-    print(f"Toggl Track Prometheus exporter started on port {EXPORTER_PORT}")
+# Remote write sender, set up by main() when REMOTE_WRITE_URL is configured
+_REMOTE_WRITER: Optional[remote_write.RemoteWriteSender] = None
+
+
+# --- Configuration Reload ---
+
+# Settings bound at startup (server, debug endpoints, remote write sender,
+# state file); changes to them are reported and wait for a restart
+RESTART_ONLY_SETTINGS = (
+    "exporter_port",
+    "exporter_address",
+    "metrics_path",
+    "tls_cert_file",
+    "tls_key_file",
+    "basic_auth_username",
+    "basic_auth_password",
+    "http_max_connections",
+    "http_max_concurrent_scrapes",
+    "http_keepalive_timeout",
+    "ready_immediately",
+    "state_file",
+    "remote_write_url",
+    "remote_write_bearer_token",
+    "remote_write_batch_size",
+    "remote_write_queue_batches",
+    "remote_write_timeout",
+    "debug_token",
+    "profile_sample_hz",
+    "config_file",
+)
+# Sources whose contents depend on REFERENCE_ACTIVE_ONLY
+ACTIVE_FILTERED_SOURCES = {"projects", "clients", "tasks"}
+# Seconds between checks of CONFIG_FILE while waiting for the next cycle
+CONFIG_POLL_SECONDS = 1.0
+
+# Set by SIGHUP; the collection loop reloads between cycles
+_RELOAD_SIGNALLED = False
+# (mtime, size) of CONFIG_FILE when it was last read
+_CONFIG_FILE_STAMP: Optional[tuple[int, int]] = None
+
+
+def _config_file_stamp() -> Optional[tuple[int, int]]:
+    if not CONFIG.config_file:
+        return None
+    try:
+        stat = os.stat(CONFIG.config_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _request_reload(_signum: int, _frame: object) -> None:
+    global _RELOAD_SIGNALLED  # noqa: PLW0603
+    _RELOAD_SIGNALLED = True
+
+
+def watch_config() -> None:
+    """Reloads the configuration on SIGHUP and whenever CONFIG_FILE changes."""
+    global _CONFIG_FILE_STAMP  # noqa: PLW0603
+    _CONFIG_FILE_STAMP = _config_file_stamp()
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _request_reload)
+    if CONFIG.config_file:
+        print(f"Watching {CONFIG.config_file} for configuration changes")
+
+
+def _reload_pending() -> bool:
+    return _RELOAD_SIGNALLED or _config_file_stamp() != _CONFIG_FILE_STAMP
+
+
+def reload_config() -> bool:
+    """Re-reads the configuration and applies it; an invalid configuration is
+    reported and the current one kept."""
+    global _RELOAD_SIGNALLED, _CONFIG_FILE_STAMP  # noqa: PLW0603
+    _RELOAD_SIGNALLED = False
+    # Taken before reading, so a write racing the read triggers another reload
+    _CONFIG_FILE_STAMP = _config_file_stamp()
+    try:
+        config = ExporterConfig.load()
+    except ConfigError as e:
+        print(f"Configuration reload failed, keeping the current settings: {e}")
+        return False
+    if config.state_file != STATE_FILE:
+        # A --state-file override outlives reloads like the other startup settings
+        config = dataclasses.replace(config, state_file=STATE_FILE)
+    apply_config(config)
+    return True
+
+
+def apply_config(config: ExporterConfig) -> list[str]:
+    """Applies a new configuration to the running exporter between cycles.
+
+    Only state made stale by the changed settings is dropped; caches,
+    snapshots and series of everything else carry over. Returns the names of
+    the settings that changed.
+    """
+    old = CONFIG
+    pending = [
+        name
+        for name in RESTART_ONLY_SETTINGS
+        if getattr(config, name) != getattr(old, name)
+    ]
+    if pending:
+        print(
+            f"Restart required to apply {', '.join(pending)}; keeping the old values."
+        )
+        config = dataclasses.replace(
+            config, **{name: getattr(old, name) for name in pending}
+        )
+    changed = [
+        field.name
+        for field in dataclasses.fields(config)
+        if getattr(config, field.name) != getattr(old, field.name)
+    ]
+    if not changed:
+        print("Configuration unchanged.")
+        return []
+    configure(config)
+    _drop_stale_state(old, config)
+    print(f"Reloaded configuration: {', '.join(changed)} changed.")
+    return changed
+
+
+def _drop_stale_state(old: ExporterConfig, new: ExporterConfig) -> None:
+    """Drops the caches and series that old settings produced and new ones
+    would not replace."""
+    global _RUNNING_ENTRY  # noqa: PLW0603
+    if (old.toggl_api_token, old.toggl_api_base_url) != (
+        new.toggl_api_token,
+        new.toggl_api_base_url,
+    ):
+        # Another account or API: nothing fetched so far applies. Series stay
+        # until the next cycle replaces them or prunes their workspaces.
+        _SOURCE_STATE.clear()
+        _reset_entry_store()
+        _WORKSPACE_MAPPINGS.clear()
+        _LABEL_CACHE.clear()
+        _id_label.cache_clear()
+        _WINDOW_AGGREGATES.clear()
+        _BREAKERS.reset()
+    elif old.reference_active_only != new.reference_active_only:
+        for key in [k for k in _SOURCE_STATE if k[0] in ACTIVE_FILTERED_SOURCES]:
+            del _SOURCE_STATE[key]
+
+    windows = set(new.time_entries_lookback_hours)
+    if not _needed(SOURCE_FAMILIES["time_entries"]):
+        windows = set()
+    _drop_timeframes(
+        {f"{hours}h" for hours in set(old.time_entries_lookback_hours) - windows}
+    )
+    if max(new.time_entries_lookback_hours) > max(old.time_entries_lookback_hours):
+        # The store only holds the old longest window: fetch it in full again
+        _ENTRY_STORE["synced_at"] = None
+
+    disabled = set(old.metric_families) - set(new.metric_families)
+    if "user" in disabled:
+        for metric in (
+            TOGGL_USER_INFO,
+            TOGGL_USER_ACTIVE,
+            TOGGL_USER_HAS_PASSWORD,
+            TOGGL_USER_SEND_PRODUCT_EMAILS,
+            TOGGL_USER_SEND_TIMER_NOTIFICATIONS,
+            TOGGL_USER_SEND_WEEKLY_REPORT,
+        ):
+            metric.clear()
+    if "running" in disabled:
+        _RUNNING_ENTRY = None
+        _TODAY_COMPLETED.clear()
+        TOGGL_TIME_ENTRY_RUNNING.clear()
+        TOGGL_TIME_ENTRY_START_TIMESTAMP.clear()
+    if "reference" in disabled:
+        for metric in (TOGGL_PROJECTS_TOTAL, TOGGL_CLIENTS_TOTAL, TOGGL_TAGS_TOTAL):
+            metric.clear()
+        info = {TOGGL_PROJECT_INFO, TOGGL_CLIENT_INFO, TOGGL_TAG_INFO}
+        _drop_published(lambda metric, _scope: metric in info)
+
+    if (old.shard_index, old.shard_count) != (new.shard_index, new.shard_count):
+        TOGGL_SHARD_INFO.clear()
+        TOGGL_SHARD_INFO.labels(
+            shard_index=str(new.shard_index), shard_count=str(new.shard_count)
+        ).set(1)
+
+
+def _drop_published(match: Callable[[Gauge, tuple], bool]) -> None:
+    """Removes the published series of every (metric, scope) matched."""
+    for metric, scope in [key for key in _PUBLISHED_SERIES if match(*key)]:
+        _publish_series(metric, scope, {})
+        del _PUBLISHED_SERIES[(metric, scope)]
+
+
+def _drop_timeframes(timeframes: set[str]) -> None:
+    """Drops the series, snapshots and cached labels of lookback windows no
+    longer collected."""
+    if not timeframes:
+        return
+    _drop_published(lambda _metric, scope: scope[1:2] in {(t,) for t in timeframes})
+    for scope in [s for s in _DURATION_HISTOGRAMS if s[1] in timeframes]:
+        del _DURATION_HISTOGRAMS[scope]
+    for scope in [s for s in _WINDOW_AGGREGATES if s[1] in timeframes]:
+        del _WINDOW_AGGREGATES[scope]
+    for timeframe in timeframes:
+        _SOURCE_STATE.pop((f"time_entries_{timeframe}", ""), None)
+    for _, _, label_cache in _LABEL_CACHE.values():
+        for cache_key in [k for k in label_cache if k[-1] in timeframes]:
+            del label_cache[cache_key]
+
+
+# Factor the collection interval grows by with each idle cycle
+POLL_BACKOFF_FACTOR = 2
+
+
+def _collection_interval(active: bool) -> float:
+    """Seconds from the start of the cycle just finished to the next one.
+
+    Between COLLECTION_INTERVAL_MIN and COLLECTION_INTERVAL_MAX: the minimum
+    while a timer runs or entries changed in the cycle, else the previous
+    interval grown by POLL_BACKOFF_FACTOR. Without bounds this is always
+    COLLECTION_INTERVAL.
+    """
+    if active:
+        return _set_collection_interval(COLLECTION_INTERVAL_MIN)
+    previous = _POLLING["interval"] or COLLECTION_INTERVAL
+    return _set_collection_interval(previous * POLL_BACKOFF_FACTOR)
+
+
+def _set_collection_interval(interval: float) -> float:
+    """Records the interval, kept within the configured bounds."""
+    interval = min(max(interval, COLLECTION_INTERVAL_MIN), COLLECTION_INTERVAL_MAX)
+    _POLLING["interval"] = interval
+    TOGGL_COLLECTION_INTERVAL.set(interval)
+    return interval
+
+
+def _user_active() -> bool:
+    """Whether a timer is running or entries changed in the last cycle."""
+    return _RUNNING_ENTRY is not None or _POLLING["changed_entries"] > 0
+
+
+def run_collection_loop(stop_event: Optional[threading.Event] = None) -> None:
+    """Collects metrics every collection interval until stopped."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        cycle_start = time.monotonic()
+        collect_metrics()
+        FIRST_COLLECTION_DONE.set()
+        if STATE_FILE:
+            save_state(STATE_FILE)
+        if _REMOTE_WRITER is not None:
+            # Queued for the sender thread; never blocks the loop
+            _REMOTE_WRITER.enqueue_snapshot()
+        # Cycles start every interval, however long each took
+        interval = _collection_interval(_user_active())
+        delay = max(0.0, cycle_start + interval - time.monotonic())
+        print(f"Next collection in {delay:.0f} seconds.")
+        # Reloads are applied while waiting, so new bounds count at once
+        while not stop_event.wait(min(delay, CONFIG_POLL_SECONDS)):
+            if _reload_pending():
+                reload_config()
+                interval = _set_collection_interval(interval)
+            delay = cycle_start + interval - time.monotonic()
+            if delay <= 0:
+                break
+
+
+def _start_remote_write(config: ExporterConfig, background: bool = True) -> None:
+    """Sets up pushing each cycle's snapshot to the remote write endpoint."""
+    global _REMOTE_WRITER  # noqa: PLW0603
+    remote_write.register_metrics()
+    _REMOTE_WRITER = remote_write.RemoteWriteSender(
+        config.remote_write_url,
+        batch_size=config.remote_write_batch_size,
+        queue_batches=config.remote_write_queue_batches,
+        timeout=config.remote_write_timeout,
+        bearer_token=config.remote_write_bearer_token,
+    )
+    if background:
+        _REMOTE_WRITER.start()
+    print(f"Pushing metrics via remote write to {config.remote_write_url}")
+
+
+# Exit codes of --once mode
+EXIT_OK = 0
+EXIT_COLLECTION_FAILED = 1
+EXIT_OUTPUT_FAILED = 3
+# Upper bound for the time a --once run waits on a remote write flush
+ONCE_FLUSH_TIMEOUT_SECONDS = 30
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="toggl-track-exporter",
+        description="Prometheus exporter for Toggl Track. "
+        "Run `toggl-track-exporter backfill --help` for historical backfill.",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Run a single collection cycle, write or push the result and exit",
+    )
+    parser.add_argument(
+        "--textfile",
+        help="With --once, atomically write the exposition to this file "
+        "(node_exporter textfile collector, *.prom)",
+    )
+    parser.add_argument(
+        "--pushgateway", help="With --once, push the result to this Pushgateway"
+    )
+    parser.add_argument(
+        "--job", default="toggl-track-exporter", help="Pushgateway job name"
+    )
+    parser.add_argument(
+        "--state-file", help="Persist caches between runs (overrides STATE_FILE)"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="With --once, sleep a random 0..N seconds first so scheduled runs "
+        "don't all hit the API at the same moment",
+    )
+    args = parser.parse_args(argv)
+    if args.once and not (args.textfile or args.pushgateway):
+        parser.error("--once requires --textfile and/or --pushgateway")
+    return args
+
+
+def run_once(args: argparse.Namespace, config: ExporterConfig) -> int:
+    """Runs one collection cycle and writes/pushes it; returns the exit code.
+
+    The output is written even when the cycle fails (with stale data and
+    freshness metrics); the exit code then reports the failure.
+    """
+    if args.jitter > 0:
+        time.sleep(random.uniform(0, args.jitter))  # noqa: S311
+    started = time.time()
+    collect_metrics()
+    if STATE_FILE:
+        save_state(STATE_FILE)
+
+    exit_code = EXIT_OK
+    if _CYCLE_STATUS["last_success"] != _CYCLE_STATUS["last_cycle_end"]:
+        exit_code = EXIT_COLLECTION_FAILED
+
+    if args.textfile:
+        try:
+            write_to_textfile(args.textfile, REGISTRY)
+        except OSError as e:
+            print(f"Could not write {args.textfile}: {e}")
+            exit_code = EXIT_OUTPUT_FAILED
+    if args.pushgateway:
+        grouping_key = {"shard": str(SHARD_INDEX)} if SHARD_COUNT > 1 else None
+        try:
+            push_to_gateway(
+                args.pushgateway,
+                job=args.job,
+                registry=REGISTRY,
+                grouping_key=grouping_key,
+            )
+        except OSError as e:
+            print(f"Could not push to {args.pushgateway}: {e}")
+            exit_code = EXIT_OUTPUT_FAILED
+    if config.remote_write_url:
+        _start_remote_write(config, background=False)
+        _REMOTE_WRITER.enqueue_snapshot()
+        if not _REMOTE_WRITER.flush(deadline=time.time() + ONCE_FLUSH_TIMEOUT_SECONDS):
+            exit_code = EXIT_OUTPUT_FAILED
+
+    print(f"Finished in {time.time() - started:.2f}s with exit code {exit_code}.")
+    return exit_code
+
+
+def _start_http_server(config: ExporterConfig) -> None:
+    """Serves metrics, probes and the debug endpoints in the background."""
+    routes = {}
+    if config.profile_sample_hz:
+        _PROFILER.start_sampler(config.profile_sample_hz)
+    if config.debug_token:
+        # Long enough for the two cycles a memory diff spans
+        wait_timeout = 2 * COLLECTION_INTERVAL + max(
+            COLLECTION_INTERVAL * LIVENESS_INTERVAL_FACTOR, LIVENESS_MIN_GRACE_SECONDS
+        )
+        routes = profiling.debug_routes(_PROFILER, config.debug_token, wait_timeout)
+        print(f"Debug profiling endpoints enabled: {', '.join(sorted(routes))}")
+
+    ssl_context = None
+    if config.tls_cert_file:
+        try:
+            ssl_context = tls_context(config.tls_cert_file, config.tls_key_file)
+        except OSError as e:
+            print(f"Configuration error: could not load the TLS certificate: {e}")
+            raise SystemExit(2) from e
+    basic_auth = None
+    if config.basic_auth_username:
+        basic_auth = (config.basic_auth_username, config.basic_auth_password)
+
+    # The default registry is used, exposing metrics at METRICS_PATH
+    app = make_app(
+        health_status,
+        readiness_status,
+        metrics_path=METRICS_PATH,
+        routes=routes,
+        basic_auth=basic_auth,
+    )
+    start_server(
+        app,
+        EXPORTER_PORT,
+        config.exporter_address,
+        ssl_context=ssl_context,
+        scrape_paths=(METRICS_PATH,),
+        max_connections=config.http_max_connections,
+        max_concurrent_scrapes=config.http_max_concurrent_scrapes,
+        keepalive_timeout=config.http_keepalive_timeout,
+    )
+    scheme = "https" if ssl_context else "http"
+    print(
+        f"Toggl Track Prometheus exporter started on "
+        f"{scheme}://{config.exporter_address}:{EXPORTER_PORT}{METRICS_PATH}"
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Main function to run the exporter.
+
+    `toggl-track-exporter backfill ...` runs the historical backfill instead.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "backfill":
+        from prometheus_toggl_track_exporter import backfill
+
+        backfill.main(argv[1:])
+        return
+
+    args = parse_args(argv)
+    try:
+        config = ExporterConfig.load()
+    except ConfigError as e:
+        print(f"Configuration error: {e}")
+        raise SystemExit(2) from e
+    if args.state_file:
+        config = dataclasses.replace(config, state_file=args.state_file)
+    configure(config)
+    register_metrics()
+    TOGGL_SHARD_INFO.labels(
+        shard_index=str(SHARD_INDEX), shard_count=str(SHARD_COUNT)
+    ).set(1)
+    if SHARD_COUNT > 1:
+        print(f"Running as shard {SHARD_INDEX} of {SHARD_COUNT}")
+    if STATE_FILE and load_state(STATE_FILE):
+        print(f"Restored state from {STATE_FILE}")
+
+    if args.once:
+        raise SystemExit(run_once(args, config))
+
+    if config.remote_write_url:
+        _start_remote_write(config)
+    watch_config()
+
+    _start_http_server(config)
 
     if not TOGGL_API_TOKEN:
         print(
@@ -814,11 +3253,10 @@ def main() -> None:
             "Exporter will not collect metrics."
         )
 
-    # Collect metrics on a schedule
-    while True:
-        collect_metrics()
-        print(f"Next collection in {COLLECTION_INTERVAL} seconds.")
-        time.sleep(COLLECTION_INTERVAL)
+    # Collect metrics on a schedule. The server is already up, and each source
+    # is published as the first cycle completes it; READY_IMMEDIATELY only
+    # changes when the readiness probe passes.
+    run_collection_loop()
 
 
 if __name__ == "__main__":
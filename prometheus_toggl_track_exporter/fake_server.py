@@ -0,0 +1,523 @@
+"""Fake Toggl Track API v9 server for offline load and latency testing.
+
+Serves the subset of the v9 API the exporter uses from generated or recorded
+fixtures, with optional latency, 429 and 5xx injection. Point the exporter at it
+with ``TOGGL_API_BASE_URL=http://127.0.0.1:8080/api/v9``. A stand-in remote
+write receiver is included for testing push mode.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+from prometheus_toggl_track_exporter import remote_write
+
+API_PREFIX = "/api/v9"
+REMOTE_WRITE_PATH = "/api/v1/write"
+
+# Fixtures are shared by generated and recorded data: a dict with the "me"
+# payload, the "current_time_entry" (or None), the "time_entries" list and a
+# "workspaces" dict keyed by workspace ID string holding "projects", "clients",
+# "tags" and "tasks" lists.
+Fixtures = dict[str, Any]
+
+# Shape of the generated dataset
+PROJECT_CLIENT_RATIO = 0.8
+PROJECT_ACTIVE_RATIO = 0.9
+PROJECT_BILLABLE_RATIO = 0.5
+PROJECT_PRIVATE_RATIO = 0.3
+ENTRY_TASK_RATIO = 0.5
+
+# Paginated resources: projects are returned as a bare list per page, tasks
+# wrapped with the total count, like the v9 endpoints
+PAGINATED_RESOURCES = {"projects", "tasks"}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sentinel for unknown routes (None is a valid payload for the current entry)
+_NOT_FOUND = object()
+
+WORKSPACE_RESOURCE_RE = re.compile(
+    r"^/workspaces/(?P<workspace_id>\d+)/(?P<resource>projects|clients|tags|tasks)$"
+)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def generate_fixtures(  # noqa: PLR0913
+    *,
+    seed: int = 0,
+    workspace_count: int = 1,
+    projects_per_workspace: int = 20,
+    clients_per_workspace: int = 5,
+    tags_per_workspace: int = 10,
+    tasks_per_project: int = 3,
+    time_entries: int = 500,
+    days: int = 30,
+    running: bool = True,
+    now: Optional[datetime] = None,
+) -> Fixtures:
+    """Generates a deterministic Toggl dataset."""
+    rng = random.Random(seed)  # noqa: S311
+    now = now or datetime.now(timezone.utc)
+    workspace_ids = [100000 + i for i in range(workspace_count)]
+
+    workspaces: dict[str, dict[str, list]] = {}
+    for ws_id in workspace_ids:
+        clients = [
+            {"id": ws_id * 10 + i, "wid": ws_id, "name": f"Client {i}"}
+            for i in range(clients_per_workspace)
+        ]
+        projects = []
+        for i in range(projects_per_workspace):
+            client = (
+                rng.choice(clients)
+                if clients and rng.random() < PROJECT_CLIENT_RATIO
+                else None
+            )
+            projects.append(
+                {
+                    "id": ws_id * 1000 + i,
+                    "workspace_id": ws_id,
+                    "name": f"Project {i}",
+                    "client_id": client["id"] if client else None,
+                    "active": rng.random() < PROJECT_ACTIVE_RATIO,
+                    "billable": rng.random() < PROJECT_BILLABLE_RATIO,
+                    "is_private": rng.random() < PROJECT_PRIVATE_RATIO,
+                    "color": f"#{rng.randrange(0x1000000):06x}",
+                }
+            )
+        tags = [
+            {"id": ws_id * 100 + i, "workspace_id": ws_id, "name": f"tag-{i}"}
+            for i in range(tags_per_workspace)
+        ]
+        tasks = [
+            {
+                "id": project["id"] * 100 + i,
+                "workspace_id": ws_id,
+                "project_id": project["id"],
+                "name": f"Task {i} of {project['name']}",
+                "active": True,
+            }
+            for project in projects
+            for i in range(tasks_per_project)
+        ]
+        workspaces[str(ws_id)] = {
+            "projects": projects,
+            "clients": clients,
+            "tags": tags,
+            "tasks": tasks,
+        }
+
+    def _random_entry(entry_id: int, start: datetime, duration: int) -> dict:
+        ws_id = rng.choice(workspace_ids)
+        ws = workspaces[str(ws_id)]
+        project = rng.choice(ws["projects"]) if ws["projects"] else None
+        project_tasks = [
+            t for t in ws["tasks"] if project and t["project_id"] == project["id"]
+        ]
+        task = (
+            rng.choice(project_tasks)
+            if project_tasks and rng.random() < ENTRY_TASK_RATIO
+            else None
+        )
+        entry_tags = rng.sample(ws["tags"], k=min(len(ws["tags"]), rng.randint(0, 2)))
+        return {
+            "id": entry_id,
+            "workspace_id": ws_id,
+            "project_id": project["id"] if project else None,
+            "task_id": task["id"] if task else None,
+            "billable": bool(project and project["billable"]),
+            "description": f"Entry {entry_id}",
+            "tags": [t["name"] for t in entry_tags],
+            "tag_ids": [t["id"] for t in entry_tags],
+            "start": _iso(start),
+            "stop": _iso(start + timedelta(seconds=duration)) if duration > 0 else None,
+            "duration": duration,
+            "at": _iso(start + timedelta(seconds=max(duration, 0))),
+        }
+
+    entries = []
+    window = days * 86400
+    for i in range(time_entries):
+        duration = rng.randint(300, 4 * 3600)
+        offset = rng.randint(duration, window)
+        start = now - timedelta(seconds=offset)
+        entries.append(_random_entry(1_000_000 + i, start, duration))
+    entries.sort(key=lambda e: e["start"])
+
+    current = None
+    if running:
+        start = now - timedelta(minutes=rng.randint(1, 120))
+        current = _random_entry(2_000_000, start, -int(start.timestamp()))
+
+    me = {
+        "id": 4242,
+        "email": "fake.user@example.com",
+        "fullname": "Fake User",
+        "timezone": "UTC",
+        "default_workspace_id": workspace_ids[0],
+        "active": True,
+        "hasPassword": True,
+        "send_product_emails": False,
+        "send_timer_notifications": True,
+        "send_weekly_report": False,
+    }
+    return {
+        "me": me,
+        "current_time_entry": current,
+        "time_entries": entries,
+        "workspaces": workspaces,
+    }
+
+
+def load_fixtures(path: str) -> Fixtures:
+    """Loads recorded fixtures from a JSON file."""
+    with open(path, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    fixtures.setdefault("current_time_entry", None)
+    fixtures.setdefault("time_entries", [])
+    fixtures.setdefault("workspaces", {})
+    return fixtures
+
+
+class FakeTogglServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding fixtures and fault injection settings."""
+
+    daemon_threads = True
+
+    def __init__(  # noqa: PLR0913
+        self,
+        server_address: tuple[str, int],
+        fixtures: Fixtures,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        super().__init__(server_address, FakeTogglHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rng = random.Random(seed)  # noqa: S311
+        self.request_counts: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as TOGGL_API_BASE_URL."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def record_request(self, path: str) -> None:
+        with self._lock:
+            self.request_counts[path] += 1
+
+    def draw_fault(self) -> Optional[HTTPStatus]:
+        """Decides whether the current request should fail."""
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return HTTPStatus.TOO_MANY_REQUESTS
+        if roll < self.rate_429 + self.rate_5xx:
+            return HTTPStatus.SERVICE_UNAVAILABLE
+        return None
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self.rng.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + jitter
+
+
+class FakeTogglHandler(BaseHTTPRequestHandler):
+    """Routes requests for the supported v9 endpoints."""
+
+    server: FakeTogglServer
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Keeps request logging out of benchmark output."""
+
+    def _send_json(self, status: HTTPStatus, payload: object) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        parsed = urlparse(self.path)
+        if not parsed.path.startswith(API_PREFIX):
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        path = parsed.path[len(API_PREFIX) :].rstrip("/")
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        self.server.record_request(path)
+
+        delay = self.server.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        fault = self.server.draw_fault()
+        if fault == HTTPStatus.TOO_MANY_REQUESTS:
+            body = b'"Too many requests"'
+            self.send_response(fault)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if fault is not None:
+            self._send_json(fault, {"error": "injected failure"})
+            return
+
+        payload = self._route(path, query)
+        if payload is _NOT_FOUND:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+        else:
+            self._send_json(HTTPStatus.OK, payload)
+
+    def _route(self, path: str, query: dict[str, str]) -> object:  # noqa: PLR0911
+        fixtures = self.server.fixtures
+        if path == "/me":
+            return fixtures["me"]
+        if path == "/me/time_entries/current":
+            return fixtures.get("current_time_entry")
+        if path == "/me/time_entries":
+            if "since" in query:
+                return _entries_since(fixtures["time_entries"], int(query["since"]))
+            return _filter_time_entries(fixtures["time_entries"], query)
+        if path == "/me/workspaces":
+            return [
+                {"id": int(ws_id), "name": f"workspace-{ws_id}"}
+                for ws_id in fixtures["workspaces"]
+            ]
+        match = WORKSPACE_RESOURCE_RE.match(path)
+        if match:
+            workspace = fixtures["workspaces"].get(match["workspace_id"])
+            if workspace is None:
+                return _NOT_FOUND
+            return _workspace_resource(
+                match["resource"], workspace.get(match["resource"], []), query
+            )
+        return _NOT_FOUND
+
+
+def _workspace_resource(
+    resource: str, items: list[dict], query: dict[str, str]
+) -> object:
+    """Applies the active/status filters and pagination of the v9 endpoints."""
+    if query.get("active") in {"true", "false"}:
+        active = query["active"] == "true"
+        items = [item for item in items if item.get("active", True) == active]
+    if query.get("status") in {"active", "archived"}:
+        archived = query["status"] == "archived"
+        items = [item for item in items if item.get("archived", False) == archived]
+    if resource not in PAGINATED_RESOURCES:
+        return items
+    page = max(int(query.get("page", 1)), 1)
+    per_page = min(int(query.get("per_page", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    page_items = items[(page - 1) * per_page : page * per_page]
+    if resource == "tasks":
+        return {
+            "data": page_items,
+            "page": page,
+            "per_page": per_page,
+            "total_count": len(items),
+        }
+    return page_items
+
+
+def _parse_query_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def _filter_time_entries(entries: list[dict], query: dict[str, str]) -> list[dict]:
+    """Applies the start_date/end_date filters like the real endpoint."""
+    start = _parse_query_datetime(query.get("start_date"))
+    end = _parse_query_datetime(query.get("end_date"))
+    if start is None and end is None:
+        return entries
+    selected = []
+    for entry in entries:
+        entry_start = _parse_query_datetime(entry.get("start"))
+        if entry_start is None:
+            continue
+        if start is not None and entry_start < start:
+            continue
+        if end is not None and entry_start > end:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def _entries_since(entries: list[dict], since: int) -> list[dict]:
+    """Entries modified at or after a UNIX timestamp, like the `since` filter."""
+    selected = []
+    for entry in entries:
+        modified = _parse_query_datetime(entry.get("at") or entry.get("start"))
+        if modified is not None and modified.timestamp() >= since:
+            selected.append(entry)
+    return selected
+
+
+def start_fake_server(
+    fixtures: Optional[Fixtures] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    **faults: float,
+) -> FakeTogglServer:
+    """Starts a fake server in a daemon thread and returns it."""
+    server = FakeTogglServer(
+        (host, port),
+        fixtures if fixtures is not None else generate_fixtures(),
+        **faults,
+    )
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    return server
+
+
+class FakeRemoteWriteReceiver(ThreadingHTTPServer):
+    """Stand-in Prometheus remote write receiver.
+
+    Decodes WriteRequests posted to /api/v1/write into ``series``. Statuses in
+    ``fail_statuses`` are returned, in order, before requests are accepted.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        fail_statuses: Optional[list[int]] = None,
+    ) -> None:
+        super().__init__(server_address, FakeRemoteWriteHandler)
+        self.fail_statuses = list(fail_statuses or [])
+        self.series: list[remote_write.Series] = []
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{REMOTE_WRITE_PATH}"
+
+    def handle_write(self, body: bytes) -> HTTPStatus:
+        with self._lock:
+            self.request_count += 1
+            if self.fail_statuses:
+                return HTTPStatus(self.fail_statuses.pop(0))
+        try:
+            series = remote_write.decode_write_request(
+                remote_write.snappy_decompress(body)
+            )
+        except (ValueError, IndexError):
+            return HTTPStatus.BAD_REQUEST
+        with self._lock:
+            self.series.extend(series)
+        return HTTPStatus.NO_CONTENT
+
+
+class FakeRemoteWriteHandler(BaseHTTPRequestHandler):
+    server: FakeRemoteWriteReceiver
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Keeps request logging out of test output."""
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path != REMOTE_WRITE_PATH:
+            status = HTTPStatus.NOT_FOUND
+        else:
+            status = self.server.handle_write(body)
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def start_fake_receiver(
+    host: str = "127.0.0.1", port: int = 0, fail_statuses: Optional[list[int]] = None
+) -> FakeRemoteWriteReceiver:
+    """Starts a stand-in remote write receiver in a daemon thread."""
+    server = FakeRemoteWriteReceiver((host, port), fail_statuses)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Runs the fake Toggl API server in the foreground."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fixtures", help="JSON file with recorded fixtures")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workspaces", type=int, default=1)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--tasks-per-project", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--no-running", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = generate_fixtures(
+            seed=args.seed,
+            workspace_count=args.workspaces,
+            projects_per_workspace=args.projects,
+            tasks_per_project=args.tasks_per_project,
+            time_entries=args.entries,
+            days=args.days,
+            running=not args.no_running,
+        )
+
+    server = FakeTogglServer(
+        (args.host, args.port),
+        fixtures,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        seed=args.seed,
+    )
+    print(f"Fake Toggl API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
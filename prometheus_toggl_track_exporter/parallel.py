@@ -0,0 +1,265 @@
+"""Optional process-pool aggregation of time entries.
+
+Entry aggregation is pure-Python and CPU-bound, so one exporter handling many
+workspaces or long windows saturates a single core under the GIL. With
+AGGREGATION_WORKERS > 0, large entry lists are split into one slice per
+worker, aggregated in worker processes with the same code as the
+single-process path, and the compact partial aggregates are merged here.
+
+Entries are packed once per call into compact tuples, sliced per worker and
+sent to a persistent pool.
+"""
+
+import atexit
+import multiprocessing
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# Fields of a packed entry, in order. Only what the aggregation reads is sent,
+# which keeps pickling cost well below that of the raw API dicts.
+PACKED_FIELDS = (
+    "duration",
+    "workspace_id",
+    "project_id",
+    "task_id",
+    "tags",
+    "billable",
+    "start",
+    "project_name",
+    "task_name",
+    "tag_ids",
+)
+# List-valued fields, packed as tuples
+LIST_FIELDS = frozenset({"tags", "tag_ids"})
+
+# Marks a field missing from the entry (distinct from an explicit None)
+ABSENT = ()
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def pack_entries(entries: Sequence[dict]) -> list[tuple]:
+    """Packs completed entries into tuples of PACKED_FIELDS."""
+    return [
+        tuple(
+            tuple(entry.get(field) or ABSENT)
+            if field in LIST_FIELDS
+            else entry.get(field, ABSENT)
+            for field in PACKED_FIELDS
+        )
+        for entry in entries
+        if entry.get("duration", 0) > 0
+    ]
+
+
+# Optional parts of an aggregation state; a part left out is not computed
+STATE_PARTS = (
+    "aggregated_durations",
+    "aggregated_counts",
+    "duration_histograms",
+    "tag_totals",
+)
+
+
+def new_state(
+    bounds: tuple[float, ...],
+    days: object = None,
+    parts: Sequence[str] = STATE_PARTS,
+) -> dict:
+    """Returns an empty aggregation state, as used by the exporter.
+
+    days is the window's exporter.DayBoundaries, if any.
+    """
+    state = {
+        "ws_performance": {},
+        "histogram_bounds": bounds,
+        "day_boundaries": days,
+    }
+    for part in parts:
+        state[part] = {}
+    return state
+
+
+def empty_like(state: dict) -> dict:
+    """Returns an empty state with the same parts and settings as state."""
+    return {
+        key: {} if isinstance(value, dict) else value for key, value in state.items()
+    }
+
+
+def aggregate_packed(
+    rows: list[tuple],
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    timeframe_label: str,
+    template: dict,
+) -> dict:
+    """Aggregates packed entries into a partial state (runs in a worker)."""
+    from prometheus_toggl_track_exporter import exporter
+
+    state = empty_like(template)
+    for row in rows:
+        entry = {
+            field: value for field, value in zip(PACKED_FIELDS, row) if value != ABSENT
+        }
+        for field in LIST_FIELDS & entry.keys():
+            entry[field] = list(entry[field])
+        exporter._process_entry_aggregates(
+            entry, project_name_map, task_name_map, state, timeframe_label
+        )
+    return state
+
+
+def merge_states(target: dict, partial: dict, sign: int = 1) -> None:
+    """Adds a partial aggregation state into target.
+
+    With sign=-1 the partial is subtracted instead (entries that were removed
+    or changed), and keys left without entries are dropped.
+    """
+    for key in ("aggregated_durations", "aggregated_counts"):
+        if key not in partial:
+            continue
+        merged = target[key]
+        for label_key, value in partial[key].items():
+            merged[label_key] = merged.get(label_key, 0) + sign * value
+    if sign < 0 and "aggregated_counts" in partial:
+        aggregated_counts = target["aggregated_counts"]
+        for label_key in partial["aggregated_counts"]:
+            if aggregated_counts[label_key] <= 0:
+                del aggregated_counts[label_key]
+                del target["aggregated_durations"][label_key]
+
+    _merge_performance(target["ws_performance"], partial["ws_performance"], sign)
+
+    tag_totals = target.get("tag_totals", {})
+    for tag_key, (duration, count) in partial.get("tag_totals", {}).items():
+        totals = tag_totals.setdefault(tag_key, [0, 0])
+        totals[0] += sign * duration
+        totals[1] += sign * count
+        if totals[1] <= 0:
+            del tag_totals[tag_key]
+
+    _merge_histograms(
+        target.get("duration_histograms", {}),
+        partial.get("duration_histograms", {}),
+        sign,
+    )
+
+
+# Summed fields of a workspace's performance aggregates
+PERFORMANCE_FIELDS = (
+    "total_duration",
+    "total_count",
+    "billable_duration",
+    "untagged_duration",
+    "untagged_count",
+)
+
+
+def new_performance() -> dict:
+    """Returns a workspace's empty performance aggregates."""
+    return {
+        "total_duration": 0.0,
+        "total_count": 0,
+        "billable_duration": 0.0,
+        "untagged_duration": 0.0,
+        "untagged_count": 0,
+        "daily_durations": {},  # date -> seconds; keys are the distinct days
+    }
+
+
+def _merge_performance(target: dict, partial: dict, sign: int) -> None:
+    for ws_id, perf in partial.items():
+        current = target.get(ws_id)
+        if current is None:
+            # A new dict: later merges update it in place, and must not
+            # change the partial
+            current = target[ws_id] = new_performance()
+        for field in PERFORMANCE_FIELDS:
+            current[field] += sign * perf[field]
+        daily = current["daily_durations"]
+        for day, seconds in perf["daily_durations"].items():
+            daily[day] = daily.get(day, 0.0) + sign * seconds
+            if daily[day] <= 0:
+                del daily[day]
+        if current["total_count"] <= 0:
+            del target[ws_id]
+
+
+def _merge_histograms(target: dict, partial: dict, sign: int) -> None:
+    for histogram_key, (counts, total) in partial.items():
+        if histogram_key not in target:
+            target[histogram_key] = (list(counts), total)
+            continue
+        current_counts, current_total = target[histogram_key]
+        # A new list: scrapes may be reading the current one
+        merged_counts = [a + sign * b for a, b in zip(current_counts, counts)]
+        if any(merged_counts):
+            target[histogram_key] = (merged_counts, current_total + sign * total)
+        else:
+            del target[histogram_key]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns the shared pool, (re)creating it for the requested size."""
+    global _POOL, _POOL_WORKERS  # noqa: PLW0603
+    with _POOL_LOCK:
+        if _POOL is None or workers != _POOL_WORKERS:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False, cancel_futures=True)
+            # forkserver: the exporter runs threads, which fork does not mix with
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def shutdown_pool() -> None:
+    global _POOL  # noqa: PLW0603
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+            _POOL = None
+
+
+atexit.register(shutdown_pool)
+
+
+def aggregate_parallel(  # noqa: PLR0913
+    entries: Sequence[dict],
+    project_name_map: dict[int, str],
+    task_name_map: dict[int, str],
+    timeframe_label: str,
+    bounds: tuple[float, ...],
+    workers: int,
+    days: object = None,
+    parts: Sequence[str] = STATE_PARTS,
+) -> dict:
+    """Aggregates entries across worker processes and merges the results."""
+    template = new_state(bounds, days, parts)
+    # Packed once, then sliced per worker
+    rows = pack_entries(entries)
+    size = -(-len(rows) // workers) or 1
+    pool = get_pool(workers)
+    futures = [
+        pool.submit(
+            aggregate_packed,
+            rows[start : start + size],
+            project_name_map,
+            task_name_map,
+            timeframe_label,
+            template,
+        )
+        for start in range(0, len(rows), size)
+    ]
+
+    state = empty_like(template)
+    for future in futures:
+        merge_states(state, future.result())
+    return state
@@ -0,0 +1,340 @@
+"""On-demand profiling of the collection cycle.
+
+collect_metrics runs inside CycleProfiler.cycle(). Debug endpoints arm a
+capture for the next cycle and wait for it to finish:
+
+- a cProfile of the next cycle, as a pstats file or text;
+- a tracemalloc diff between the ends of the next two cycles (memory still
+  held after a cycle), traced only while the capture is armed;
+- optionally, a low-overhead sampling profiler that stays on and records
+  the collecting thread's stacks during cycles, in collapsed-stack format
+  (one "frame;frame;... count" line per stack, as read by flamegraph tools).
+
+The endpoints are only served when DEBUG_TOKEN is set, and require it as a
+bearer token.
+"""
+
+import contextlib
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import parse_qs
+
+PROFILE_PATH = "/debug/profile"
+MEMORY_PATH = "/debug/memory"
+SAMPLES_PATH = "/debug/samples"
+
+# Frames kept per allocation traceback and per sampled stack
+TRACEMALLOC_FRAMES = 10
+MAX_STACK_DEPTH = 64
+DEFAULT_TEXT_LIMIT = 40
+# Accepted ?sort= keys for text profiles
+SORT_KEYS = frozenset(key.value for key in pstats.SortKey)
+
+TEXT = "text/plain; charset=utf-8"
+
+
+class _Capture:
+    """A capture armed for upcoming cycles, shared by concurrent requests."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.waiters = 0
+        self.started = False
+        self.result: object = None
+        # tracemalloc captures only
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.owns_tracing = False
+
+
+class CycleProfiler:
+    """Profiles collection cycles on request."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._profile: Optional[_Capture] = None
+        self._memory: Optional[_Capture] = None
+        self._cycle_thread: Optional[int] = None
+        self._samples: Counter[str] = Counter()
+        self._sampler: Optional[threading.Thread] = None
+        self._sampler_stop = threading.Event()
+
+    # --- Cycle hooks ---
+
+    @contextlib.contextmanager
+    def cycle(self) -> Iterator[None]:
+        """Wraps one collection cycle, applying any armed captures."""
+        with self._lock:
+            capture = self._profile
+            if capture is not None:
+                # Later requests wait for the cycle after this one
+                self._profile = None
+                capture.started = True
+            self._cycle_thread = threading.get_ident()
+        profile = cProfile.Profile() if capture is not None else None
+        try:
+            if profile is not None:
+                profile.enable()
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                capture.result = profile
+                capture.done.set()
+            with self._lock:
+                self._cycle_thread = None
+            self._cycle_finished()
+
+    def _cycle_finished(self) -> None:
+        with self._lock:
+            capture = self._memory
+            if capture is None or not tracemalloc.is_tracing():
+                return
+            snapshot = _filtered(tracemalloc.take_snapshot())
+            if capture.baseline is None:
+                capture.baseline = snapshot
+                return
+            self._memory = None
+            capture.result = snapshot.compare_to(capture.baseline, "lineno")
+            if capture.owns_tracing:
+                tracemalloc.stop()
+            capture.done.set()
+
+    # --- Captures ---
+
+    def capture_profile(self, timeout: float) -> Optional[cProfile.Profile]:
+        """Waits for the next cycle and returns its profile (None on timeout)."""
+        with self._lock:
+            capture = self._profile = self._profile or _Capture()
+            capture.waiters += 1
+        return self._wait(capture, timeout, "_profile")
+
+    def capture_memory_diff(
+        self, timeout: float
+    ) -> Optional[list[tracemalloc.StatisticDiff]]:
+        """Waits for the next two cycles and returns the allocations that grew
+        between their ends (None on timeout)."""
+        with self._lock:
+            if self._memory is None:
+                self._memory = _Capture()
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(TRACEMALLOC_FRAMES)
+                    self._memory.owns_tracing = True
+            capture = self._memory
+            capture.waiters += 1
+        return self._wait(capture, timeout, "_memory")
+
+    def _wait(self, capture: _Capture, timeout: float, slot: str) -> object:
+        done = capture.done.wait(timeout)
+        with self._lock:
+            capture.waiters -= 1
+            # The last waiter disarms a capture no cycle has picked up yet
+            if not done and not capture.waiters and getattr(self, slot) is capture:
+                setattr(self, slot, None)
+                if capture.owns_tracing:
+                    tracemalloc.stop()
+        return capture.result if done else None
+
+    # --- Sampling ---
+
+    def start_sampler(self, hz: int) -> None:
+        """Samples the collecting thread's stack hz times per second during
+        cycles, until stop_sampler()."""
+        if self._sampler is not None:
+            return
+        self._sampler_stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, args=(1.0 / hz,), name="profiler", daemon=True
+        )
+        self._sampler.start()
+
+    def stop_sampler(self) -> None:
+        if self._sampler is not None:
+            self._sampler_stop.set()
+            self._sampler.join()
+            self._sampler = None
+
+    @property
+    def sampling(self) -> bool:
+        return self._sampler is not None
+
+    def _sample_loop(self, interval: float) -> None:
+        while not self._sampler_stop.wait(interval):
+            ident = self._cycle_thread
+            if ident is None:
+                continue
+            frame = sys._current_frames().get(ident)
+            if frame is not None:
+                stack = _collapse(frame)
+                with self._lock:
+                    self._samples[stack] += 1
+
+    def samples(self, reset: bool = False) -> Counter[str]:
+        """Returns the sampled stacks and their counts."""
+        with self._lock:
+            samples = Counter(self._samples)
+            if reset:
+                self._samples.clear()
+        return samples
+
+
+def _filtered(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ]
+    )
+
+
+def _collapse(frame: Optional[types.FrameType]) -> str:
+    """Formats a stack root-first as "file:function;..."."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+# --- Rendering ---
+
+
+def profile_text(profile: cProfile.Profile, sort: str, limit: int) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def profile_pstats(profile: cProfile.Profile) -> bytes:
+    """Serialises a profile in the format written by Profile.dump_stats."""
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def memory_text(diff: list[tracemalloc.StatisticDiff], limit: int) -> str:
+    grown = sum(stat.size_diff for stat in diff)
+    lines = [f"Allocated memory change across the cycle: {grown / 1024:+.1f} KiB"]
+    lines.extend(str(stat) for stat in diff[:limit])
+    return "\n".join(lines) + "\n"
+
+
+def samples_text(samples: Counter[str]) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+
+# --- WSGI endpoints ---
+
+WSGIApp = Callable[[dict, Callable], Iterable[bytes]]
+# (status, body, content type, download filename) returned by a handler
+Response = tuple[HTTPStatus, bytes, str, Optional[str]]
+
+
+def _respond(
+    start_response: Callable,
+    status: HTTPStatus,
+    body: bytes,
+    content_type: str = TEXT,
+    filename: Optional[str] = None,
+) -> Iterable[bytes]:
+    headers = [
+        ("Content-Type", content_type),
+        ("Content-Length", str(len(body))),
+        ("Cache-Control", "no-store"),
+    ]
+    if filename:
+        headers.append(("Content-Disposition", f'attachment; filename="{filename}"'))
+    start_response(f"{status.value} {status.phrase}", headers)
+    return [body]
+
+
+def _param(query: dict[str, list[str]], name: str, default: str) -> str:
+    return query.get(name, [default])[0]
+
+
+def debug_routes(
+    profiler: CycleProfiler, token: str, wait_timeout: float
+) -> dict[str, WSGIApp]:
+    """Builds the debug endpoints, guarded by a bearer token.
+
+    Captures wait for at most wait_timeout seconds unless the request sets a
+    shorter ?timeout=.
+    """
+    expected = f"Bearer {token}".encode()
+
+    def guarded(handler: Callable[[dict], Response]) -> WSGIApp:
+        def app(environ: dict, start_response: Callable) -> Iterable[bytes]:
+            supplied = environ.get("HTTP_AUTHORIZATION", "").encode()
+            if not hmac.compare_digest(supplied, expected):
+                return _respond(
+                    start_response, HTTPStatus.UNAUTHORIZED, b"Unauthorized\n"
+                )
+            query = parse_qs(environ.get("QUERY_STRING", ""))
+            try:
+                timeout = min(
+                    float(_param(query, "timeout", str(wait_timeout))), wait_timeout
+                )
+                limit = int(_param(query, "limit", str(DEFAULT_TEXT_LIMIT)))
+            except ValueError:
+                return _respond(
+                    start_response, HTTPStatus.BAD_REQUEST, b"Invalid parameter\n"
+                )
+            status, body, content_type, filename = handler(
+                {"query": query, "timeout": timeout, "limit": limit}
+            )
+            return _respond(start_response, status, body, content_type, filename)
+
+        return app
+
+    def timed_out(what: str, timeout: float) -> Response:
+        body = f"No collection cycle completed the {what} within {timeout:g}s\n"
+        return HTTPStatus.GATEWAY_TIMEOUT, body.encode(), TEXT, None
+
+    def profile(request: dict) -> Response:
+        as_text = _param(request["query"], "format", "pstats") == "text"
+        sort = _param(request["query"], "sort", pstats.SortKey.CUMULATIVE.value)
+        if as_text and sort not in SORT_KEYS:
+            body = f"Invalid sort, expected one of: {', '.join(sorted(SORT_KEYS))}\n"
+            return HTTPStatus.BAD_REQUEST, body.encode(), TEXT, None
+        captured = profiler.capture_profile(request["timeout"])
+        if captured is None:
+            return timed_out("profile", request["timeout"])
+        if as_text:
+            text = profile_text(captured, sort, request["limit"])
+            return HTTPStatus.OK, text.encode(), TEXT, None
+        filename = f"collect-{time.strftime('%Y%m%dT%H%M%S')}.pstats"
+        return (
+            HTTPStatus.OK,
+            profile_pstats(captured),
+            "application/octet-stream",
+            filename,
+        )
+
+    def memory(request: dict) -> Response:
+        diff = profiler.capture_memory_diff(request["timeout"])
+        if diff is None:
+            return timed_out("memory snapshots", request["timeout"])
+        text = memory_text(diff, request["limit"])
+        return HTTPStatus.OK, text.encode(), TEXT, None
+
+    def samples(request: dict) -> Response:
+        reset = _param(request["query"], "reset", "") in {"1", "true"}
+        text = samples_text(profiler.samples(reset=reset))
+        return HTTPStatus.OK, text.encode(), TEXT, None
+
+    routes = {PROFILE_PATH: guarded(profile), MEMORY_PATH: guarded(memory)}
+    if profiler.sampling:
+        routes[SAMPLES_PATH] = guarded(samples)
+    return routes
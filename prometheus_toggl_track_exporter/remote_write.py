@@ -0,0 +1,455 @@
+"""Prometheus remote-write push mode.
+
+Pushes each collection cycle's snapshot of a registry as batched,
+snappy-compressed protobuf WriteRequests (remote write 1.0), for
+environments where Prometheus cannot scrape the exporter.
+
+Batches wait in a bounded queue and are sent by a background thread, with
+exponential backoff on retryable failures. When the queue is full the oldest
+batch is dropped (and counted): the newest snapshot is the most useful one
+and the collection loop must never block on a slow receiver.
+
+The protobuf messages and the snappy block format are encoded by hand to
+avoid protobuf and snappy dependencies.
+"""
+
+import collections
+import socket
+import struct
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from http import HTTPStatus
+from typing import Optional
+
+import requests
+from prometheus_client import REGISTRY, Counter, Gauge
+from prometheus_client.registry import CollectorRegistry
+
+# A series is (sorted (name, value) label pairs, [(value, timestamp_ms)])
+Series = tuple[tuple[tuple[str, str], ...], list[tuple[float, int]]]
+
+REMOTE_WRITE_HEADERS = {
+    "Content-Encoding": "snappy",
+    "Content-Type": "application/x-protobuf",
+    "X-Prometheus-Remote-Write-Version": "0.1.0",
+    "User-Agent": "prometheus-toggl-track-exporter",
+}
+
+BACKOFF_INITIAL_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+# --- Sender Metrics ---
+REMOTE_WRITE_SAMPLES_SENT = Counter(
+    "toggl_remote_write_sent_samples",
+    "Samples successfully pushed via remote write",
+    registry=None,
+)
+REMOTE_WRITE_BYTES_SENT = Counter(
+    "toggl_remote_write_sent_bytes",
+    "Compressed bytes successfully pushed via remote write",
+    registry=None,
+)
+REMOTE_WRITE_FAILED_REQUESTS = Counter(
+    "toggl_remote_write_failed_requests",
+    "Failed remote write requests",
+    ["reason"],
+    registry=None,
+)
+REMOTE_WRITE_SAMPLES_DROPPED = Counter(
+    "toggl_remote_write_dropped_samples",
+    "Samples dropped because the queue was full or the receiver rejected them",
+    ["reason"],
+    registry=None,
+)
+REMOTE_WRITE_QUEUE_BATCHES = Gauge(
+    "toggl_remote_write_queue_batches",
+    "Batches waiting to be sent",
+    registry=None,
+)
+REMOTE_WRITE_QUEUE_CAPACITY = Gauge(
+    "toggl_remote_write_queue_capacity_batches",
+    "Maximum number of batches the queue holds",
+    registry=None,
+)
+REMOTE_WRITE_LAG = Gauge(
+    "toggl_remote_write_lag_seconds",
+    "Age of the oldest batch waiting to be sent",
+    registry=None,
+)
+REMOTE_WRITE_LAST_SEND = Gauge(
+    "toggl_remote_write_last_send_timestamp_seconds",
+    "Unix timestamp of the last successful remote write request",
+    registry=None,
+)
+
+SENDER_METRICS = [
+    REMOTE_WRITE_SAMPLES_SENT,
+    REMOTE_WRITE_BYTES_SENT,
+    REMOTE_WRITE_FAILED_REQUESTS,
+    REMOTE_WRITE_SAMPLES_DROPPED,
+    REMOTE_WRITE_QUEUE_BATCHES,
+    REMOTE_WRITE_QUEUE_CAPACITY,
+    REMOTE_WRITE_LAG,
+    REMOTE_WRITE_LAST_SEND,
+]
+
+
+# --- Protobuf Encoding ---
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Encodes a length-delimited field (wire type 2)."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def encode_write_request(series: Iterable[Series]) -> bytes:
+    """Encodes a prometheus.WriteRequest protobuf message."""
+    out = bytearray()
+    for labels, samples in series:
+        ts = bytearray()
+        for name, value in labels:
+            ts += _field(1, _field(1, name.encode()) + _field(2, value.encode()))
+        for value, timestamp_ms in samples:
+            sample = b"\x09" + struct.pack("<d", value)  # field 1, fixed64
+            sample += b"\x10" + _varint(timestamp_ms & 0xFFFFFFFFFFFFFFFF)
+            ts += _field(2, sample)
+        out += _field(1, bytes(ts))
+    return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(data: bytes) -> Iterator[tuple[int, object]]:
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos : pos + 8], pos + 8
+        elif wire_type == 2:  # noqa: PLR2004
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos : pos + length], pos + length
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")  # noqa: TRY003
+        yield number, value
+
+
+def decode_write_request(data: bytes) -> list[Series]:
+    """Decodes a WriteRequest; used by the stand-in receiver and tests."""
+    series: list[Series] = []
+    for _, ts in _iter_fields(data):
+        labels: list[tuple[str, str]] = []
+        samples: list[tuple[float, int]] = []
+        for number, payload in _iter_fields(ts):
+            fields = dict(_iter_fields(payload))
+            if number == 1:
+                labels.append((fields[1].decode(), fields.get(2, b"").decode()))
+            else:
+                value = struct.unpack("<d", fields.get(1, bytes(8)))[0]
+                samples.append((value, fields.get(2, 0)))
+        series.append((tuple(labels), samples))
+    return series
+
+
+# --- Snappy Block Format ---
+
+# Matches are searched within blocks of this size, so copy offsets fit in
+# two bytes
+_BLOCK_SIZE = 65536
+_MIN_MATCH = 4
+_MAX_COPY = 64
+
+
+def snappy_compress(data: bytes) -> bytes:
+    """Compresses data as a snappy block (greedy 4-byte matching)."""
+    out = bytearray(_varint(len(data)))
+    for start in range(0, len(data), _BLOCK_SIZE):
+        _compress_block(data, start, min(start + _BLOCK_SIZE, len(data)), out)
+    return bytes(out)
+
+
+def _compress_block(data: bytes, start: int, end: int, out: bytearray) -> None:
+    # Last position seen for each 4-byte sequence
+    table: dict[bytes, int] = {}
+    pos = literal_start = start
+    while pos <= end - _MIN_MATCH:
+        key = data[pos : pos + _MIN_MATCH]
+        candidate = table.get(key)
+        table[key] = pos
+        if candidate is None:
+            pos += 1
+            continue
+        length = _MIN_MATCH
+        while pos + length < end and data[candidate + length] == data[pos + length]:
+            length += 1
+        _emit_literal(data[literal_start:pos], out)
+        _emit_copy(pos - candidate, length, out)
+        pos = literal_start = pos + length
+    _emit_literal(data[literal_start:end], out)
+
+
+def _emit_literal(literal: bytes, out: bytearray) -> None:
+    if not literal:
+        return
+    size = len(literal) - 1
+    if size < 60:  # noqa: PLR2004
+        out.append(size << 2)
+    elif size < 256:  # noqa: PLR2004
+        # Tag 60: (length - 1) follows in 1 byte
+        out += bytes([60 << 2, size])
+    else:
+        # Tag 61: (length - 1) follows in 2 little-endian bytes
+        out += bytes([61 << 2]) + struct.pack("<H", size)
+    out += literal
+
+
+def _emit_copy(offset: int, length: int, out: bytearray) -> None:
+    # Each copy element holds at most 64 bytes and at least 4
+    while length >= _MAX_COPY + _MIN_MATCH:
+        out += bytes([(_MAX_COPY - 1) << 2 | 2]) + struct.pack("<H", offset)
+        length -= _MAX_COPY
+    if length > _MAX_COPY:
+        out += bytes([(_MAX_COPY - _MIN_MATCH - 1) << 2 | 2]) + struct.pack(
+            "<H", offset
+        )
+        length -= _MAX_COPY - _MIN_MATCH
+    if length < 12 and offset < 2048:  # noqa: PLR2004
+        # 1-byte offset: 3 bits of (length - 4) and the offset's high bits
+        out += bytes([(offset >> 8) << 5 | (length - 4) << 2 | 1, offset & 0xFF])
+    else:
+        out += bytes([(length - 1) << 2 | 2]) + struct.pack("<H", offset)
+
+
+def snappy_decompress(data: bytes) -> bytes:
+    """Decompresses a snappy block (literals and copies)."""
+    length, pos = _read_varint(data, 0)
+    out = bytearray()
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:  # literal
+            size = tag >> 2
+            if size >= 60:  # noqa: PLR2004
+                extra = size - 59
+                size = int.from_bytes(data[pos : pos + extra], "little")
+                pos += extra
+            size += 1
+            out += data[pos : pos + size]
+            pos += size
+            continue
+        if kind == 1:
+            size = ((tag >> 2) & 7) + 4
+            offset = (tag >> 5) << 8 | data[pos]
+            pos += 1
+        else:
+            size = (tag >> 2) + 1
+            width = 2 if kind == 2 else 4  # noqa: PLR2004
+            offset = int.from_bytes(data[pos : pos + width], "little")
+            pos += width
+        for _ in range(size):  # copies may overlap their own output
+            out.append(out[-offset])
+    if len(out) != length:
+        raise ValueError("Corrupt snappy block")  # noqa: TRY003
+    return bytes(out)
+
+
+# --- Snapshots ---
+
+
+def snapshot_series(
+    registry: CollectorRegistry, external_labels: dict[str, str], now_ms: int
+) -> list[Series]:
+    """Converts the registry's current samples to remote write series."""
+    series: list[Series] = []
+    for family in registry.collect():
+        for sample in family.samples:
+            labels = {**sample.labels, **external_labels, "__name__": sample.name}
+            timestamp_ms = (
+                int(float(sample.timestamp) * 1000)
+                if sample.timestamp is not None
+                else now_ms
+            )
+            series.append(
+                (tuple(sorted(labels.items())), [(sample.value, timestamp_ms)])
+            )
+    return series
+
+
+class RemoteWriteSender:
+    """Queues snapshots as batches and pushes them from a background thread."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        url: str,
+        *,
+        batch_size: int = 500,
+        queue_batches: int = 100,
+        timeout: float = 10.0,
+        bearer_token: Optional[str] = None,
+        external_labels: Optional[dict[str, str]] = None,
+        registry: CollectorRegistry = REGISTRY,
+    ) -> None:
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.registry = registry
+        self.external_labels = external_labels or {
+            "job": "toggl-track-exporter",
+            "instance": socket.gethostname(),
+        }
+        self._headers = dict(REMOTE_WRITE_HEADERS)
+        if bearer_token:
+            self._headers["Authorization"] = f"Bearer {bearer_token}"
+        # Batches as (enqueued_at, series)
+        self._queue: collections.deque[tuple[float, list[Series]]] = collections.deque()
+        self._capacity = queue_batches
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._session = requests.Session()
+        self._thread: Optional[threading.Thread] = None
+        REMOTE_WRITE_QUEUE_CAPACITY.set(queue_batches)
+        REMOTE_WRITE_LAG.set_function(self.lag)
+
+    def lag(self) -> float:
+        """Seconds the oldest queued batch has been waiting."""
+        with self._cond:
+            if not self._queue:
+                return 0.0
+            return max(time.time() - self._queue[0][0], 0.0)
+
+    def enqueue_snapshot(self) -> int:
+        """Queues the registry's current samples; returns the batch count."""
+        series = snapshot_series(
+            self.registry, self.external_labels, int(time.time() * 1000)
+        )
+        batches = [
+            series[i : i + self.batch_size]
+            for i in range(0, len(series), self.batch_size)
+        ]
+        now = time.time()
+        with self._cond:
+            for batch in batches:
+                if len(self._queue) >= self._capacity:
+                    _, dropped = self._queue.popleft()
+                    REMOTE_WRITE_SAMPLES_DROPPED.labels(reason="queue_full").inc(
+                        len(dropped)
+                    )
+                self._queue.append((now, batch))
+            REMOTE_WRITE_QUEUE_BATCHES.set(len(self._queue))
+            self._cond.notify()
+        return len(batches)
+
+    def send(self, batch: list[Series]) -> Optional[bool]:
+        """Sends one batch.
+
+        Returns True on success, False if the batch should be retried and None
+        if the receiver rejected it for good.
+        """
+        body = snappy_compress(encode_write_request(batch))
+        try:
+            response = self._session.post(
+                self.url, data=body, headers=self._headers, timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Remote write request failed: {e}")
+            REMOTE_WRITE_FAILED_REQUESTS.labels(reason="connection").inc()
+            return False
+
+        status = response.status_code
+        if status < HTTPStatus.MULTIPLE_CHOICES:
+            REMOTE_WRITE_SAMPLES_SENT.inc(len(batch))
+            REMOTE_WRITE_BYTES_SENT.inc(len(body))
+            REMOTE_WRITE_LAST_SEND.set(time.time())
+            return True
+        REMOTE_WRITE_FAILED_REQUESTS.labels(reason=str(status)).inc()
+        if (
+            status == HTTPStatus.TOO_MANY_REQUESTS
+            or status >= HTTPStatus.INTERNAL_SERVER_ERROR
+        ):
+            return False
+        print(f"Remote write rejected with {status}: {response.text[:200]}")
+        REMOTE_WRITE_SAMPLES_DROPPED.labels(reason="rejected").inc(len(batch))
+        return None
+
+    def flush(self, deadline: Optional[float] = None) -> bool:
+        """Sends queued batches in order until empty or a send must be retried.
+
+        Returns True once the queue is empty.
+        """
+        while deadline is None or time.time() < deadline:
+            with self._cond:
+                if not self._queue:
+                    return True
+                batch = self._queue[0][1]
+            result = self.send(batch)
+            if result is False:
+                return False
+            with self._cond:
+                # The head may have been dropped by enqueue while sending
+                if self._queue and self._queue[0][1] is batch:
+                    self._queue.popleft()
+                REMOTE_WRITE_QUEUE_BATCHES.set(len(self._queue))
+        return False
+
+    def _run(self) -> None:
+        backoff = BACKOFF_INITIAL_SECONDS
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._queue and not self._stop.is_set():
+                    self._cond.wait()
+            if self._stop.is_set():
+                return
+            if self.flush():
+                backoff = BACKOFF_INITIAL_SECONDS
+            else:
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, BACKOFF_MAX_SECONDS)
+
+    def start(self) -> None:
+        """Starts the background sender thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="remote-write", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stops the sender after a best-effort flush within the timeout."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return  # Still sending; don't race it
+        self.flush(deadline=time.time() + timeout)
+
+
+def register_metrics(registry: CollectorRegistry = REGISTRY) -> None:
+    """Registers the sender metrics with a registry."""
+    for metric in SENDER_METRICS:
+        registry.register(metric)
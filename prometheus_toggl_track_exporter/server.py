@@ -0,0 +1,495 @@
+"""HTTP serving for metrics and health probes.
+
+The WSGI app is served by an asyncio HTTP/1.1 server running in a daemon
+thread. Connections are kept alive between scrapes, requests are handled in
+worker threads, concurrent identical requests share one response, and at
+most max_concurrent_scrapes metric renders run at a time, so a burst of
+scrapes from several Prometheus replicas cannot pile up collection work.
+Responses are gzip-compressed when the client accepts it.
+"""
+
+import asyncio
+import base64
+import contextlib
+import gzip
+import hmac
+import io
+import json
+import ssl
+import sys
+import threading
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import unquote
+
+from prometheus_client import REGISTRY, make_wsgi_app
+from prometheus_client.exposition import gzip_accepted
+from prometheus_client.registry import CollectorRegistry
+
+# A probe returns (healthy, details); details are rendered as the JSON body.
+Probe = Callable[[], tuple[bool, dict]]
+WSGIApp = Callable[[dict, Callable], Iterable[bytes]]
+
+HEALTH_PATH = "/healthz"
+READY_PATH = "/readyz"
+PROBE_PATHS = frozenset({HEALTH_PATH, READY_PATH})
+
+# Limits of a request's line and headers, and of its body
+MAX_HEADER_BYTES = 16384
+MAX_BODY_BYTES = 65536
+# Smaller responses are sent uncompressed
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+# Seconds shutdown() waits for open connections to close
+SHUTDOWN_TIMEOUT_SECONDS = 5
+
+
+def _status_line(status: HTTPStatus) -> str:
+    return f"{status.value} {status.phrase}"
+
+
+def _probe_app(probe: Probe) -> WSGIApp:
+    def app(environ: dict, start_response: Callable) -> Iterable[bytes]:  # noqa: ARG001
+        healthy, details = probe()
+        status = HTTPStatus.OK if healthy else HTTPStatus.SERVICE_UNAVAILABLE
+        body = json.dumps({"status": "ok" if healthy else "fail", **details}).encode()
+        start_response(
+            _status_line(status),
+            [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(body))),
+                ("Cache-Control", "no-store"),
+            ],
+        )
+        return [body]
+
+    return app
+
+
+def _not_found(environ: dict, start_response: Callable) -> Iterable[bytes]:  # noqa: ARG001
+    body = b"Not Found\n"
+    start_response(
+        _status_line(HTTPStatus.NOT_FOUND),
+        [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))],
+    )
+    return [body]
+
+
+def _unauthorized(environ: dict, start_response: Callable) -> Iterable[bytes]:  # noqa: ARG001
+    body = b"Unauthorized\n"
+    start_response(
+        _status_line(HTTPStatus.UNAUTHORIZED),
+        [
+            ("Content-Type", "text/plain"),
+            ("Content-Length", str(len(body))),
+            ("WWW-Authenticate", 'Basic realm="toggl-track-exporter"'),
+        ],
+    )
+    return [body]
+
+
+def _basic_auth(app: WSGIApp, username: str, password: str) -> WSGIApp:
+    """Requires HTTP basic auth with the given credentials."""
+    expected = b"Basic " + base64.b64encode(f"{username}:{password}".encode())
+
+    def guarded(environ: dict, start_response: Callable) -> Iterable[bytes]:
+        supplied = environ.get("HTTP_AUTHORIZATION", "").encode()
+        if not hmac.compare_digest(supplied, expected):
+            return _unauthorized(environ, start_response)
+        return app(environ, start_response)
+
+    return guarded
+
+
+def make_app(  # noqa: PLR0913
+    health_probe: Probe,
+    ready_probe: Probe,
+    metrics_path: str = "/metrics",
+    registry: CollectorRegistry = REGISTRY,
+    routes: Optional[dict[str, WSGIApp]] = None,
+    basic_auth: Optional[tuple[str, str]] = None,
+) -> WSGIApp:
+    """Builds the WSGI app serving metrics, /healthz and /readyz.
+
+    Probes answer from in-memory state and never touch the registry, so they
+    can run every few seconds without affecting scrape latency. basic_auth
+    (username, password) guards the metrics path; probes stay open, and the
+    debug routes keep their own bearer token.
+    """
+    # Compressed by the server, at a cheaper level than the client library's
+    metrics_app = make_wsgi_app(registry, disable_compression=True)
+    if basic_auth is not None:
+        metrics_app = _basic_auth(metrics_app, *basic_auth)
+    table: dict[str, WSGIApp] = {
+        # Keyed like the lookup below, so "/metrics/" serves "/metrics"
+        metrics_path.rstrip("/") or "/": metrics_app,
+        HEALTH_PATH: _probe_app(health_probe),
+        READY_PATH: _probe_app(ready_probe),
+        **(routes or {}),
+    }
+
+    def app(environ: dict, start_response: Callable) -> Iterable[bytes]:
+        path = environ.get("PATH_INFO", "/").rstrip("/") or "/"
+        handler = table.get(path, _not_found)
+        return handler(environ, start_response)
+
+    return app
+
+
+def _parse_headers(lines: list[str]) -> Optional[dict[str, str]]:
+    """Parses header lines into lowercase names; None if one is malformed."""
+    headers: dict[str, str] = {}
+    for line in lines:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            return None
+        name = name.strip().lower()
+        value = value.strip()
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+@dataclass(frozen=True)
+class _Request:
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]
+    body: bytes
+    keep_alive: bool
+
+
+@dataclass(frozen=True)
+class _Response:
+    status: str
+    headers: list[tuple[str, str]]
+    body: bytes
+
+
+def _error(status: HTTPStatus) -> _Response:
+    return _Response(
+        _status_line(status),
+        [("Content-Type", "text/plain")],
+        f"{status.phrase}\n".encode(),
+    )
+
+
+class HTTPServer:
+    """Serves a WSGI app over HTTP/1.1 from an asyncio loop in a daemon thread.
+
+    Requests for scrape_paths are rendered by a pool of max_concurrent_scrapes
+    threads. Probes answer from in-memory state on the loop itself, so they
+    stay responsive while worker threads are busy. Others (debug endpoints
+    that wait for cycles) run in the loop's default executor so they never
+    hold up scrapes. Reading a request and sending a response are each bounded
+    by keepalive_timeout.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        app: WSGIApp,
+        addr: str,
+        port: int,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        scrape_paths: Sequence[str] = ("/metrics",),
+        max_connections: int = 256,
+        max_concurrent_scrapes: int = 4,
+        keepalive_timeout: float = 30.0,
+    ) -> None:
+        self._app = app
+        self._addr = addr
+        self._port = port
+        self._ssl_context = ssl_context
+        self._scrape_paths = {path.rstrip("/") or "/" for path in scrape_paths}
+        self._max_connections = max_connections
+        self._keepalive_timeout = keepalive_timeout
+        self._scrapes = ThreadPoolExecutor(
+            max_workers=max_concurrent_scrapes, thread_name_prefix="scrape"
+        )
+        self._loop = asyncio.new_event_loop()
+        self._server: Optional[asyncio.Server] = None
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="http-server", daemon=True
+        )
+        self._connections: set[asyncio.Task] = set()
+        # Responses being rendered, shared by identical concurrent requests
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    def start(self) -> None:
+        """Binds the listening socket (raising if that fails) and serves."""
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(
+                self._handle,
+                self._addr,
+                self._port,
+                ssl=self._ssl_context,
+                limit=MAX_HEADER_BYTES,
+                reuse_address=True,
+            )
+        )
+        self._thread.start()
+
+    @property
+    def server_port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    def shutdown(self) -> None:
+        """Stops accepting, closes open connections and stops the loop."""
+        if not self._thread.is_alive():
+            return
+        with contextlib.suppress(TimeoutError):
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(
+                SHUTDOWN_TIMEOUT_SECONDS
+            )
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def server_close(self) -> None:
+        self._scrapes.shutdown(wait=False, cancel_futures=True)
+        if not self._loop.is_running():
+            self._loop.close()
+
+    async def _close(self) -> None:
+        self._server.close()
+        for task in self._connections:
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    # --- Connections ---
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        task = asyncio.current_task()
+        try:
+            if len(self._connections) >= self._max_connections:
+                await self._send(writer, _error(HTTPStatus.SERVICE_UNAVAILABLE))
+                return
+            self._connections.add(task)
+            keep_alive = True
+            while keep_alive:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, HTTPStatus):
+                    # Malformed or over the limits; the stream can't be trusted
+                    await self._send(writer, _error(request))
+                    break
+                keep_alive = request.keep_alive
+                response = await self._respond(request, writer)
+                await self._send(
+                    writer, response, keep_alive, head=request.method == "HEAD"
+                )
+        except (OSError, TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    async def _read_request(  # noqa: PLR0911
+        self, reader: asyncio.StreamReader
+    ) -> "Optional[_Request | HTTPStatus]":
+        """Reads the next request; None when the client is done or idle, an
+        error status when the request is rejected."""
+        try:
+            head = await asyncio.wait_for(
+                reader.readuntil(b"\r\n\r\n"), self._keepalive_timeout
+            )
+        except asyncio.LimitOverrunError:
+            return HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+        except (TimeoutError, asyncio.IncompleteReadError):
+            return None
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        parts = request_line.split(" ")
+        if len(parts) != 3:  # noqa: PLR2004
+            return HTTPStatus.BAD_REQUEST
+        method, target, version = parts
+        if version not in {"HTTP/1.0", "HTTP/1.1"}:
+            return HTTPStatus.HTTP_VERSION_NOT_SUPPORTED
+        headers = _parse_headers(header_lines)
+        if headers is None:
+            return HTTPStatus.BAD_REQUEST
+        if "transfer-encoding" in headers:
+            return HTTPStatus.LENGTH_REQUIRED
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            return HTTPStatus.BAD_REQUEST
+        if int(length) > MAX_BODY_BYTES:
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        try:
+            body = await asyncio.wait_for(
+                reader.readexactly(int(length)), self._keepalive_timeout
+            )
+        except TimeoutError:
+            return None
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            keep_alive = "close" not in connection
+        else:
+            keep_alive = "keep-alive" in connection
+        return _Request(method, target, version, headers, body, keep_alive)
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        response: _Response,
+        keep_alive: bool = False,
+        head: bool = False,
+    ) -> None:
+        lines = [f"HTTP/1.1 {response.status}"]
+        lines.extend(
+            f"{name}: {value}"
+            for name, value in response.headers
+            if name.lower() not in {"content-length", "connection"}
+        )
+        lines.append(f"Content-Length: {len(response.body)}")
+        if keep_alive:
+            lines.append("Connection: keep-alive")
+            lines.append(f"Keep-Alive: timeout={self._keepalive_timeout:.0f}")
+        else:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head:
+            writer.write(response.body)
+        # A client that stops reading must not hold the connection forever
+        await asyncio.wait_for(writer.drain(), self._keepalive_timeout)
+
+    # --- Requests ---
+
+    async def _respond(
+        self, request: _Request, writer: asyncio.StreamWriter
+    ) -> _Response:
+        if request.method not in {"GET", "HEAD"}:
+            response = _error(HTTPStatus.METHOD_NOT_ALLOWED)
+            return _Response(
+                response.status, [*response.headers, ("Allow", "GET, HEAD")], b""
+            )
+        path = unquote(request.target.partition("?")[0])
+        if (path.rstrip("/") or "/") in PROBE_PATHS:
+            # Cheap and lock-free, so answered inline rather than queued
+            # behind debug endpoints in the default executor
+            return self._call_app(self._environ(request, path, writer))
+        headers = request.headers
+        # Everything a response may depend on, so only equivalent requests
+        # (including their credentials) share one
+        key = (
+            request.target,
+            headers.get("accept", ""),
+            headers.get("accept-encoding", ""),
+            headers.get("authorization", ""),
+        )
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            executor = self._scrapes if path.rstrip("/") in self._scrape_paths else None
+            environ = self._environ(request, path, writer)
+            inflight = self._loop.run_in_executor(executor, self._call_app, environ)
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda _: self._forget(key, inflight))
+        # A client that hangs up must not cancel the render others wait for
+        return await asyncio.shield(inflight)
+
+    def _forget(self, key: tuple, inflight: asyncio.Future) -> None:
+        if self._inflight.get(key) is inflight:
+            del self._inflight[key]
+
+    def _environ(
+        self, request: _Request, path: str, writer: asyncio.StreamWriter
+    ) -> dict:
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": request.method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": request.target.partition("?")[2],
+            "SERVER_NAME": self._addr,
+            "SERVER_PORT": str(self.server_port),
+            "SERVER_PROTOCOL": request.version,
+            "REMOTE_ADDR": peer[0],
+            "CONTENT_LENGTH": str(len(request.body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "https" if self._ssl_context else "http",
+            "wsgi.input": io.BytesIO(request.body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in request.headers.items():
+            if name in {"content-type", "content-length"}:
+                environ[name.upper().replace("-", "_")] = value
+            else:
+                environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        return environ
+
+    def _call_app(self, environ: dict) -> _Response:
+        """Runs the app in a worker thread and compresses its response."""
+        started: list = []
+
+        def start_response(
+            status: str,
+            headers: list[tuple[str, str]],
+            exc_info: object = None,  # noqa: ARG001
+        ) -> Callable[[bytes], None]:
+            started[:] = [status, list(headers)]
+            return lambda _data: None
+
+        try:
+            result = self._app(environ, start_response)
+            try:
+                body = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        except Exception as e:
+            print(f"Error serving {environ['PATH_INFO']}: {e!r}")
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR)
+        status, headers = started
+        if (
+            len(body) >= GZIP_MIN_BYTES
+            and gzip_accepted(environ.get("HTTP_ACCEPT_ENCODING", ""))
+            and not any(name.lower() == "content-encoding" for name, _ in headers)
+        ):
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers.append(("Content-Encoding", "gzip"))
+            headers.append(("Vary", "Accept-Encoding"))
+        return _Response(status, headers, body)
+
+
+def tls_context(cert_file: str, key_file: str) -> ssl.SSLContext:
+    """Builds a server TLS context from a PEM certificate chain and key."""
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert_file, key_file)
+    return context
+
+
+def start_server(  # noqa: PLR0913
+    app: WSGIApp,
+    port: int,
+    addr: str = "0.0.0.0",  # noqa: S104
+    *,
+    ssl_context: Optional[ssl.SSLContext] = None,
+    scrape_paths: Sequence[str] = ("/metrics",),
+    max_connections: int = 256,
+    max_concurrent_scrapes: int = 4,
+    keepalive_timeout: float = 30.0,
+) -> HTTPServer:
+    """Starts serving the app from a daemon thread and returns the server."""
+    httpd = HTTPServer(
+        app,
+        addr,
+        port,
+        ssl_context=ssl_context,
+        scrape_paths=scrape_paths,
+        max_connections=max_connections,
+        max_concurrent_scrapes=max_concurrent_scrapes,
+        keepalive_timeout=keepalive_timeout,
+    )
+    httpd.start()
+    return httpd
@@ -0,0 +1,41 @@
+"""Static sharding of collection work across exporter replicas.
+
+Each replica knows its shard index and the shard count (e.g. from a
+StatefulSet ordinal) and owns the keys for which it wins rendezvous
+(highest-random-weight) hashing. Going from N to N+1 shards only moves the
+keys the new shard wins, about 1/(N+1) of them; nothing moves between the
+existing shards.
+"""
+
+import hashlib
+import re
+from typing import Optional
+
+# Key for sources that belong to the token rather than a workspace (/me,
+# running timer); exactly one shard exports them.
+USER_SHARD_KEY = "user"
+
+_ORDINAL_RE = re.compile(r"-(\d+)$")
+
+
+def _score(key: str, shard: int) -> int:
+    digest = hashlib.blake2b(f"{shard}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_for(key: str, shard_count: int) -> int:
+    """Returns the shard that owns a key."""
+    if shard_count <= 1:
+        return 0
+    return max(range(shard_count), key=lambda shard: _score(key, shard))
+
+
+def owns(key: str, shard_index: int, shard_count: int) -> bool:
+    """Whether the given shard owns a key."""
+    return shard_for(key, shard_count) == shard_index
+
+
+def ordinal_from_hostname(hostname: str) -> Optional[int]:
+    """Extracts a StatefulSet ordinal from a pod hostname like 'exporter-2'."""
+    match = _ORDINAL_RE.search(hostname)
+    return int(match.group(1)) if match else None
@@ -0,0 +1,79 @@
+import io
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from prometheus_client.openmetrics.parser import text_string_to_metric_families
+
+from prometheus_toggl_track_exporter import backfill, exporter, fake_server
+
+TEST_API_TOKEN = "test_toggl_token"  # noqa: S105
+NOW = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.fixtures = fake_server.generate_fixtures(
+            seed=3, workspace_count=2, time_entries=300, days=40, running=False, now=NOW
+        )
+        self.server = fake_server.start_fake_server(self.fixtures)
+        self.patchers = [
+            patch.object(exporter, "TOGGL_API_BASE_URL", self.server.base_url),
+            patch.object(exporter, "TOGGL_API_TOKEN", TEST_API_TOKEN),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        exporter._SOURCE_STATE.clear()
+        exporter._BREAKERS.reset()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _run(self, **kwargs):
+        out = io.StringIO()
+        backfill.run_backfill(date(2025, 1, 1), date(2025, 3, 1), out, **kwargs)
+        return out.getvalue()
+
+    def test_output_is_valid_openmetrics_with_fixture_totals(self):
+        text = self._run()
+        families = {f.name: f for f in text_string_to_metric_families(text)}
+
+        durations = families["toggl_time_entries_duration_seconds"].samples
+        assert sum(s.value for s in durations) == sum(
+            e["duration"] for e in self.fixtures["time_entries"]
+        )
+        counts = families["toggl_time_entries_count"].samples
+        assert sum(s.value for s in counts) == len(self.fixtures["time_entries"])
+        assert all(s.labels["timeframe"] == "1d" for s in counts)
+        # Daily samples are stamped at UTC midnight ending their bucket
+        assert all(s.timestamp.sec % 86400 == 0 for s in counts)
+
+    def test_chunk_and_sort_run_size_do_not_change_output(self):
+        expected = self._run(chunk_days=30)
+        with patch.object(backfill, "SORT_RUN_LINES", 7):
+            assert self._run(chunk_days=1) == expected
+        assert self.server.request_counts["/me/time_entries"] == 59 + 2
+
+    def test_workspace_filter_and_hourly_resolution(self):
+        ws_id = int(next(iter(self.fixtures["workspaces"])))
+        text = self._run(resolution="1h", workspace_ids=[ws_id])
+        families = {f.name: f for f in text_string_to_metric_families(text)}
+
+        counts = families["toggl_time_entries_count"].samples
+        assert {s.labels["workspace_id"] for s in counts} == {str(ws_id)}
+        assert all(s.timestamp.sec % 3600 == 0 for s in counts)
+
+    def test_fetch_failure_raises(self):
+        with (
+            patch.object(exporter, "get_time_entries", return_value=None),
+            pytest.raises(backfill.BackfillError),
+        ):
+            self._run()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+
+from prometheus_client import CollectorRegistry
+
+from prometheus_toggl_track_exporter import circuit_breaker
+from prometheus_toggl_track_exporter.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreakers,
+)
+
+TEMPLATE = "/workspaces/{id}/clients"
+
+
+class TestCircuitBreakers(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breakers = CircuitBreakers(
+            failure_threshold=2,
+            open_seconds=60,
+            max_open_seconds=200,
+            clock=lambda: self.now,
+        )
+
+    def _fail(self, times=1):
+        for _ in range(times):
+            assert self.breakers.allow(TEMPLATE)
+            self.breakers.record_failure(TEMPLATE)
+
+    def test_endpoint_template(self):
+        template = circuit_breaker.endpoint_template("/workspaces/123/clients")
+        assert template == TEMPLATE
+        assert circuit_breaker.endpoint_template("/me/time_entries") == (
+            "/me/time_entries"
+        )
+        assert circuit_breaker.endpoint_template("/workspaces/1/projects/22") == (
+            "/workspaces/{id}/projects/{id}"
+        )
+
+    def test_opens_after_threshold_and_probes_with_backoff(self):
+        self._fail()
+        assert self.breakers.state(TEMPLATE) == CLOSED
+        self._fail()
+        assert self.breakers.state(TEMPLATE) == OPEN
+        assert not self.breakers.allow(TEMPLATE)
+
+        # Failed probes double the interval up to the maximum
+        for interval in (60, 120, 200, 200):
+            self.now += interval - 1
+            assert not self.breakers.allow(TEMPLATE)
+            self.now += 1
+            assert self.breakers.allow(TEMPLATE)
+            assert self.breakers.state(TEMPLATE) == HALF_OPEN
+            # Only one probe at a time
+            assert not self.breakers.allow(TEMPLATE)
+            self.breakers.record_failure(TEMPLATE)
+
+        self.now += 200
+        assert self.breakers.allow(TEMPLATE)
+        self.breakers.record_success(TEMPLATE)
+        assert self.breakers.state(TEMPLATE) == CLOSED
+        self._fail()
+        assert self.breakers.state(TEMPLATE) == CLOSED
+
+    def test_abandoned_probe_can_be_retried(self):
+        self._fail(2)
+        self.now += 60
+        assert self.breakers.allow(TEMPLATE)
+        self.breakers.record_abandoned(TEMPLATE)
+        assert self.breakers.state(TEMPLATE) == OPEN
+        assert self.breakers.allow(TEMPLATE)
+
+    def test_export_and_restore(self):
+        self._fail(2)
+        assert self.breakers.open_outcomes() == 1
+        assert not self.breakers.allow(TEMPLATE)
+        assert self.breakers.open_outcomes() == 2  # noqa: PLR2004
+
+        restored = CircuitBreakers(
+            failure_threshold=2, open_seconds=60, clock=lambda: self.now
+        )
+        restored.restore(self.breakers.export())
+        assert restored.state(TEMPLATE) == OPEN
+        self.now += 59
+        assert not restored.allow(TEMPLATE)
+        self.now += 1
+        assert restored.allow(TEMPLATE)
+        restored.record_failure(TEMPLATE)
+        assert restored.snapshot()[TEMPLATE]["retry_in"] == 120  # noqa: PLR2004
+
+    def test_threshold_zero_disables(self):
+        breakers = CircuitBreakers(failure_threshold=0)
+        for _ in range(10):
+            assert breakers.allow(TEMPLATE)
+            breakers.record_failure(TEMPLATE)
+        assert breakers.state(TEMPLATE) == CLOSED
+
+    def test_collector_exports_state(self):
+        self._fail(2)
+        assert not self.breakers.allow(TEMPLATE)
+        registry = CollectorRegistry()
+        registry.register(circuit_breaker.CircuitBreakerCollector(self.breakers))
+
+        def _value(name, **labels):
+            return registry.get_sample_value(name, {"endpoint": TEMPLATE, **labels})
+
+        assert _value("toggl_circuit_breaker_state", state="open") == 1
+        assert _value("toggl_circuit_breaker_state", state="closed") == 0
+        assert _value("toggl_circuit_breaker_consecutive_failures") == 2  # noqa: PLR2004
+        assert _value("toggl_circuit_breaker_rejected_requests_total") == 1
+        assert _value("toggl_circuit_breaker_next_probe_seconds") == 60  # noqa: PLR2004
+
+
+if __name__ == "__main__":
+    unittest.main()
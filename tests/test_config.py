@@ -0,0 +1,189 @@
+import tempfile
+import unittest
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from prometheus_toggl_track_exporter import exporter
+from prometheus_toggl_track_exporter.config import (
+    ALL_METRIC_FAMILIES,
+    DEFAULT_TOGGL_API_BASE_URL,
+    ConfigError,
+    ExporterConfig,
+)
+
+
+class TestExporterConfig(unittest.TestCase):
+    def test_defaults(self):
+        config = ExporterConfig.from_env({})
+        assert config == ExporterConfig()
+        assert config.toggl_api_base_url == DEFAULT_TOGGL_API_BASE_URL
+        assert config.time_entries_lookback_hours == (24,)
+
+    def test_parses_environment(self):
+        config = ExporterConfig.from_env(
+            {
+                "TOGGL_API_TOKEN": "token",
+                "TOGGL_API_BASE_URL": "http://127.0.0.1:8080/api/v9/",
+                "EXPORTER_PORT": "9100",
+                "COLLECTION_INTERVAL": "30",
+                "COLLECTION_INTERVAL_MIN": "10",
+                "COLLECTION_INTERVAL_MAX": "600",
+                "TIME_ENTRIES_LOOKBACK_HOURS_LIST": "24, 168,24,720",
+                "READY_IMMEDIATELY": "true",
+                "TIME_ENTRY_DURATION_BUCKETS": "3600, 60,3600,1.5",
+                "TIMEZONE": "Europe/Berlin",
+            }
+        )
+        assert config.toggl_api_token == "token"  # noqa: S105
+        assert config.toggl_api_base_url == "http://127.0.0.1:8080/api/v9"
+        assert config.exporter_port == 9100  # noqa: PLR2004
+        assert config.collection_interval == 30  # noqa: PLR2004
+        assert config.collection_interval_min == 10  # noqa: PLR2004
+        assert config.collection_interval_max == 600  # noqa: PLR2004
+        assert config.time_entries_lookback_hours == (24, 168, 720)
+        assert config.ready_immediately is True
+        assert config.entry_duration_buckets == (1.5, 60.0, 3600.0)
+        assert config.timezone == "Europe/Berlin"
+
+    def test_reports_all_invalid_settings(self):
+        with pytest.raises(ConfigError) as excinfo:
+            ExporterConfig.from_env(
+                {
+                    "EXPORTER_PORT": "70000",
+                    "COLLECTION_INTERVAL": "soon",
+                    "COLLECTION_INTERVAL_MIN": "120",
+                    "TIME_ENTRIES_LOOKBACK_HOURS_LIST": "24,abc,0",
+                    "READY_IMMEDIATELY": "maybe",
+                    "TIME_ENTRY_DURATION_BUCKETS": "60,inf",
+                    "PROFILE_SAMPLE_HZ": "5000",
+                    "TIMEZONE": "Mars/Olympus_Mons",
+                    "METRIC_FAMILIES": "tags,bogus",
+                }
+            )
+        message = str(excinfo.value)
+        assert "EXPORTER_PORT" in message
+        assert "COLLECTION_INTERVAL" in message
+        assert "COLLECTION_INTERVAL_MIN must be <= COLLECTION_INTERVAL" in message
+        assert "'abc'" in message
+        assert "'0'" in message
+        assert "READY_IMMEDIATELY" in message
+        assert "TIME_ENTRY_DURATION_BUCKETS" in message
+        assert "PROFILE_SAMPLE_HZ" in message
+        assert "TIMEZONE" in message
+        assert "'bogus'" in message
+
+    def test_metric_families(self):
+        def _families(raw):
+            return ExporterConfig.from_env({"METRIC_FAMILIES": raw}).metric_families
+
+        assert _families("") == ALL_METRIC_FAMILIES
+        assert _families("clients, TAGS") == ("tags", "clients")
+        assert _families("-user,-histogram") == tuple(
+            f for f in ALL_METRIC_FAMILIES if f not in {"user", "histogram"}
+        )
+        assert _families("all,-entries") == tuple(
+            f for f in ALL_METRIC_FAMILIES if f != "entries"
+        )
+
+    def test_workspaces_and_shards(self):
+        config = ExporterConfig.from_env(
+            {"TOGGL_WORKSPACE_IDS": "12, 34,12", "SHARD_COUNT": "3", "SHARD_INDEX": "2"}
+        )
+        assert config.workspace_ids == (12, 34)
+        assert config.all_workspaces is False
+        assert (config.shard_index, config.shard_count) == (2, 3)
+
+        config = ExporterConfig.from_env(
+            {"TOGGL_WORKSPACE_IDS": "all", "SHARD_COUNT": "2", "HOSTNAME": "exp-1"}
+        )
+        assert config.all_workspaces is True
+        assert config.shard_index == 1
+
+        with pytest.raises(ConfigError, match="SHARD_INDEX"):
+            ExporterConfig.from_env({"SHARD_COUNT": "2", "SHARD_INDEX": "2"})
+        with pytest.raises(ConfigError, match="SHARD_INDEX"):
+            ExporterConfig.from_env({"SHARD_COUNT": "2", "HOSTNAME": "exporter"})
+        with pytest.raises(ConfigError, match="TOGGL_WORKSPACE_IDS"):
+            ExporterConfig.from_env({"SHARD_COUNT": "2", "SHARD_INDEX": "1"})
+
+    def test_http_options(self):
+        config = ExporterConfig.from_env(
+            {
+                "EXPORTER_ADDRESS": "127.0.0.1",
+                "TLS_CERT_FILE": "/tls/cert.pem",
+                "TLS_KEY_FILE": "/tls/key.pem",
+                "BASIC_AUTH_USERNAME": "prometheus",
+                "BASIC_AUTH_PASSWORD": "secret",
+                "HTTP_MAX_CONCURRENT_SCRAPES": "2",
+            }
+        )
+        assert config.exporter_address == "127.0.0.1"
+        assert (config.tls_cert_file, config.tls_key_file) == (
+            "/tls/cert.pem",
+            "/tls/key.pem",
+        )
+        assert config.basic_auth_username == "prometheus"
+        assert config.http_max_concurrent_scrapes == 2  # noqa: PLR2004
+
+        with pytest.raises(ConfigError) as excinfo:
+            ExporterConfig.from_env(
+                {"TLS_CERT_FILE": "/tls/cert.pem", "BASIC_AUTH_USERNAME": "prometheus"}
+            )
+        assert "TLS_KEY_FILE" in str(excinfo.value)
+        assert "BASIC_AUTH_PASSWORD" in str(excinfo.value)
+
+    def test_config_file_overrides_environment(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".env") as f:
+            f.write(
+                "# exporter settings\n"
+                "\n"
+                "COLLECTION_INTERVAL=30\n"
+                "export TIME_ENTRIES_LOOKBACK_HOURS_LIST='24,168'\n"
+            )
+            f.flush()
+            env = {
+                "CONFIG_FILE": f.name,
+                "COLLECTION_INTERVAL": "120",
+                "EXPORTER_PORT": "9100",
+            }
+            config = ExporterConfig.load(env)
+            assert config.collection_interval == 30  # noqa: PLR2004
+            assert config.time_entries_lookback_hours == (24, 168)
+            assert config.exporter_port == 9100  # noqa: PLR2004
+            assert config.config_file == f.name
+
+            f.write("COLLECTION_INTERVAL\n")
+            f.flush()
+            with pytest.raises(ConfigError, match="KEY=VALUE"):
+                ExporterConfig.load(env)
+        with pytest.raises(ConfigError, match="could not be read"):
+            ExporterConfig.load(env)
+
+    def test_configure_applies_module_settings(self):
+        original = exporter.CONFIG
+        try:
+            exporter.configure(
+                ExporterConfig(
+                    toggl_api_token="abc",  # noqa: S106
+                    time_entries_lookback_hours=(1, 2),
+                )
+            )
+            assert exporter.TOGGL_API_TOKEN == "abc"  # noqa: S105
+            assert exporter.TIME_ENTRIES_LOOKBACK_HOURS_LIST == [1, 2]
+        finally:
+            exporter.configure(original)
+
+    def test_register_metrics_is_idempotent(self):
+        registry = CollectorRegistry()
+        exporter.register_metrics(registry)
+        exporter.register_metrics(registry)
+
+        names = {metric.name for metric in registry.collect()}
+        assert "toggl_time_entries_duration_seconds" in names
+        assert "toggl_source_stale" in names
+        assert "toggl_time_entry_elapsed_seconds" in names
+
+
+if __name__ == "__main__":
+    unittest.main()
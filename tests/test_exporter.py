@@ -1,15 +1,21 @@
 import base64
+import contextlib
+import dataclasses
+import os
+import tempfile
+import time
 import unittest
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 from http import HTTPStatus
 from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
 
 import pytest
 import requests
-from prometheus_client import REGISTRY
+from prometheus_client import REGISTRY, CollectorRegistry
 
 # Import the Toggl exporter module
-from prometheus_toggl_track_exporter import exporter
+from prometheus_toggl_track_exporter import exporter, fake_server, sharding
 
 # Constants for tests
 # Use placeholder values for testing
@@ -42,6 +48,7 @@ class TestTogglExporter(unittest.TestCase):
             "prometheus_toggl_track_exporter.exporter.TOGGL_API_TOKEN", TEST_API_TOKEN
         )
         self.mock_api_token = self.api_token_patcher.start()
+        exporter._BREAKERS.reset()
 
         # Register Toggl metrics
         self.api_errors = exporter.TOGGL_API_ERRORS
@@ -81,6 +88,26 @@ class TestTogglExporter(unittest.TestCase):
         self.time_entries_untagged_duration.clear()
         self.time_entries_untagged_count.clear()
 
+        # Reset scrape-time state captured by the collection loop
+        exporter._REGISTERED_TO.clear()
+        exporter._RUNNING_ENTRY = None
+        exporter._TODAY_COMPLETED.clear()
+        exporter._SOURCE_STATE.clear()
+        exporter._PUBLISHED_SERIES.clear()
+        exporter._WINDOW_AGGREGATES.clear()
+        exporter._PUBLISHED_WORKSPACES.clear()
+        exporter._DURATION_HISTOGRAMS.clear()
+        exporter._LABEL_CACHE.clear()
+        exporter._WORKSPACE_MAPPINGS.clear()
+        exporter._TAG_NAMES.clear()
+        exporter._PROJECT_CLIENTS.clear()
+        exporter._reset_entry_store()
+        exporter._BUCKET_TZ = timezone.utc
+        exporter._POLLING.update(interval=None, changed_entries=0)
+        exporter.FIRST_COLLECTION_DONE.clear()
+        for key in exporter._CYCLE_STATUS:
+            exporter._CYCLE_STATUS[key] = None
+
     def tearDown(self):
         # Stop the patcher
         self.api_token_patcher.stop()
@@ -135,20 +162,20 @@ class TestTogglExporter(unittest.TestCase):
         result = exporter.get_current_time_entry()
 
         # Verify results
-        mock_make_request.assert_called_once_with("/me/time_entries/current")
+        mock_make_request.assert_called_once_with("/me/time_entries/current", empty={})
         assert result == mock_response
 
     @patch("prometheus_toggl_track_exporter.exporter._make_toggl_request")
     def test_get_current_time_entry_none_running(self, mock_make_request):
         # Mock API response (no entry running)
-        mock_make_request.return_value = None
+        mock_make_request.return_value = {}
 
         # Test function
         result = exporter.get_current_time_entry()
 
         # Verify results
-        mock_make_request.assert_called_once_with("/me/time_entries/current")
-        assert result is None
+        mock_make_request.assert_called_once_with("/me/time_entries/current", empty={})
+        assert result == {}
 
     def test_get_auth_header_success(self):
         # Test with the patched token
@@ -218,6 +245,26 @@ class TestTogglExporter(unittest.TestCase):
         # The endpoint label is the first part of the path
         assert self.api_errors.labels(endpoint="invalid")._value.get() == 1
 
+    @patch("prometheus_toggl_track_exporter.exporter.requests.request")
+    def test_make_toggl_request_skips_endpoint_with_open_circuit(self, mock_request):
+        mock_response = MagicMock()
+        mock_response.status_code = HTTPStatus.NOT_FOUND
+        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+            response=mock_response
+        )
+        mock_request.return_value = mock_response
+
+        for workspace_id in range(exporter._BREAKERS.failure_threshold):
+            assert exporter._make_toggl_request(f"/workspaces/{workspace_id}/x") is None
+        calls = mock_request.call_count
+
+        # Open for the template, whatever the workspace; other endpoints still run
+        assert exporter._make_toggl_request("/workspaces/99/x") is None
+        assert mock_request.call_count == calls
+        exporter._make_toggl_request("/workspaces/99/tags")
+        assert mock_request.call_count == calls + 1
+        assert exporter._BREAKERS.state("/workspaces/{id}/x") == "open"
+
     @patch("prometheus_toggl_track_exporter.exporter.requests.request")
     def test_make_toggl_request_connection_error(self, mock_request):
         # Mock requests.request to raise ConnectionError
@@ -361,6 +408,96 @@ class TestTogglExporter(unittest.TestCase):
         mock_untagged_duration.clear.assert_called_once()
         mock_untagged_count.clear.assert_called_once()
 
+    @patch("prometheus_toggl_track_exporter.exporter.get_me")
+    @patch("prometheus_toggl_track_exporter.exporter.get_current_time_entry")
+    @patch(
+        "prometheus_toggl_track_exporter.exporter.update_aggregate_metrics", MagicMock()
+    )
+    @patch(
+        "prometheus_toggl_track_exporter.exporter.update_time_entries_metrics",
+        MagicMock(),
+    )
+    def test_collect_metrics_records_cycle_status(self, mock_get_current, mock_get_me):
+        mock_get_me.return_value = {"id": 1, "default_workspace_id": TEST_WORKSPACE_ID}
+        mock_get_current.return_value = {}
+
+        exporter.collect_metrics()
+        first_success = exporter._CYCLE_STATUS["last_success"]
+        assert first_success is not None
+
+        # A cycle where a source falls back to its snapshot is not a success
+        mock_get_me.return_value = None
+        exporter.collect_metrics()
+        assert exporter._CYCLE_STATUS["last_success"] == first_success
+        assert exporter._CYCLE_STATUS["last_cycle_end"] >= first_success
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_me")
+    @patch("prometheus_toggl_track_exporter.exporter.get_current_time_entry")
+    @patch(
+        "prometheus_toggl_track_exporter.exporter.update_aggregate_metrics", MagicMock()
+    )
+    @patch(
+        "prometheus_toggl_track_exporter.exporter.update_time_entries_metrics",
+        MagicMock(),
+    )
+    def test_failed_current_entry_fetch_keeps_running_timer(
+        self, mock_get_current, mock_get_me
+    ):
+        mock_get_me.return_value = {"id": 1, "default_workspace_id": TEST_WORKSPACE_ID}
+        mock_get_current.return_value = {
+            "id": 123,
+            "workspace_id": TEST_WORKSPACE_ID,
+            "start": datetime.now(timezone.utc).isoformat(),
+            "duration": -1,
+        }
+        exporter.collect_metrics()
+        running = exporter._RUNNING_ENTRY
+        assert running is not None
+
+        # The request failed: the timer keeps running, from stale data
+        mock_get_current.return_value = None
+        exporter.collect_metrics()
+        assert running == exporter._RUNNING_ENTRY
+        assert exporter._SOURCE_STATE["current_time_entry", ""]["stale"]
+
+        # No timer running
+        mock_get_current.return_value = {}
+        exporter.collect_metrics()
+        assert exporter._RUNNING_ENTRY is None
+
+    def test_readiness_waits_for_first_collection(self):
+        exporter._fetch_source("me", "", lambda: {"id": 1})
+
+        ready, details = exporter.readiness_status()
+        assert ready is False
+        assert details["sources"]["me"]["stale"] is False
+
+        exporter.FIRST_COLLECTION_DONE.set()
+        ready, details = exporter.readiness_status()
+        assert ready is True
+        assert details["first_collection_done"] is True
+
+        exporter.FIRST_COLLECTION_DONE.clear()
+        with patch.object(exporter, "READY_IMMEDIATELY", True):
+            ready, _ = exporter.readiness_status()
+        assert ready is True
+
+    def test_health_fails_when_cycle_is_wedged(self):
+        now = exporter.time.time()
+        exporter._CYCLE_STATUS["last_cycle_start"] = now - 10
+        healthy, details = exporter.health_status()
+        assert healthy is True
+        assert details["cycle_in_progress"] is True
+
+        exporter._CYCLE_STATUS["last_cycle_start"] = now - 3600
+        healthy, _ = exporter.health_status()
+        assert healthy is False
+
+        exporter._CYCLE_STATUS["last_cycle_end"] = now
+        healthy, details = exporter.health_status()
+        assert healthy is True
+        assert details["cycle_in_progress"] is False
+
     def test_update_running_timer_metrics_running(self):
         """Test updating metrics when a timer is running."""
         start_time = datetime.now(timezone.utc) - timedelta(minutes=10)
@@ -434,6 +571,51 @@ class TestTogglExporter(unittest.TestCase):
         # Testing this directly is hard; the main check is that the function doesn't
         # crash and doesn't incorrectly clear metrics.
 
+    def test_live_timer_collector_computes_elapsed_at_scrape(self):
+        """Test elapsed and today's total are derived from the scrape clock."""
+        now = datetime.now(timezone.utc)
+        start_time = now - timedelta(minutes=10)
+        completed_today = 1800.0
+        entry = {
+            "id": 999,
+            "workspace_id": TEST_WORKSPACE_ID,
+            "project_id": TEST_PROJECT_ID,
+            "project_name": TEST_PROJECT_NAME,
+            "start": start_time.isoformat(),
+            "duration": -1,
+            "description": "Live",
+            "tags": [],
+            "billable": False,
+        }
+        exporter.update_running_timer_metrics(entry)
+        exporter._TODAY_COMPLETED[str(TEST_WORKSPACE_ID)] = (
+            now.date(),
+            completed_today,
+        )
+
+        elapsed, today_total = exporter.LiveTimerCollector().collect()
+
+        assert len(elapsed.samples) == 1
+        assert elapsed.samples[0].labels["workspace_id"] == str(TEST_WORKSPACE_ID)
+        assert elapsed.samples[0].value == pytest.approx(600, abs=5)
+
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        running_today = min(600, (now - midnight).total_seconds())
+        assert today_total.samples[0].labels == {"workspace_id": str(TEST_WORKSPACE_ID)}
+        assert today_total.samples[0].value == pytest.approx(
+            completed_today + running_today, abs=5
+        )
+
+    def test_live_timer_collector_no_running_entry(self):
+        """Test no elapsed series is exported once the timer stops."""
+        exporter._RUNNING_ENTRY = {"labels": {}, "start": 0}
+        exporter.update_running_timer_metrics(None)
+
+        elapsed, today_total = exporter.LiveTimerCollector().collect()
+
+        assert elapsed.samples == []
+        assert today_total.samples == []
+
     @patch("prometheus_toggl_track_exporter.exporter.get_projects")
     @patch("prometheus_toggl_track_exporter.exporter.get_clients")
     @patch("prometheus_toggl_track_exporter.exporter.get_tags")
@@ -518,6 +700,55 @@ class TestTogglExporter(unittest.TestCase):
             == expected_count_on_error
         )
 
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects")
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags")
+    def test_update_aggregate_metrics_serves_last_good_snapshot(
+        self, mock_get_tags, mock_get_clients, mock_get_projects
+    ):
+        """Test a failed refresh keeps serving the previous snapshot."""
+        expected_project_count = 2
+        mock_get_projects.return_value = [{"id": 1}, {"id": 2}]
+        mock_get_clients.return_value = []
+        mock_get_tags.return_value = []
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+
+        mock_get_projects.return_value = None
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+
+        ws_label = str(TEST_WORKSPACE_ID)
+        assert (
+            self.projects_total.labels(workspace_id=ws_label)._value.get()
+            == expected_project_count
+        )
+        state = exporter._SOURCE_STATE[("projects", ws_label)]
+        assert state["stale"] is True
+        assert state["consecutive_failures"] == 1
+        assert exporter._SOURCE_STATE[("clients", ws_label)]["stale"] is False
+
+    def test_source_freshness_collector(self):
+        """Test per-source age and staleness are exported."""
+        exporter._fetch_source("me", "", lambda: {"id": 1})
+        exporter._fetch_source("me", "", lambda: None)
+        exporter._fetch_source("tags", "1", lambda: None)
+
+        families = {f.name: f for f in exporter.SourceFreshnessCollector().collect()}
+
+        def _samples(name):
+            return {
+                (s.labels["source"], s.labels["workspace_id"]): s.value
+                for s in families[name].samples
+            }
+
+        assert _samples("toggl_source_stale") == {("me", ""): 1, ("tags", "1"): 1}
+        assert _samples("toggl_source_consecutive_failures") == {
+            ("me", ""): 1,
+            ("tags", "1"): 1,
+        }
+        # Sources that never succeeded have no age
+        assert list(_samples("toggl_source_age_seconds")) == [("me", "")]
+        assert _samples("toggl_source_age_seconds")[("me", "")] >= 0
+
     @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
     @patch("prometheus_toggl_track_exporter.exporter.get_projects")
     @patch("prometheus_toggl_track_exporter.exporter.get_tasks")
@@ -774,6 +1005,926 @@ class TestTogglExporter(unittest.TestCase):
             == expected_dummy_count
         )
 
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    def test_labels_reused_until_reference_data_changes(
+        self,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,
+        mock_get_time_entries,
+    ):
+        now = datetime.now(timezone.utc)
+        mock_get_time_entries.return_value = [
+            {
+                "id": i,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "project_id": 7,
+                "duration": 600,
+                "tags": ["b", "a"],
+                "billable": True,
+                "start": (now - timedelta(minutes=30)).isoformat(),
+            }
+            for i in range(3)
+        ]
+        mock_get_projects.return_value = [{"id": 7, "name": "Alpha"}]
+        ws_label = str(TEST_WORKSPACE_ID)
+
+        def _labels():
+            return next(iter(exporter._LABEL_CACHE[ws_label][2].values()))[0]
+
+        def _count(project_name):
+            return REGISTRY.get_sample_value(
+                "toggl_time_entries_count",
+                {
+                    "workspace_id": ws_label,
+                    "project_id": "7",
+                    "project_name": project_name,
+                    "task_id": "none",
+                    "task_name": "none",
+                    "tags": "a,b",
+                    "billable": "True",
+                    "timeframe": "1h",
+                },
+            )
+
+        exporter.register_metrics()
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        first_labels = _labels()
+        children = exporter._PUBLISHED_SERIES[
+            (self.time_entries_count, (ws_label, "1h"))
+        ]
+        first_child = children[first_labels]
+
+        # Unchanged reference data: the same label tuple and child are reused
+        mock_get_projects.return_value = [{"id": 7, "name": "Alpha"}]
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert _labels() is first_labels
+        assert children[first_labels] is first_child
+        assert _count("Alpha") == 3  # noqa: PLR2004
+
+        # A renamed project invalidates the workspace's cached labels
+        mock_get_projects.return_value = [{"id": 7, "name": "Beta"}]
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert _labels()[2] == "Beta"
+        assert _count("Beta") == 3  # noqa: PLR2004
+        assert _count("Alpha") is None
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags")
+    def test_per_tag_metrics(
+        self,
+        mock_get_tags,
+        mock_get_clients,  # noqa: ARG002
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,  # noqa: ARG002
+        mock_get_time_entries,
+    ):
+        now = datetime.now(timezone.utc)
+        start = (now - timedelta(minutes=30)).isoformat()
+        mock_get_tags.return_value = [
+            {"id": 100, "name": "dev"},
+            {"id": 101, "name": "internal"},
+        ]
+        mock_get_time_entries.return_value = [
+            {
+                "id": 1,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "duration": 600,
+                "tags": ["dev", "internal"],
+                "tag_ids": [100, 101],
+                "start": start,
+            },
+            {
+                "id": 2,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "duration": 300,
+                "tags": ["dev"],
+                "tag_ids": [100],
+                "start": start,
+            },
+            {
+                "id": 3,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "duration": 120,
+                "tags": [],
+                "start": start,
+            },
+        ]
+        ws_label = str(TEST_WORKSPACE_ID)
+
+        def _value(name, tag_id, tag_name):
+            return REGISTRY.get_sample_value(
+                name,
+                {
+                    "workspace_id": ws_label,
+                    "tag_id": tag_id,
+                    "tag_name": tag_name,
+                    "timeframe": "1h",
+                },
+            )
+
+        exporter.register_metrics()
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+
+        assert (
+            REGISTRY.get_sample_value(
+                "toggl_tag_info",
+                {"workspace_id": ws_label, "tag_id": "101", "tag_name": "internal"},
+            )
+            == 1
+        )
+        # Entries count once towards each of their tags, not per combination
+        duration = "toggl_tag_time_entries_duration_seconds"
+        assert _value(duration, "100", "dev") == 900  # noqa: PLR2004
+        assert _value(duration, "101", "internal") == 600  # noqa: PLR2004
+        assert _value("toggl_tag_time_entries_count", "100", "dev") == 2  # noqa: PLR2004
+        assert _value("toggl_tag_time_entries_count", "101", "internal") == 1
+
+        # A deleted tag drops out of both the info and per-tag series
+        mock_get_tags.return_value = [{"id": 100, "name": "dev"}]
+        mock_get_time_entries.return_value = mock_get_time_entries.return_value[1:]
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert _value(duration, "100", "dev") == 300  # noqa: PLR2004
+        assert _value(duration, "101", "internal") is None
+        assert (
+            REGISTRY.get_sample_value(
+                "toggl_tag_info",
+                {"workspace_id": ws_label, "tag_id": "101", "tag_name": "internal"},
+            )
+            is None
+        )
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags", return_value=[])
+    def test_per_client_rollups(
+        self,
+        mock_get_tags,  # noqa: ARG002
+        mock_get_clients,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,
+        mock_get_time_entries,
+    ):
+        start = (datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat()
+        mock_get_clients.return_value = [{"id": 10, "name": "Acme"}]
+        mock_get_projects.return_value = [
+            {"id": 1, "name": "Site", "client_id": 10},
+            {"id": 2, "name": "App", "client_id": 10},
+            {"id": 3, "name": "Internal"},
+        ]
+
+        def _entry(entry_id, project_id, duration, billable):
+            return {
+                "id": entry_id,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "project_id": project_id,
+                "duration": duration,
+                "tags": [],
+                "billable": billable,
+                "start": start,
+            }
+
+        mock_get_time_entries.return_value = [
+            _entry(1, 1, 600, True),
+            _entry(2, 2, 300, False),
+            _entry(3, 2, 300, True),
+            _entry(4, 3, 120, False),
+            _entry(5, None, 60, False),
+        ]
+        ws_label = str(TEST_WORKSPACE_ID)
+
+        def _value(name, client_id, client_name):
+            return REGISTRY.get_sample_value(
+                f"toggl_client_time_entries_{name}",
+                {
+                    "workspace_id": ws_label,
+                    "client_id": client_id,
+                    "client_name": client_name,
+                    "timeframe": "1h",
+                },
+            )
+
+        exporter.register_metrics()
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+
+        assert _value("duration_seconds", "10", "Acme") == 1200  # noqa: PLR2004
+        assert _value("billable_duration_seconds", "10", "Acme") == 900  # noqa: PLR2004
+        assert _value("count", "10", "Acme") == 3  # noqa: PLR2004
+        # Projects without a client and entries without a project
+        assert _value("duration_seconds", "none", "none") == 180  # noqa: PLR2004
+        assert _value("billable_duration_seconds", "none", "none") == 0
+        assert _value("count", "none", "none") == 2  # noqa: PLR2004
+
+        # Moving a project to another client moves its time with it
+        mock_get_clients.return_value.append({"id": 11, "name": "Globex"})
+        mock_get_projects.return_value[1]["client_id"] = 11
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert _value("duration_seconds", "10", "Acme") == 600  # noqa: PLR2004
+        assert _value("duration_seconds", "11", "Globex") == 600  # noqa: PLR2004
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags")
+    def test_changed_entries_update_only_their_series(
+        self,
+        mock_get_tags,
+        mock_get_clients,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,
+        mock_get_time_entries,
+    ):
+        start = (datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat()
+        mock_get_tags.return_value = [{"id": 100, "name": "dev"}]
+        mock_get_clients.return_value = [{"id": 10, "name": "Acme"}]
+        mock_get_projects.return_value = [
+            {"id": 1, "name": "Site", "client_id": 10},
+            {"id": 2, "name": "App"},
+        ]
+        entries = [
+            {
+                "id": entry_id,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "project_id": 1 + entry_id % 2,
+                "duration": 60 * entry_id,
+                "billable": entry_id % 3 == 0,
+                "tags": ["dev"] if entry_id % 4 else [],
+                "tag_ids": [100] if entry_id % 4 else [],
+                "start": start,
+            }
+            for entry_id in range(1, 11)
+        ]
+        entries[0].update(tags=["solo"], tag_ids=[])
+        mock_get_time_entries.return_value = entries
+
+        def _samples():
+            return {
+                (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+                for metric in REGISTRY.collect()
+                for sample in metric.samples
+                if sample.labels.get("timeframe") == "1h"
+            }
+
+        exporter.register_metrics()
+        exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert any(("tag_name", "solo") in labels for _, labels in _samples())
+
+        # One entry added, one changed and one deleted: only those are
+        # aggregated, and the result matches a rebuild
+        mock_get_time_entries.return_value = [
+            *entries[1:8],
+            {**entries[8], "project_id": 2, "tags": [], "tag_ids": []},
+            entries[9],
+            {**entries[9], "id": 11, "billable": True},
+        ]
+        with patch.object(
+            exporter, "_aggregate_entries", wraps=exporter._aggregate_entries
+        ) as aggregate:
+            exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+            assert not aggregate.called
+        # The changed and the new entry count as activity; the deleted not
+        assert exporter._POLLING["changed_entries"] == 2  # noqa: PLR2004
+        incremental = _samples()
+        # The deleted entry took its tag's series with it
+        assert not any(("tag_name", "solo") in labels for _, labels in incremental)
+
+        exporter._WINDOW_AGGREGATES.clear()
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 1)
+        assert incremental == _samples()
+
+    def test_collection_interval_adapts_to_activity(self):
+        original = exporter.CONFIG
+        self.addCleanup(exporter.configure, original)
+        exporter.register_metrics()
+        # Without bounds the interval is fixed
+        assert (
+            exporter._collection_interval(active=True) == original.collection_interval
+        )
+        assert exporter._collection_interval(active=False) == (
+            original.collection_interval
+        )
+
+        exporter.configure(
+            dataclasses.replace(
+                original,
+                collection_interval=60,
+                collection_interval_min=15,
+                collection_interval_max=600,
+            )
+        )
+        exporter._POLLING["interval"] = None
+        # Idle cycles back off exponentially up to the maximum
+        assert [exporter._collection_interval(active=False) for _ in range(5)] == [
+            120,
+            240,
+            480,
+            600,
+            600,
+        ]
+        assert exporter._collection_interval(active=True) == 15  # noqa: PLR2004
+        assert exporter._collection_interval(active=False) == 30  # noqa: PLR2004
+        assert REGISTRY.get_sample_value("toggl_collection_interval_seconds") == 30  # noqa: PLR2004
+
+        # A running timer or changed entries count as activity
+        assert not exporter._user_active()
+        exporter._POLLING["changed_entries"] = 1
+        assert exporter._user_active()
+        exporter._POLLING["changed_entries"] = 0
+        exporter._RUNNING_ENTRY = {"labels": {}, "start": time.time()}
+        assert exporter._user_active()
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags", return_value=[])
+    def test_reload_drops_only_affected_state(
+        self,
+        mock_get_tags,  # noqa: ARG002
+        mock_get_clients,  # noqa: ARG002
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,  # noqa: ARG002
+        mock_get_time_entries,
+    ):
+        start = (datetime.now(timezone.utc) - timedelta(minutes=30)).isoformat()
+        mock_get_time_entries.return_value = [
+            {"id": 1, "workspace_id": TEST_WORKSPACE_ID, "start": start, "duration": 60}
+        ]
+        ws_label = str(TEST_WORKSPACE_ID)
+
+        def _count(timeframe):
+            return REGISTRY.get_sample_value(
+                "toggl_time_entries_untagged_count",
+                {"workspace_id": ws_label, "timeframe": timeframe},
+            )
+
+        original = exporter.CONFIG
+        config = dataclasses.replace(
+            original,
+            toggl_api_token=TEST_API_TOKEN,
+            time_entries_lookback_hours=(1, 2),
+        )
+        try:
+            exporter.configure(config)
+            exporter.register_metrics()
+            exporter.update_aggregate_metrics(TEST_WORKSPACE_ID)
+            for hours in (1, 2):
+                exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, hours)
+            assert _count("1h") == _count("2h") == 1
+
+            changed = exporter.apply_config(
+                dataclasses.replace(
+                    config, time_entries_lookback_hours=(1,), exporter_port=1
+                )
+            )
+            # The port waits for a restart; the dropped window takes its
+            # series and snapshot with it, everything else is kept
+            assert changed == ["time_entries_lookback_hours"]
+            assert config.exporter_port == exporter.EXPORTER_PORT
+            assert exporter.TIME_ENTRIES_LOOKBACK_HOURS_LIST == [1]
+            assert _count("1h") == 1
+            assert _count("2h") is None
+            assert ("time_entries_2h", "") not in exporter._SOURCE_STATE
+            assert ("projects", ws_label) in exporter._SOURCE_STATE
+            assert ws_label in exporter._LABEL_CACHE
+            assert exporter.apply_config(exporter.CONFIG) == []
+
+            # Another token: no snapshot or cache carries over
+            exporter.apply_config(
+                dataclasses.replace(
+                    exporter.CONFIG,
+                    toggl_api_token="other",  # noqa: S106
+                )
+            )
+            assert not exporter._SOURCE_STATE
+            assert not exporter._LABEL_CACHE
+        finally:
+            exporter.configure(original)
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    def test_days_bucketed_in_user_time_zone(
+        self,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,  # noqa: ARG002
+        mock_get_time_entries,
+    ):
+        # 23:00 and 01:00 UTC around a midnight two days ago: two UTC days,
+        # but the same day in Tokyo (UTC+9)
+        midnight = datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        ) - timedelta(days=1)
+        mock_get_time_entries.return_value = [
+            {
+                "id": i,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "duration": 600,
+                "tags": [],
+                "start": start.isoformat(),
+            }
+            for i, start in enumerate(
+                (midnight - timedelta(hours=1), midnight + timedelta(hours=1))
+            )
+        ]
+        labels = {"workspace_id": str(TEST_WORKSPACE_ID), "timeframe": "96h"}
+
+        exporter._resolve_timezone({"timezone": "UTC"})
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 96)
+        assert self.time_entries_distinct_days.labels(**labels)._value.get() == 2  # noqa: PLR2004
+
+        exporter._resolve_timezone({"timezone": "Asia/Tokyo"})
+        exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 96)
+        assert self.time_entries_distinct_days.labels(**labels)._value.get() == 1
+
+        # A configured TIMEZONE overrides the profile; no /me keeps the last
+        with patch.object(exporter, "TIMEZONE", "UTC"):
+            exporter._resolve_timezone({"timezone": "Asia/Tokyo"})
+        assert exporter._BUCKET_TZ is ZoneInfo("UTC")
+        exporter._resolve_timezone(None)
+        assert exporter._BUCKET_TZ is ZoneInfo("UTC")
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_tags", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_clients", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects", return_value=[])
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_current_time_entry")
+    @patch("prometheus_toggl_track_exporter.exporter.get_me")
+    def test_collect_metrics_multiple_workspaces(  # noqa: PLR0913
+        self,
+        mock_get_me,
+        mock_get_current,
+        mock_get_time_entries,
+        mock_get_projects,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_clients,  # noqa: ARG002
+        mock_get_tags,  # noqa: ARG002
+    ):
+        """Each workspace keeps its own series; entries are fetched once."""
+        now = datetime.now(timezone.utc)
+        other_workspace_id = TEST_WORKSPACE_ID + 1
+        mock_get_me.return_value = {"id": 1, "default_workspace_id": TEST_WORKSPACE_ID}
+        mock_get_current.return_value = {}
+        mock_get_time_entries.return_value = [
+            {
+                "id": 1000 + i,
+                "workspace_id": ws_id,
+                "duration": 600,
+                "tags": [],
+                "start": (now - timedelta(hours=1)).isoformat(),
+            }
+            for i, ws_id in enumerate([TEST_WORKSPACE_ID, other_workspace_id])
+        ]
+
+        def _count(ws_id):
+            return REGISTRY.get_sample_value(
+                "toggl_time_entries_count",
+                {
+                    "workspace_id": str(ws_id),
+                    "project_id": "none",
+                    "project_name": "none",
+                    "task_id": "none",
+                    "task_name": "none",
+                    "tags": "",
+                    "billable": "False",
+                    "timeframe": "24h",
+                },
+            )
+
+        exporter.register_metrics()
+        with (
+            patch.object(
+                exporter, "WORKSPACE_IDS", [TEST_WORKSPACE_ID, other_workspace_id]
+            ),
+            patch.object(exporter, "TIME_ENTRIES_LOOKBACK_HOURS_LIST", [24]),
+        ):
+            exporter.collect_metrics()
+
+        assert mock_get_time_entries.call_count == 1
+        assert mock_get_projects.call_count == 2  # noqa: PLR2004
+        assert _count(TEST_WORKSPACE_ID) == 1
+        assert _count(other_workspace_id) == 1
+
+        # Dropping a workspace removes only its series
+        with (
+            patch.object(exporter, "WORKSPACE_IDS", [TEST_WORKSPACE_ID]),
+            patch.object(exporter, "TIME_ENTRIES_LOOKBACK_HOURS_LIST", [24]),
+        ):
+            exporter.collect_metrics()
+
+        assert _count(TEST_WORKSPACE_ID) == 1
+        assert _count(other_workspace_id) is None
+        assert (
+            REGISTRY.get_sample_value(
+                "toggl_projects_total", {"workspace_id": str(other_workspace_id)}
+            )
+            is None
+        )
+
+    @patch("prometheus_toggl_track_exporter.exporter.get_time_entries")
+    @patch("prometheus_toggl_track_exporter.exporter.get_projects")
+    @patch("prometheus_toggl_track_exporter.exporter.get_tasks", return_value=[])
+    def test_entry_duration_histogram(
+        self,
+        mock_get_tasks,  # noqa: ARG002
+        mock_get_projects,
+        mock_get_time_entries,
+    ):
+        """Durations are bucketed per project in the aggregation pass."""
+        now = datetime.now(timezone.utc)
+        mock_get_projects.return_value = [
+            {"id": TEST_PROJECT_ID, "name": TEST_PROJECT_NAME}
+        ]
+        mock_get_time_entries.return_value = [
+            {
+                "id": 1000 + i,
+                "workspace_id": TEST_WORKSPACE_ID,
+                "project_id": TEST_PROJECT_ID,
+                "duration": duration,
+                "start": (now - timedelta(hours=2)).isoformat(),
+            }
+            for i, duration in enumerate([60, 300, 1000, 100000])
+        ]
+
+        registry = CollectorRegistry()
+        registry.register(exporter.EntryDurationHistogramCollector())
+        with patch.object(exporter, "ENTRY_DURATION_BUCKETS", [300.0, 3600.0]):
+            exporter.update_time_entries_metrics(TEST_WORKSPACE_ID, 24)
+
+        labels = {
+            "workspace_id": str(TEST_WORKSPACE_ID),
+            "project_id": str(TEST_PROJECT_ID),
+            "project_name": TEST_PROJECT_NAME,
+            "timeframe": "24h",
+        }
+
+        def _bucket(le):
+            return registry.get_sample_value(
+                "toggl_time_entry_duration_seconds_bucket", {**labels, "le": le}
+            )
+
+        assert _bucket("300.0") == 2  # noqa: PLR2004
+        assert _bucket("3600.0") == 3  # noqa: PLR2004
+        assert _bucket("+Inf") == 4  # noqa: PLR2004
+        assert registry.get_sample_value(
+            "toggl_time_entry_duration_seconds_gsum", labels
+        ) == (60 + 300 + 1000 + 100000)
+
+    def test_published_histograms_do_not_share_state(self):
+        counts = [1, 0, 0]
+        state = {
+            "histogram_bounds": (300.0, 3600.0),
+            "duration_histograms": {("1", "2", "p", "24h"): (counts, 60.0)},
+        }
+        exporter._publish_histograms(state, "24h", "1")
+        # Later cycles update the aggregation state in place
+        counts[0] += 1
+        _, series = exporter._DURATION_HISTOGRAMS["1", "24h"]
+        assert series["1", "2", "p", "24h"] == ([1, 0, 0], 60.0)
+
+
+class TestDayBoundaries(unittest.TestCase):
+    def test_matches_time_zone_conversion(self):
+        berlin = ZoneInfo("Europe/Berlin")
+        # Spans both daylight saving transitions
+        days = exporter.DayBoundaries(berlin, date(2024, 3, 1), date(2024, 11, 30))
+        start = datetime(2024, 2, 28, tzinfo=timezone.utc)
+        for hour in range(0, 24 * 280, 7):
+            dt = start + timedelta(hours=hour, seconds=59.5)
+            expected = dt.astimezone(berlin).date()
+            assert days.date_of(dt.isoformat()) == expected
+            assert days.date_of(dt.isoformat().replace("+00:00", "Z")) == expected
+            # Non-UTC offsets are converted
+            offset = dt.astimezone(timezone(timedelta(hours=-5)))
+            assert days.date_of(offset.isoformat()) == expected
+
+    def test_boundaries_fall_on_local_midnight(self):
+        days = exporter.DayBoundaries(
+            ZoneInfo("Europe/Berlin"), date(2024, 3, 30), date(2024, 3, 31)
+        )
+        # Midnight CET is 23:00 UTC; after the switch to CEST, 22:00 UTC
+        assert days.date_of("2024-03-29T22:59:59Z") == date(2024, 3, 29)
+        assert days.date_of("2024-03-29T23:00:00Z") == date(2024, 3, 30)
+        assert days.date_of("2024-03-31T21:59:59Z") == date(2024, 3, 31)
+        assert days.date_of("2024-03-31T22:00:00Z") == date(2024, 4, 1)
+        assert days.date_of("not a date") is None
+
+
+class TestOnceMode(unittest.TestCase):
+    """--once runs against the fake API with a persistent state file."""
+
+    def setUp(self):
+        for collector in list(REGISTRY._names_to_collectors.values()):
+            with contextlib.suppress(KeyError):
+                REGISTRY.unregister(collector)
+        exporter._REGISTERED_TO.clear()
+        exporter._SOURCE_STATE.clear()
+        exporter._BREAKERS.reset()
+        exporter._PUBLISHED_SERIES.clear()
+        exporter._WINDOW_AGGREGATES.clear()
+        exporter._PUBLISHED_WORKSPACES.clear()
+        exporter._DURATION_HISTOGRAMS.clear()
+        exporter._reset_entry_store()
+        for key in exporter._CYCLE_STATUS:
+            exporter._CYCLE_STATUS[key] = None
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = fake_server.start_fake_server(
+            fake_server.generate_fixtures(seed=5, time_entries=100, days=2)
+        )
+        self.original_config = exporter.CONFIG
+        self.config = exporter.ExporterConfig(
+            toggl_api_token=TEST_API_TOKEN,
+            toggl_api_base_url=self.server.base_url,
+            state_file=os.path.join(self.tmp_dir.name, "state.json"),
+            reference_ttl=3600,
+            time_entries_lookback_hours=(24, 48),
+        )
+        exporter.configure(self.config)
+        exporter.register_metrics()
+        self.textfile = os.path.join(self.tmp_dir.name, "toggl.prom")
+        self.args = exporter.parse_args(["--once", "--textfile", self.textfile])
+
+    def tearDown(self):
+        exporter.configure(self.original_config)
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def _restart(self):
+        """Simulates a new process: clears memory and reloads the state file."""
+        exporter._SOURCE_STATE.clear()
+        exporter._reset_entry_store()
+        exporter._BREAKERS.reset()
+        for key in exporter._CYCLE_STATUS:
+            exporter._CYCLE_STATUS[key] = None
+        assert exporter.load_state(self.config.state_file)
+
+    def test_once_writes_textfile_and_reuses_state(self):
+        assert exporter.run_once(self.args, self.config) == exporter.EXIT_OK
+        with open(self.textfile, encoding="utf-8") as f:
+            content = f.read()
+        assert "toggl_time_entries_count{" in content
+        counts = self.server.request_counts
+        assert counts["/me/time_entries"] == 1
+        project_fetches = sum(v for k, v in counts.items() if k.endswith("/projects"))
+
+        self._restart()
+        assert exporter.run_once(self.args, self.config) == exporter.EXIT_OK
+        # Entries are synced via `since` and reference data is within its TTL
+        assert counts["/me/time_entries"] == 2  # noqa: PLR2004
+        assert (
+            sum(v for k, v in counts.items() if k.endswith("/projects"))
+            == project_fetches
+        )
+        assert len(exporter._ENTRY_STORE["entries"]) == len(
+            self.server.fixtures["time_entries"]
+        )
+
+    def test_permanently_failing_endpoint_stops_failing_runs(self):
+        route = fake_server.FakeTogglHandler._route
+
+        def _route(handler, path, query):
+            if path.endswith("/clients"):
+                return fake_server._NOT_FOUND
+            return route(handler, path, query)
+
+        exit_codes = []
+        with patch.object(fake_server.FakeTogglHandler, "_route", _route):
+            for _ in range(5):
+                exit_codes.append(exporter.run_once(self.args, self.config))
+                self._restart()
+        # Failing runs until the circuit opens, which persists across runs
+        failed, ok = exporter.EXIT_COLLECTION_FAILED, exporter.EXIT_OK
+        assert exit_codes == [failed, failed, ok, ok, ok]
+        clients = [k for k in self.server.request_counts if k.endswith("/clients")]
+        assert sum(self.server.request_counts[k] for k in clients) == 3  # noqa: PLR2004
+        labels = {"source": "clients", "workspace_id": clients[0].split("/")[2]}
+        assert REGISTRY.get_sample_value("toggl_source_stale", labels) == 1
+        assert REGISTRY.get_sample_value("toggl_source_circuit_open", labels) == 1
+
+    def test_entry_store_without_state_file(self):
+        config = dataclasses.replace(self.config, state_file=None)
+        exporter.configure(config)
+        assert exporter.run_once(self.args, config) == exporter.EXIT_OK
+        # Both windows are served from one sync, held in memory only
+        assert self.server.request_counts["/me/time_entries"] == 1
+        assert exporter._ENTRY_STORE["entries"]
+        assert REGISTRY.get_sample_value("toggl_entry_store_bytes")
+        assert not os.path.exists(self.config.state_file)
+
+    def test_entry_store_budget_evicts_oldest_entries(self):
+        def _series(timeframe):
+            with open(self.textfile, encoding="utf-8") as f:
+                return sorted(
+                    line
+                    for line in f
+                    if line.startswith("toggl_time_entries_count{")
+                    and f'timeframe="{timeframe}"' in line
+                )
+
+        assert exporter.run_once(self.args, self.config) == exporter.EXIT_OK
+        series = _series("48h")
+        stored = exporter._ENTRY_STORE["entries"]
+        assert all(
+            set(entry) <= set(exporter.STORED_ENTRY_FIELDS) for entry in stored.values()
+        )
+
+        exporter.ENTRY_STORE_MAX_BYTES = exporter._ENTRY_STORE["bytes"] // 2
+        assert exporter.run_once(self.args, self.config) == exporter.EXIT_OK
+        assert exporter._ENTRY_STORE["bytes"] <= exporter.ENTRY_STORE_MAX_BYTES
+        assert len(exporter._ENTRY_STORE["entries"]) < len(stored)
+        assert exporter._ENTRY_STORE["complete_since"] > time.time() - 48 * 3600
+        assert REGISTRY.get_sample_value(
+            "toggl_entry_store_evicted_entries_total", {"reason": "budget"}
+        )
+        assert (
+            REGISTRY.get_sample_value("toggl_entry_store_bytes")
+            == (exporter._ENTRY_STORE["bytes"])
+        )
+        # The 48h window now reaches past the store and is fetched directly,
+        # with unchanged results
+        assert self.server.request_counts["/me/time_entries"] >= 3  # noqa: PLR2004
+        assert _series("48h") == series
+
+    def test_entry_store_budget_with_empty_store(self):
+        complete_since = time.time() - 3600
+        exporter._ENTRY_STORE.update(
+            entries={}, bytes=4096, complete_since=complete_since
+        )
+        exporter.ENTRY_STORE_MAX_BYTES = 1024
+        exporter._evict_over_budget()
+        # The drifted byte count is reset; coverage is unchanged
+        assert exporter._ENTRY_STORE["bytes"] == 0
+        assert complete_since == exporter._ENTRY_STORE["complete_since"]
+
+    def test_only_the_user_shard_fetches_time_entries(self):
+        server = fake_server.start_fake_server(
+            fake_server.generate_fixtures(
+                seed=5, workspace_count=4, time_entries=100, days=2
+            )
+        )
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        user_shard = sharding.shard_for(sharding.USER_SHARD_KEY, 2)
+        # A workspace of the other shard without entries needs no names on the
+        # user shard
+        idle = next(
+            ws
+            for ws in server.fixtures["workspaces"]
+            if sharding.shard_for(ws, 2) != user_shard
+        )
+        server.fixtures["time_entries"] = [
+            entry
+            for entry in server.fixtures["time_entries"]
+            if str(entry["workspace_id"]) != idle
+        ]
+        workspaces = set(server.fixtures["workspaces"])
+        counts = server.request_counts
+        exporter.TOGGL_TIME_ENTRIES_COUNT.clear()
+
+        for shard_index in (1 - user_shard, user_shard):
+            config = dataclasses.replace(
+                self.config,
+                toggl_api_base_url=server.base_url,
+                all_workspaces=True,
+                shard_index=shard_index,
+                shard_count=2,
+                state_file=None,
+            )
+            exporter.configure(config)
+            assert exporter.run_once(self.args, config) == exporter.EXIT_OK
+            with open(self.textfile, encoding="utf-8") as f:
+                entry_workspaces = {
+                    line.split('workspace_id="')[1].split('"')[0]
+                    for line in f
+                    if line.startswith("toggl_time_entries_count{")
+                }
+            if shard_index == user_shard:
+                assert entry_workspaces == workspaces - {idle}
+            else:
+                assert not entry_workspaces
+                assert counts["/me/time_entries"] == 0
+                assert counts["/me"] == 0
+                idle_fetches = counts[f"/workspaces/{idle}/projects"]
+        assert counts["/me/time_entries"] == 1
+        assert counts[f"/workspaces/{idle}/projects"] == idle_fetches == 1
+        assert counts[f"/workspaces/{idle}/tasks"] == 0
+
+    def test_disabled_families_skip_their_requests(self):
+        config = dataclasses.replace(
+            self.config, metric_families=("tags",), timezone="UTC", state_file=None
+        )
+        exporter.configure(config)
+        # Drop series left by other tests in the shared metrics
+        exporter.TOGGL_TIME_ENTRIES_COUNT.clear()
+        exporter.TOGGL_TAG_INFO.clear()
+        assert exporter.run_once(self.args, config) == exporter.EXIT_OK
+        with open(self.textfile, encoding="utf-8") as f:
+            content = f.read()
+        assert "toggl_tag_time_entries_count{" in content
+        assert "toggl_time_entries_count{" not in content
+        assert "toggl_tag_info{" not in content
+
+        paths = set(self.server.request_counts)
+        # /me is still needed for the default workspace
+        assert {"/me", "/me/time_entries"} <= paths
+        assert any(path.endswith("/tags") for path in paths)
+        assert "/me/time_entries/current" not in paths
+        for source in ("/projects", "/tasks", "/clients"):
+            assert not any(path.endswith(source) for path in paths)
+
+    def test_once_reports_failed_collection(self):
+        self.server.rate_5xx = 1.0
+        assert (
+            exporter.run_once(self.args, self.config) == exporter.EXIT_COLLECTION_FAILED
+        )
+        assert os.path.exists(self.textfile)
+
+    def test_once_requires_an_output(self):
+        with pytest.raises(SystemExit):
+            exporter.parse_args(["--once"])
+
+
+class TestCycleDeadline(unittest.TestCase):
+    """A slow Toggl API cannot stretch a cycle past CYCLE_TIMEOUT."""
+
+    def setUp(self):
+        for collector in list(REGISTRY._names_to_collectors.values()):
+            with contextlib.suppress(KeyError):
+                REGISTRY.unregister(collector)
+        exporter._REGISTERED_TO.clear()
+        exporter._SOURCE_STATE.clear()
+        exporter._BREAKERS.reset()
+        exporter._PUBLISHED_SERIES.clear()
+        exporter._WINDOW_AGGREGATES.clear()
+        exporter._PUBLISHED_WORKSPACES.clear()
+        exporter.TOGGL_API_REQUESTS_ABANDONED.clear()
+        self.server = fake_server.start_fake_server(
+            fake_server.generate_fixtures(seed=5, time_entries=20, days=1),
+            latency=0.3,
+        )
+        self.original_config = exporter.CONFIG
+        exporter.configure(
+            exporter.ExporterConfig(
+                toggl_api_token=TEST_API_TOKEN,
+                toggl_api_base_url=self.server.base_url,
+                cycle_timeout=1,
+            )
+        )
+        exporter.register_metrics()
+
+    def tearDown(self):
+        exporter.configure(self.original_config)
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_deadline_cancels_and_skips_remaining_requests(self):
+        started = time.monotonic()
+        exporter.collect_metrics()
+        assert time.monotonic() - started < 1.5  # noqa: PLR2004
+
+        def _value(name, labels=None):
+            return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+        assert _value("toggl_cycle_deadline_exceeded_total") == 1
+        abandoned = {
+            reason: sum(
+                _value(
+                    "toggl_api_requests_abandoned_total", {**labels, "reason": reason}
+                )
+                for labels in ({"endpoint": "workspaces"}, {"endpoint": "me"})
+            )
+            for reason in ("cancelled", "skipped")
+        }
+        assert abandoned["cancelled"] == 1
+        assert abandoned["skipped"] > 0
+        # Data fetched before the deadline is published
+        assert exporter._SOURCE_STATE[("me", "")]["stale"] is False
+        assert exporter._DEADLINE_MISSED
+        for source, workspace_label in exporter._DEADLINE_MISSED:
+            assert (
+                _value(
+                    "toggl_source_deadline_missed",
+                    {"source": source, "workspace_id": workspace_label},
+                )
+                == 1
+            )
+        assert exporter._CYCLE_DEADLINE is None
+
 
 # --- Remove old Todoist tests ---
 # [ All test methods starting with `test_collect_...` from the original
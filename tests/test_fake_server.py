@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timezone
+from http import HTTPStatus
+from unittest.mock import patch
+
+import requests
+
+from prometheus_toggl_track_exporter import exporter, fake_server
+
+TEST_API_TOKEN = "test_toggl_token"  # noqa: S105
+
+
+class TestFakeTogglServer(unittest.TestCase):
+    def setUp(self):
+        self.fixtures = fake_server.generate_fixtures(seed=1, time_entries=50)
+        self.server = fake_server.start_fake_server(self.fixtures)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_generate_fixtures_is_deterministic(self):
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        first = fake_server.generate_fixtures(seed=7, now=now)
+        second = fake_server.generate_fixtures(seed=7, now=now)
+        assert first == second
+
+    def test_exporter_requests_against_fake_server(self):
+        with (
+            patch.object(exporter, "TOGGL_API_BASE_URL", self.server.base_url),
+            patch.object(exporter, "TOGGL_API_TOKEN", TEST_API_TOKEN),
+        ):
+            me = exporter.get_me()
+            ws_id = me["default_workspace_id"]
+            projects = exporter.get_projects(ws_id)
+            entries = exporter.get_time_entries(
+                start_date="2000-01-01T00:00:00Z", end_date="2100-01-01T00:00:00Z"
+            )
+
+        assert me == self.fixtures["me"]
+        assert projects == self.fixtures["workspaces"][str(ws_id)]["projects"]
+        assert len(entries) == len(self.fixtures["time_entries"])
+        assert self.server.request_counts["/me"] == 1
+
+    def test_time_entries_date_filter(self):
+        entries = self.fixtures["time_entries"]
+        middle = entries[len(entries) // 2]["start"]
+        response = requests.get(
+            f"{self.server.base_url}/me/time_entries",
+            params={"start_date": middle},
+            timeout=5,
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert all(e["start"] >= middle for e in response.json())
+
+    def test_unknown_workspace_returns_404(self):
+        response = requests.get(
+            f"{self.server.base_url}/workspaces/1/projects", timeout=5
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_injected_rate_limit(self):
+        self.server.rate_429 = 1.0
+        response = requests.get(f"{self.server.base_url}/me", timeout=5)
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "1"
+
+    def test_injected_server_error(self):
+        self.server.rate_5xx = 1.0
+        response = requests.get(f"{self.server.base_url}/me", timeout=5)
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+class TestPaginatedFetch(unittest.TestCase):
+    """Projects and tasks are fetched page by page from the fake server."""
+
+    def setUp(self):
+        self.fixtures = fake_server.generate_fixtures(
+            seed=2, projects_per_workspace=45, tasks_per_project=2, time_entries=0
+        )
+        self.server = fake_server.start_fake_server(self.fixtures)
+        self.ws_id = self.fixtures["me"]["default_workspace_id"]
+        self.workspace = self.fixtures["workspaces"][str(self.ws_id)]
+        self.patchers = [
+            patch.object(exporter, "TOGGL_API_BASE_URL", self.server.base_url),
+            patch.object(exporter, "TOGGL_API_TOKEN", TEST_API_TOKEN),
+            patch.object(exporter, "PAGE_SIZE", 10),
+            patch.object(exporter, "FETCH_CONCURRENCY", 3),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        exporter._BREAKERS.reset()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_walks_pages_without_total_count(self):
+        assert exporter.get_projects(self.ws_id) == self.workspace["projects"]
+        # 5 pages are needed; pages are requested 3 at a time after the first
+        assert self.server.request_counts[f"/workspaces/{self.ws_id}/projects"] == 7  # noqa: PLR2004
+
+    def test_fetches_remaining_pages_from_total_count(self):
+        assert exporter.get_tasks(self.ws_id) == self.workspace["tasks"]
+        assert self.server.request_counts[f"/workspaces/{self.ws_id}/tasks"] == 9  # noqa: PLR2004
+
+    def test_active_only_filter(self):
+        with patch.object(exporter, "REFERENCE_ACTIVE_ONLY", True):
+            projects = exporter.get_projects(self.ws_id)
+        assert projects == [p for p in self.workspace["projects"] if p["active"]]
+
+    def test_failed_page_fails_the_whole_list(self):
+        make_request = exporter._make_toggl_request
+
+        def _fail_third_page(endpoint, method="GET", params=None):
+            if params and params.get("page") == 3:  # noqa: PLR2004
+                return None
+            return make_request(endpoint, method, params)
+
+        with patch.object(exporter, "_make_toggl_request", _fail_third_page):
+            assert exporter.get_tasks(self.ws_id) is None
+            assert exporter.get_projects(self.ws_id) is None
+
+
+if __name__ == "__main__":
+    unittest.main()
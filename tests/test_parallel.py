@@ -0,0 +1,95 @@
+import copy
+import unittest
+from datetime import date
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from prometheus_toggl_track_exporter import exporter, fake_server, parallel
+
+
+class TestParallelAggregation(unittest.TestCase):
+    def setUp(self):
+        fixtures = fake_server.generate_fixtures(
+            seed=11, workspace_count=2, time_entries=600
+        )
+        self.entries = fixtures["time_entries"]
+        self.project_names = {
+            project["id"]: project["name"]
+            for workspace in fixtures["workspaces"].values()
+            for project in workspace["projects"]
+        }
+        self.bounds = (300.0, 3600.0)
+        starts = [date.fromisoformat(e["start"][:10]) for e in self.entries]
+        # Workers bucket days with the parent's boundaries
+        self.days = exporter.DayBoundaries(
+            ZoneInfo("America/New_York"), min(starts), max(starts)
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        parallel.shutdown_pool()
+
+    def _serial(self):
+        state = parallel.new_state(self.bounds, self.days)
+        for entry in self.entries:
+            exporter._process_entry_aggregates(
+                entry, self.project_names, {}, state, "24h"
+            )
+        return state
+
+    def test_merged_partials_match_single_pass(self):
+        expected = self._serial()
+        merged = parallel.new_state(self.bounds, self.days)
+        rows = parallel.pack_entries(self.entries)
+        for start in range(0, len(rows), 97):
+            parallel.merge_states(
+                merged,
+                parallel.aggregate_packed(
+                    rows[start : start + 97],
+                    self.project_names,
+                    {},
+                    "24h",
+                    parallel.new_state(self.bounds, self.days),
+                ),
+            )
+        assert merged == expected
+
+    def test_merge_copies_new_workspaces(self):
+        partial = self._serial()
+        snapshot = copy.deepcopy(partial["ws_performance"])
+        merged = parallel.new_state(self.bounds, self.days)
+        parallel.merge_states(merged, partial)
+        parallel.merge_states(merged, partial)
+        assert partial["ws_performance"] == snapshot
+        # Subtracting from a state without the workspaces leaves none behind
+        emptied = parallel.new_state(self.bounds, self.days)
+        parallel.merge_states(emptied, partial, sign=-1)
+        assert emptied["ws_performance"] == {}
+        assert partial["ws_performance"] == snapshot
+
+    def test_worker_pool_matches_single_pass(self):
+        with (
+            patch.object(exporter, "AGGREGATION_WORKERS", 2),
+            patch.object(exporter, "PARALLEL_MIN_ENTRIES", 1),
+            patch.object(exporter, "ENTRY_DURATION_BUCKETS", list(self.bounds)),
+        ):
+            state = exporter._aggregate_entries(
+                self.entries, self.project_names, {}, "24h", self.days
+            )
+        assert state == self._serial()
+
+    def test_packed_pool_matches_single_pass(self):
+        state = parallel.aggregate_parallel(
+            self.entries,
+            self.project_names,
+            {},
+            "24h",
+            self.bounds,
+            2,
+            days=self.days,
+        )
+        assert state == self._serial()
+
+
+if __name__ == "__main__":
+    unittest.main()
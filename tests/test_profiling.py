@@ -0,0 +1,107 @@
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+from http import HTTPStatus
+
+import requests
+
+from prometheus_toggl_track_exporter import profiling, server
+
+TOKEN = "debug-token"  # noqa: S105
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def _busy_cycle() -> list[bytes]:
+    time.sleep(0.05)
+    return [bytes(1024) for _ in range(100)]
+
+
+class TestProfilingEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiling.CycleProfiler()
+        self.profiler.start_sampler(200)
+        self.retained: list[bytes] = []
+        self.stop = threading.Event()
+        self.collector = threading.Thread(target=self._collect_loop, daemon=True)
+        self.collector.start()
+        app = server.make_app(
+            lambda: (True, {}),
+            lambda: (True, {}),
+            routes=profiling.debug_routes(self.profiler, TOKEN, wait_timeout=10),
+        )
+        self.httpd = server.start_server(app, 0, addr="127.0.0.1")
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def tearDown(self):
+        self.stop.set()
+        self.collector.join()
+        self.profiler.stop_sampler()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _collect_loop(self):
+        while not self.stop.wait(0.02):
+            with self.profiler.cycle():
+                # Memory retained across cycles shows up in the diff
+                self.retained.extend(_busy_cycle())
+
+    def _get(self, path, **kwargs):
+        return requests.get(f"{self.base_url}{path}", timeout=15, **kwargs)
+
+    def test_requires_token(self):
+        assert self._get("/debug/profile").status_code == HTTPStatus.UNAUTHORIZED
+        response = self._get(
+            "/debug/profile", headers={"Authorization": "Bearer wrong"}
+        )
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    def test_profile_of_next_cycle_as_pstats_and_text(self):
+        response = self._get("/debug/profile", headers=AUTH)
+        assert response.status_code == HTTPStatus.OK
+        assert "attachment" in response.headers["Content-Disposition"]
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as dump:
+            dump.write(response.content)
+            dump.flush()
+            stats = pstats.Stats(dump.name).stats
+        assert any(func[2] == "_busy_cycle" for func in stats)
+
+        response = self._get("/debug/profile?format=text&limit=5", headers=AUTH)
+        assert response.status_code == HTTPStatus.OK
+        assert "_busy_cycle" in response.text
+
+    def test_unknown_sort_key_is_rejected(self):
+        response = self._get("/debug/profile?format=text&sort=bogus", headers=AUTH)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert "cumulative" in response.text
+        response = self._get("/debug/profile?format=text&sort=time", headers=AUTH)
+        assert response.status_code == HTTPStatus.OK
+
+    def test_memory_diff_across_cycles(self):
+        response = self._get("/debug/memory", headers=AUTH)
+        assert response.status_code == HTTPStatus.OK
+        assert "test_profiling.py" in response.text
+
+    def test_sampled_stacks(self):
+        time.sleep(0.3)
+        response = self._get("/debug/samples?reset=1", headers=AUTH)
+        assert response.status_code == HTTPStatus.OK
+        assert "test_profiling.py:_collect_loop" in response.text
+        stack, count = response.text.splitlines()[0].rsplit(" ", 1)
+        assert int(count) > 0
+
+
+class TestCycleProfiler(unittest.TestCase):
+    def test_capture_times_out_without_cycles_and_disarms(self):
+        profiler = profiling.CycleProfiler()
+        assert profiler.capture_profile(0.01) is None
+        assert profiler.capture_memory_diff(0.01) is None
+        assert profiler._profile is None
+        assert profiler._memory is None
+        with profiler.cycle():
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
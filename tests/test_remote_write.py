@@ -0,0 +1,137 @@
+import random
+import time
+import unittest
+from http import HTTPStatus
+
+from prometheus_client import CollectorRegistry, Gauge
+
+from prometheus_toggl_track_exporter import fake_server, remote_write
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestEncoding(unittest.TestCase):
+    def test_write_request_round_trip(self):
+        series = [
+            ((("__name__", "up"), ("job", "toggl")), [(1.0, 1700000000000)]),
+            ((("__name__", "x"), ("ws", "é")), [(-2.5, 0), (3.0, 1)]),
+        ]
+        data = remote_write.encode_write_request(series)
+        assert remote_write.decode_write_request(data) == series
+
+    def test_snappy_round_trip(self):
+        rng = random.Random(0)  # noqa: S311
+        incompressible = rng.randbytes(70000)  # literals spanning two blocks
+        assert (
+            remote_write.snappy_decompress(remote_write.snappy_compress(incompressible))
+            == incompressible
+        )
+        for data in (b"", b"abc", bytes(range(256)) * 600, b"a" * 100000):
+            assert (
+                remote_write.snappy_decompress(remote_write.snappy_compress(data))
+                == data
+            )
+
+    def test_snappy_compresses_repeated_series(self):
+        series = [
+            ((("__name__", "toggl_x"), ("project", f"p{i}")), [(i, 1700000000000)])
+            for i in range(500)
+        ]
+        data = remote_write.encode_write_request(series)
+        compressed = remote_write.snappy_compress(data)
+        assert len(compressed) < len(data) // 2
+        assert remote_write.snappy_decompress(compressed) == data
+
+    def test_snappy_copy_decoding(self):
+        # "abcd" literal, then a 1-byte-offset copy of 8 bytes at offset 4
+        block = bytes([12, 3 << 2]) + b"abcd" + bytes([(8 - 4) << 2 | 1, 4])
+        assert remote_write.snappy_decompress(block) == b"abcdabcdabcd"
+
+
+class TestRemoteWriteSender(unittest.TestCase):
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        self.gauge = Gauge("test_value", "A test gauge", ["n"], registry=self.registry)
+        for i in range(5):
+            self.gauge.labels(n=str(i)).set(i)
+
+    def _sender(self, receiver, **kwargs):
+        return remote_write.RemoteWriteSender(
+            receiver.url,
+            registry=self.registry,
+            external_labels={"job": "test"},
+            **kwargs,
+        )
+
+    def test_batches_are_delivered(self):
+        receiver = fake_server.start_fake_receiver()
+        try:
+            sender = self._sender(receiver, batch_size=2)
+            assert sender.enqueue_snapshot() == 3  # noqa: PLR2004
+            assert sender.flush()
+
+            assert receiver.request_count == 3  # noqa: PLR2004
+            values = {
+                dict(labels)["n"]: samples[0][0] for labels, samples in receiver.series
+            }
+            assert values == {str(i): float(i) for i in range(5)}
+            labels = dict(receiver.series[0][0])
+            assert labels["__name__"] == "test_value"
+            assert labels["job"] == "test"
+        finally:
+            receiver.shutdown()
+            receiver.server_close()
+
+    def test_retryable_failure_keeps_batch_queued(self):
+        receiver = fake_server.start_fake_receiver(
+            fail_statuses=[HTTPStatus.SERVICE_UNAVAILABLE]
+        )
+        try:
+            sender = self._sender(receiver)
+            sender.enqueue_snapshot()
+            assert not sender.flush()
+            assert sender.lag() >= 0
+            assert sender.flush()
+            assert len(receiver.series) == 5  # noqa: PLR2004
+        finally:
+            receiver.shutdown()
+            receiver.server_close()
+
+    def test_full_queue_drops_oldest_batches(self):
+        receiver = fake_server.start_fake_receiver()
+        try:
+            sender = self._sender(receiver, batch_size=1, queue_batches=2)
+            dropped = remote_write.REMOTE_WRITE_SAMPLES_DROPPED.labels(
+                reason="queue_full"
+            )
+            before = dropped._value.get()
+            sender.enqueue_snapshot()
+            assert dropped._value.get() - before == 3  # noqa: PLR2004
+            assert sender.flush()
+            assert [dict(labels)["n"] for labels, _ in receiver.series] == ["3", "4"]
+        finally:
+            receiver.shutdown()
+            receiver.server_close()
+
+    def test_background_thread_sends_snapshots(self):
+        receiver = fake_server.start_fake_receiver()
+        try:
+            sender = self._sender(receiver)
+            sender.start()
+            sender.enqueue_snapshot()
+            assert _wait_for(lambda: len(receiver.series) == 5)  # noqa: PLR2004
+            sender.stop()
+        finally:
+            receiver.shutdown()
+            receiver.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
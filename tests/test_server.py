@@ -0,0 +1,256 @@
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import requests
+from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client.core import GaugeMetricFamily
+
+from prometheus_toggl_track_exporter import server
+
+
+class _SlowCollector:
+    """Counts renders, each taking a while."""
+
+    def __init__(self) -> None:
+        self.renders = 0
+
+    def collect(self):
+        self.renders += 1
+        time.sleep(0.2)
+        yield GaugeMetricFamily("slow_gauge", "A slow gauge", value=1)
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        Gauge("test_gauge", "A test gauge", registry=self.registry).set(7)
+        series = Gauge(
+            "test_series", "Enough series to compress", ["id"], registry=self.registry
+        )
+        for i in range(100):
+            series.labels(id=str(i)).set(i)
+        self.ready = False
+        self.app = server.make_app(
+            lambda: (True, {"cycle_in_progress": False}),
+            lambda: (self.ready, {"first_collection_done": self.ready}),
+            metrics_path="/custom-metrics",
+            registry=self.registry,
+        )
+        self.httpd = server.start_server(self.app, 0, addr="127.0.0.1")
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def test_metrics_served_on_configured_path(self):
+        response = requests.get(f"{self.base_url}/custom-metrics", timeout=5)
+        assert response.status_code == HTTPStatus.OK
+        assert "test_gauge 7.0" in response.text
+
+    def test_unknown_path_returns_404(self):
+        response = requests.get(f"{self.base_url}/metrics", timeout=5)
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_healthz(self):
+        response = requests.get(f"{self.base_url}/healthz", timeout=5)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json() == {"status": "ok", "cycle_in_progress": False}
+
+    def test_readyz_reflects_probe(self):
+        response = requests.get(f"{self.base_url}/readyz", timeout=5)
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+        assert json.loads(response.text)["status"] == "fail"
+
+        self.ready = True
+        response = requests.get(f"{self.base_url}/readyz/", timeout=5)
+        assert response.status_code == HTTPStatus.OK
+        assert response.json()["first_collection_done"] is True
+
+    def test_keep_alive_reuses_the_connection(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_port)
+        try:
+            conn.request("GET", "/healthz")
+            assert conn.getresponse().read()
+            sock = conn.sock
+            conn.request("GET", "/custom-metrics")
+            response = conn.getresponse()
+            assert response.status == HTTPStatus.OK
+            assert b"test_gauge 7.0" in response.read()
+            assert conn.sock is sock
+        finally:
+            conn.close()
+
+    def test_gzip_negotiated(self):
+        response = requests.get(
+            f"{self.base_url}/custom-metrics",
+            headers={"Accept-Encoding": "gzip"},
+            timeout=5,
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "test_gauge 7.0" in response.text
+
+        response = requests.get(
+            f"{self.base_url}/custom-metrics",
+            headers={"Accept-Encoding": "identity"},
+            timeout=5,
+        )
+        assert "Content-Encoding" not in response.headers
+        assert "test_gauge 7.0" in response.text
+
+    def test_request_limits(self):
+        response = requests.get(
+            f"{self.base_url}/healthz", headers={"X-Big": "x" * 20000}, timeout=5
+        )
+        assert response.status_code == HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+        response = requests.post(f"{self.base_url}/healthz", timeout=5)
+        assert response.status_code == HTTPStatus.METHOD_NOT_ALLOWED
+        with socket.create_connection(("127.0.0.1", self.httpd.server_port)) as sock:
+            sock.sendall(b"nonsense\r\n\r\n")
+            assert sock.recv(1024).startswith(b"HTTP/1.1 400")
+
+
+class TestServerOptions(unittest.TestCase):
+    def _serve(self, app, **kwargs):
+        httpd = server.start_server(app, 0, addr="127.0.0.1", **kwargs)
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        return httpd
+
+    def test_basic_auth_guards_metrics_only(self):
+        registry = CollectorRegistry()
+        Gauge("test_gauge", "A test gauge", registry=registry).set(1)
+        app = server.make_app(
+            lambda: (True, {}),
+            lambda: (True, {}),
+            registry=registry,
+            basic_auth=("prometheus", "secret"),
+        )
+        base_url = f"http://127.0.0.1:{self._serve(app).server_port}"
+
+        response = requests.get(f"{base_url}/metrics", timeout=5)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert response.headers["WWW-Authenticate"].startswith("Basic")
+        response = requests.get(
+            f"{base_url}/metrics", auth=("prometheus", "wrong"), timeout=5
+        )
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        response = requests.get(
+            f"{base_url}/metrics", auth=("prometheus", "secret"), timeout=5
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert requests.get(f"{base_url}/healthz", timeout=5).ok
+
+    def test_concurrent_scrapes_share_a_render(self):
+        registry = CollectorRegistry()
+        collector = _SlowCollector()
+        registry.register(collector)
+        app = server.make_app(lambda: (True, {}), lambda: (True, {}), registry=registry)
+        base_url = f"http://127.0.0.1:{self._serve(app).server_port}"
+        collector.renders = 0
+
+        def _scrape(_):
+            return requests.get(f"{base_url}/metrics", timeout=5).text
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            bodies = list(pool.map(_scrape, range(8)))
+        assert all("slow_gauge 1.0" in body for body in bodies)
+        assert collector.renders < 8  # noqa: PLR2004
+
+    def test_metrics_path_with_trailing_slash(self):
+        registry = CollectorRegistry()
+        Gauge("test_gauge", "A test gauge", registry=registry).set(1)
+        app = server.make_app(
+            lambda: (True, {}),
+            lambda: (True, {}),
+            metrics_path="/metrics/",
+            registry=registry,
+        )
+        httpd = self._serve(app, scrape_paths=("/metrics/",))
+        base_url = f"http://127.0.0.1:{httpd.server_port}"
+        for path in ("/metrics", "/metrics/"):
+            response = requests.get(f"{base_url}{path}", timeout=5)
+            assert response.status_code == HTTPStatus.OK
+            assert "test_gauge 1.0" in response.text
+
+    def test_stalled_body_closes_the_connection(self):
+        app = server.make_app(lambda: (True, {}), lambda: (True, {}))
+        httpd = self._serve(app, keepalive_timeout=0.2)
+        with socket.create_connection(("127.0.0.1", httpd.server_port)) as sock:
+            sock.settimeout(5)
+            sock.sendall(b"GET /healthz HTTP/1.1\r\nContent-Length: 10\r\n\r\n")
+            assert sock.recv(1024) == b""
+
+    def test_probes_answer_while_workers_are_busy(self):
+        release = threading.Event()
+
+        def _blocking(environ, start_response):  # noqa: ARG001
+            release.wait(10)
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [b"done\n"]
+
+        app = server.make_app(
+            lambda: (True, {}), lambda: (True, {}), routes={"/debug/wait": _blocking}
+        )
+        base_url = f"http://127.0.0.1:{self._serve(app).server_port}"
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            # Distinct queries, so the requests don't share one render
+            waiting = [
+                pool.submit(requests.get, f"{base_url}/debug/wait?n={i}", timeout=15)
+                for i in range(40)
+            ]
+            time.sleep(0.2)
+            try:
+                assert requests.get(f"{base_url}/healthz", timeout=2).ok
+                assert requests.get(f"{base_url}/readyz", timeout=2).ok
+            finally:
+                release.set()
+            assert all(future.result().ok for future in waiting)
+
+    @unittest.skipUnless(shutil.which("openssl"), "openssl is not installed")
+    def test_tls(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cert = os.path.join(tmp, "cert.pem")
+            key = os.path.join(tmp, "key.pem")
+            subprocess.run(  # noqa: S603
+                [
+                    shutil.which("openssl"),
+                    "req",
+                    "-x509",
+                    "-newkey",
+                    "rsa:2048",
+                    "-nodes",
+                    "-days",
+                    "1",
+                    "-subj",
+                    "/CN=127.0.0.1",
+                    "-addext",
+                    "subjectAltName=IP:127.0.0.1",
+                    "-keyout",
+                    key,
+                    "-out",
+                    cert,
+                ],
+                check=True,
+                capture_output=True,
+            )
+            app = server.make_app(lambda: (True, {}), lambda: (True, {}))
+            httpd = self._serve(app, ssl_context=server.tls_context(cert, key))
+            response = requests.get(
+                f"https://127.0.0.1:{httpd.server_port}/healthz", verify=cert, timeout=5
+            )
+            assert response.status_code == HTTPStatus.OK
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from prometheus_toggl_track_exporter import sharding
+
+KEYS = [str(100000 + i) for i in range(500)]
+
+
+class TestSharding(unittest.TestCase):
+    def test_single_shard_owns_everything(self):
+        assert all(sharding.owns(key, 0, 1) for key in KEYS)
+
+    def test_every_key_has_exactly_one_owner(self):
+        for key in KEYS:
+            owners = [shard for shard in range(4) if sharding.owns(key, shard, 4)]
+            assert owners == [sharding.shard_for(key, 4)]
+
+    def test_adding_a_shard_only_moves_keys_to_it(self):
+        before = {key: sharding.shard_for(key, 3) for key in KEYS}
+        after = {key: sharding.shard_for(key, 4) for key in KEYS}
+        moved = [key for key in KEYS if before[key] != after[key]]
+
+        assert all(after[key] == 3 for key in moved)  # noqa: PLR2004
+        # Roughly a quarter of the keys move to the new shard
+        assert len(KEYS) // 8 < len(moved) < len(KEYS) // 2
+
+    def test_ordinal_from_hostname(self):
+        assert sharding.ordinal_from_hostname("toggl-exporter-2") == 2  # noqa: PLR2004
+        assert sharding.ordinal_from_hostname("toggl-exporter") is None
+        assert sharding.ordinal_from_hostname("") is None
+
+
+if __name__ == "__main__":
+    unittest.main()